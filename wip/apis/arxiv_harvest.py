@@ -0,0 +1,163 @@
+# Parallel arXiv OAI-PMH harvest
+# split (category x date window) into jobs, run them concurrently under one politeness budget
+# for export.arxiv.org, and merge the harvested files with duplicates removed.
+import json
+import time
+import asyncio
+from datetime import date, timedelta
+from typing import List, Dict, Optional, Iterator
+
+from apis.arxiv_tool import ArxivKit, iter_oai_records
+
+import logging
+logger = logging.getLogger(__name__)
+
+# archives which are grouped under "physics" in arXiv OAI set specs
+PHYSICS_ARCHIVES = {'astro-ph', 'cond-mat', 'gr-qc', 'hep-ex', 'hep-lat', 'hep-ph', 'hep-th', 'math-ph',
+                    'nlin', 'nucl-ex', 'nucl-th', 'physics', 'quant-ph'}
+
+
+def category_to_set(category: str) -> str:
+    """convert arXiv category to OAI set spec, e.g. "cs.CV" -> "cs:cs:CV", "cs" -> "cs", "hep-th" -> "physics:hep-th"
+    """
+    archive, _, subject = category.partition('.')
+    group = 'physics' if archive in PHYSICS_ARCHIVES else archive
+    if not subject:
+        return group if group == archive else f"{group}:{archive}"
+    return f"{group}:{archive}:{subject}"
+
+
+def date_windows(from_date: str, until_date: str, window_days: int = 7) -> List[tuple]:
+    """split [from_date, until_date] (YYYY-MM-DD, inclusive) into consecutive windows of window_days"""
+    start, end = date.fromisoformat(from_date), date.fromisoformat(until_date)
+    windows = []
+    while start <= end:
+        stop = min(start + timedelta(days=window_days - 1), end)
+        windows.append((start.isoformat(), stop.isoformat()))
+        start = stop + timedelta(days=1)
+    return windows
+
+
+class PolitenessBudget:
+    """global request budget for one host shared by concurrent harvests
+    Note:
+        requests are spaced by at least min_interval seconds across all harvests,
+        and a 503 / 429 with Retry-After pauses every harvest, not only the one that got it.
+    """
+    def __init__(self, min_interval: float = 3.0, default_retry_after: float = 30):
+        """
+        Args:
+            min_interval: min seconds between two requests to the host
+            default_retry_after: pause in seconds when Retry-After header is missing or invalid
+        """
+        self.min_interval = min_interval
+        self.default_retry_after = default_retry_after
+        self.next_slot = 0.0     # monotonic time of next allowed request
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self.stats = {"requests": 0, "pauses": 0, "paused_time": 0.0, "wait_time": 0.0}
+
+    async def wait(self):
+        """wait for the next request slot"""
+        start = time.monotonic()
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot, self.paused_until)
+            self.next_slot = slot + self.min_interval
+            self.stats['requests'] += 1
+        if slot > now:
+            await asyncio.sleep(slot - now)
+        self.stats['wait_time'] += time.monotonic() - start
+
+    def pause(self, retry_after=None):
+        """pause all requests for Retry-After seconds"""
+        try:
+            seconds = float(retry_after)
+        except (TypeError, ValueError):
+            seconds = self.default_retry_after
+        until = time.monotonic() + seconds
+        if until > self.paused_until:
+            self.stats['pauses'] += 1
+            self.stats['paused_time'] += until - max(self.paused_until, time.monotonic())
+            self.paused_until = until
+            logger.warning(f"Server busy, all harvests paused for {seconds} seconds.")
+
+
+def merge_harvests(paths: List[str]) -> Iterator[Dict]:
+    """stream records of harvested files without duplicates
+    Args:
+        paths: harvested xml files, in chronological order of their date windows
+    Note:
+        files are read newest first and the first occurrence of each identifier is kept,
+        so a paper listed under several sets appears once, with its latest version.
+    """
+    seen = set()
+    for path in reversed(paths):
+        for record in iter_oai_records(path):
+            if record['identifier'] in seen:
+                continue
+            seen.add(record['identifier'])
+            yield record
+
+
+async def harvest_categories(categories: List[str],
+                             from_date: str,
+                             until_date: str,
+                             data_path: str,
+                             merged_path: Optional[str] = None,
+                             window_days: int = 7,
+                             max_concurrency: int = 4,
+                             min_interval: float = 3.0,
+                             store=None) -> Dict:
+    """harvest several categories and date windows concurrently
+    Args:
+        categories: arXiv categories like CONFIG['ARXIV']['CATEGORY'] ("cs.CV", "stat.ML", ...) or domains ("cs")
+        from_date: start date in YYYY-MM-DD format
+        until_date: end date in YYYY-MM-DD format
+        data_path: folder for harvested xml files (one per job, resumable, refer to ArxivKit.download_category_metadata)
+        merged_path: (optional) jsonl file for merged records without duplicates
+        window_days: days per date window
+        max_concurrency: max number of jobs running at the same time
+        min_interval: min seconds between two requests to export.arxiv.org across all jobs
+        store: (optional) local metadata store to load merged records into, refer to data_management.arxiv_store
+    Returns:
+        summary of the harvest
+    """
+    budget = PolitenessBudget(min_interval=min_interval)
+    kit = ArxivKit(budget=budget)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    windows = date_windows(from_date, until_date, window_days)
+    jobs = [(category_to_set(category), window) for window in windows for category in categories]
+
+    async def run_job(set_spec, window):
+        async with semaphore:
+            return await kit.download_category_metadata(set_spec, window[0], window[1], data_path)
+
+    start = time.monotonic()
+    results = await asyncio.gather(*[run_job(set_spec, window) for set_spec, window in jobs], return_exceptions=True)
+
+    summary = {"jobs": len(jobs), "failed": 0, "empty": 0, "records": 0, "unique": None, "budget": budget.stats}
+    paths = []
+    for (set_spec, window), result in zip(jobs, results):  # jobs are in chronological order of windows
+        if isinstance(result, Exception):
+            summary['failed'] += 1
+            logger.error(f"Harvest {set_spec} {window[0]} - {window[1]} failed: {result!r}")
+        elif result is None:
+            summary['empty'] += 1
+        else:
+            paths.append(result)
+
+    if merged_path is not None:
+        summary['unique'] = 0
+        with open(merged_path, 'w', encoding='utf-8') as f:
+            for record in merge_harvests(paths):
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                summary['unique'] += 1
+    if store is not None:
+        summary['stored'] = store.upsert(merge_harvests(paths))
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            summary['records'] += sum(1 for _ in f)
+    summary['elapsed'] = time.monotonic() - start
+    logger.info(f"Harvest finished: {summary}")
+    return summary
@@ -1,8 +1,12 @@
 
 import arxiv # pip install arxiv (source from https://github.com/lukasschwab/arxiv.py)
 from sickle import Sickle # pip install sickle https://github.com/mloesch/sickle
+from sickle import oaiexceptions
+from lxml import etree  # installed with sickle
 
 import os
+import re
+import json
 import aiofiles
 import aiofiles.os
 import aiofiles.ospath
@@ -11,12 +15,177 @@ from requests.exceptions import HTTPError, RequestException
 
 import asyncio
 import xml.etree.ElementTree as ET
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator
+
+from data_management.arxiv_store import normalize_arxiv_id
 
 import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+OAI_NS = '{http://www.openarchives.org/OAI/2.0/}'
+ARXIV_NS = '{http://arxiv.org/OAI/arXiv/}'
+CHECKPOINT_SUFFIX = '.ckpt.json'
+ID_CHUNK_SIZE = 200  # ids per arXiv API request, keeps id_list query url and response page small
+RETRY_STATUS = (429, 503)
+
+# element tags and paths of OAI records, resolved once instead of per find() call
+RECORD_TAG = OAI_NS + 'record'
+HEADER_TAG = OAI_NS + 'header'
+HEADER_FIELDS = {OAI_NS + 'identifier': 'identifier', OAI_NS + 'datestamp': 'datestamp', OAI_NS + 'setSpec': 'setSpec'}
+ARXIV_PATH = f'{OAI_NS}metadata/{ARXIV_NS}arXiv'
+ARXIV_FIELDS = {
+    ARXIV_NS + 'id': 'arxiv_id',
+    ARXIV_NS + 'created': 'created',
+    ARXIV_NS + 'updated': 'updated',
+    ARXIV_NS + 'title': 'title',
+    ARXIV_NS + 'categories': 'categories',
+    ARXIV_NS + 'comments': 'comments',
+    ARXIV_NS + 'journal-ref': 'journal_ref',
+    ARXIV_NS + 'doi': 'doi',
+    ARXIV_NS + 'license': 'license',
+    ARXIV_NS + 'abstract': 'abstract',
+}
+AUTHORS_TAG = ARXIV_NS + 'authors'
+AUTHOR_FIELDS = {ARXIV_NS + 'keyname': 'keyname', ARXIV_NS + 'forenames': 'forenames', ARXIV_NS + 'suffix': 'suffix'}
+IDENTIFIER_PTRN = re.compile(r'<(?:\w+:)?identifier>([^<]+)</(?:\w+:)?identifier>')
+
+
+def load_harvested_ids(full_path: str) -> set:
+    """get OAI identifiers of records already in the harvested xml file (one record per line)
+    Note:
+        a partially written last line (from an interrupted run) is truncated, the record is harvested again.
+    """
+    seen = set()
+    if not os.path.exists(full_path):
+        return seen
+    valid_size = 0
+    with open(full_path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            valid_size += len(line)
+            match = IDENTIFIER_PTRN.search(line.decode('utf-8'))
+            if match is not None:
+                seen.add(match.group(1))
+    if valid_size < os.path.getsize(full_path):
+        with open(full_path, 'r+b') as f:
+            f.truncate(valid_size)
+    return seen
+
+
+def parse_oai_record(record) -> Dict:
+    """convert OAI record element (arXiv metadata format) into dict, each child element is visited once"""
+    record_data = {"identifier": None, "datestamp": None, "setSpec": None}
+    header = record.find(HEADER_TAG)
+    if header is not None:
+        for elem in header:
+            key = HEADER_FIELDS.get(elem.tag)
+            if key is not None and record_data[key] is None:  # keep first setSpec
+                record_data[key] = elem.text
+
+    record_data.update({"arxiv_id": None, "created": None, "updated": None, "authors": [], "title": None,
+                        "categories": [], "comments": None, "journal_ref": None, "doi": None,
+                        "license": None, "abstract": None})
+    arxiv = record.find(ARXIV_PATH)
+    if arxiv is None:
+        return record_data
+    for elem in arxiv:
+        if elem.tag == AUTHORS_TAG:
+            for author in elem:
+                name = {'keyname': '', 'forenames': '', 'suffix': ''}
+                for part in author:
+                    key = AUTHOR_FIELDS.get(part.tag)
+                    if key is not None:
+                        name[key] = part.text or ''
+                record_data['authors'].append(f"{name['forenames']} {name['keyname']} {name['suffix']}".strip())
+            continue
+        key = ARXIV_FIELDS.get(elem.tag)
+        if key is not None:
+            record_data[key] = elem.text
+    if record_data['categories']:
+        record_data['categories'] = record_data['categories'].split(' ')
+    return record_data
+
+
+def iter_oai_records(full_path: str) -> Iterator[Dict]:
+    """stream records from harvested xml file (refer to ArxivKit.download_category_metadata)
+    Note:
+        the harvester writes one record per line, so each line is parsed on its own and released right after:
+        memory stays constant, and this is faster than a pull parser over the whole file.
+    Returns:
+        generator of record dicts
+    """
+    with open(full_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = ET.fromstring(line)
+            if record.tag == RECORD_TAG:
+                yield parse_oai_record(record)
+
+
+def iter_oai_record_batches(full_path: str, batch_size: int = 10000) -> Iterator[List[Dict]]:
+    """stream records in batches, e.g. for executemany or parquet row groups"""
+    batch = []
+    for record in iter_oai_records(full_path):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def raw_to_record(raw: Dict) -> Dict:
+    """convert arxiv API entry (_raw of arxiv.Result) into the record dict layout of parse_oai_record"""
+    arxiv_id = normalize_arxiv_id(raw['id'])
+    updated = (raw.get('updated') or '')[:10] or None
+    return {"identifier": f"oai:arXiv.org:{arxiv_id}",
+            "datestamp": updated,
+            "setSpec": None,
+            "arxiv_id": arxiv_id,
+            "created": (raw.get('published') or '')[:10] or None,
+            "updated": updated,
+            "authors": [x.get('name') for x in raw.get('authors', [])],
+            "title": raw.get('title'),
+            "categories": [x.get('term') for x in raw.get('tags', [])],
+            "comments": raw.get('arxiv_comment'),
+            "journal_ref": raw.get('arxiv_journal_ref'),
+            "doi": raw.get('arxiv_doi'),
+            "license": raw.get('rights'),
+            "abstract": raw.get('summary')}
+
+
+def order_by_ids(raws: List[Dict], paper_ids: List[str]) -> tuple:
+    """match arxiv API entries to requested ids
+    Returns:
+        (entries in order of paper_ids, ids with no entry)
+    """
+    found = {normalize_arxiv_id(raw['id']): raw for raw in raws}
+    papers, missing = [], []
+    for paper_id in paper_ids:
+        raw = found.get(normalize_arxiv_id(paper_id))
+        if raw is None:
+            missing.append(paper_id)
+        else:
+            papers.append(raw)
+    return papers, missing
+
+
+def load_checkpoint(ckpt_path: str) -> Dict:
+    if os.path.exists(ckpt_path):
+        with open(ckpt_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {"resumption_token": None, "pages": 0, "records": 0, "complete": False}
+
+
+def save_checkpoint(ckpt_path: str, ckpt: Dict):
+    tmp_path = ckpt_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(ckpt, f)
+    os.replace(tmp_path, ckpt_path)
+
 async def handle_http_error(e):
     """Handle HTTP errors during metadata download."""
     if e.response.status_code == 503:
@@ -28,9 +197,18 @@ async def handle_http_error(e):
         raise e
 
 class ArxivKit:   
-    def __init__(self):                 
+    def __init__(self, budget=None, store=None):
+        """
+        Args:
+            budget: (optional) politeness budget shared by concurrent harvests, refer to arxiv_harvest.PolitenessBudget
+            store: (optional) local metadata store serving lookups before the arXiv API,
+                refer to data_management.arxiv_store.ArxivMetadataStore
+        """
         self.client = arxiv.Client(page_size= 100, delay_seconds=3.0, num_retries=3)
+        self.id_client = arxiv.Client(page_size=ID_CHUNK_SIZE, delay_seconds=3.0, num_retries=3)
         self.connection = Sickle('http://export.arxiv.org/oai2')
+        self.budget = budget
+        self.store = store
 
     def retrieve_metadata_by_paper(
             self,
@@ -44,8 +222,20 @@ class ArxivKit:
             query_term (str): The query term to search for.
             paper_ids (list): The list of paper ids to search for.
         Returns:
-
+            list of arxiv API entries, in order of paper_ids when searching by ids only
+        Note:
+            ids without query_term are sent in chunks of ID_CHUNK_SIZE,
+            use retrieve_metadata_by_ids to run the chunks concurrently and get the missing ids.
         """
+        if paper_ids and not query_term:
+            arxiv_metadata = []
+            for i in range(0, len(paper_ids), ID_CHUNK_SIZE):
+                arxiv_metadata.extend(self._fetch_id_chunk(paper_ids[i:i+ID_CHUNK_SIZE], self.id_client))
+            papers, missing = order_by_ids(arxiv_metadata, paper_ids)
+            if missing:
+                logger.warning(f"{len(missing)} of {len(paper_ids)} papers not found on arXiv.")
+            return papers[:max_cnt]
+
         # Construct the default API client.
         if max_cnt > 100:
             self.client = arxiv.Client(page_size=1000, delay_seconds=10.0, num_retries = 5)
@@ -73,71 +263,239 @@ class ArxivKit:
             arxiv_metadata.append(item.__dict__['_raw'])
         return arxiv_metadata
 
+    def _fetch_id_chunk(self, chunk: List[str], client=None) -> List[Dict]:
+        """request one chunk of ids from arXiv API
+        Args:
+            chunk: at most ID_CHUNK_SIZE arxiv ids
+            client: (optional) arxiv.Client, by default a client without delay or retries (left to the caller)
+        """
+        if client is None:
+            client = arxiv.Client(page_size=len(chunk), delay_seconds=0, num_retries=0)
+        search = arxiv.Search(id_list=chunk, max_results=len(chunk))
+        return [item.__dict__['_raw'] for item in client.results(search)]
+
+    async def retrieve_metadata_by_ids(self, paper_ids: List[str], chunk_size: int = ID_CHUNK_SIZE,
+                                       max_concurrency: int = 4, max_retries: int = 3) -> Dict:
+        """retrieve papers' metadata by arxiv ids, chunks run concurrently under the shared politeness budget
+        Args:
+            paper_ids: arxiv ids, with or without version
+            chunk_size: ids per request
+            max_concurrency: max number of chunk requests in flight
+            max_retries: retries of a chunk after 429 / 503
+        Returns:
+            {"papers": arxiv API entries in order of paper_ids, "missing": ids not found}
+        Note:
+            a chunk still throttled after max_retries is given up and its ids are reported missing;
+            a chunk failing for other reasons is split in halves and retried,
+            so one malformed id only drops itself instead of its whole chunk.
+        """
+        if self.budget is None:
+            from apis.arxiv_harvest import PolitenessBudget  # arxiv_harvest imports this module
+            self.budget = PolitenessBudget(min_interval=3.0)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        raws = []
+
+        async def fetch(chunk, attempt=0):
+            async with semaphore:
+                await self.budget.wait()
+                try:
+                    raws.extend(await asyncio.to_thread(self._fetch_id_chunk, chunk))
+                    return
+                except Exception as e:
+                    err = e
+            if getattr(err, 'status', None) in RETRY_STATUS:
+                if attempt < max_retries:
+                    self.budget.pause()
+                    return await fetch(chunk, attempt + 1)
+                # still throttled: splitting would only send more requests, report the chunk as missing
+                logger.error(f"Gave up {len(chunk)} ids after {max_retries} retries: {err!r}")
+                return
+            if len(chunk) == 1:
+                logger.warning(f"Failed to retrieve {chunk[0]}: {err!r}")
+                return
+            mid = len(chunk) // 2
+            await asyncio.gather(fetch(chunk[:mid]), fetch(chunk[mid:]))
+
+        ids = list(dict.fromkeys(paper_ids))
+        await asyncio.gather(*[fetch(ids[i:i+chunk_size]) for i in range(0, len(ids), chunk_size)])
+        papers, missing = order_by_ids(raws, paper_ids)
+        logger.info(f"Retrieved {len(papers)} of {len(paper_ids)} papers, {len(missing)} missing.")
+        return {"papers": papers, "missing": missing}
+
+    def lookup_papers(self, paper_ids: List[str], remote: bool = True) -> List[Dict]:
+        """get papers' metadata by arxiv ids, from local store first and arXiv API for the misses
+        Args:
+            paper_ids: arxiv ids, with or without version
+            remote: whether to query arXiv API for ids missing in local store
+        Returns:
+            record dicts (layout of parse_oai_record) in order of paper_ids, ids not found anywhere are skipped
+        Note:
+            records fetched from arXiv API are written back to the store.
+        """
+        ids = [normalize_arxiv_id(x) for x in paper_ids]
+        found = self.store.get_many(ids) if self.store is not None else {}
+        missing = [x for x in dict.fromkeys(ids) if x not in found]
+        if missing and remote:
+            records = [raw_to_record(raw) for raw in self.retrieve_metadata_by_paper(paper_ids=missing, max_cnt=len(missing))]
+            if self.store is not None:
+                self.store.upsert(records)
+            found.update({record['arxiv_id']: record for record in records})
+            logger.info(f"{len(ids) - len(missing)} of {len(ids)} papers served from local store.")
+        return [found[x] for x in ids if x in found]
+
+    def search_papers(self, query_term: str, max_cnt: int = 100, category: Optional[str] = None,
+                      remote: bool = True) -> List[Dict]:
+        """keyword search over titles and abstracts, from local store first and arXiv API if nothing matches locally
+        Args:
+            query_term: keywords
+            max_cnt: max number of records
+            category: (optional) arXiv category like "cs.CL"
+            remote: whether to query arXiv API when local store has no match
+        Returns:
+            record dicts (layout of parse_oai_record), most relevant first
+        """
+        if self.store is not None:
+            records = self.store.search(query_term, max_cnt=max_cnt, category=category)
+            if records or not remote:
+                return records
+        query = f"cat:{category} AND all:{query_term}" if category else query_term
+        records = [raw_to_record(raw) for raw in self.retrieve_metadata_by_paper(query_term=query, max_cnt=max_cnt)]
+        if self.store is not None:
+            self.store.upsert(records)
+        return records
+
+    def _harvest_page(self, params: Dict):
+        """request one OAI-PMH page
+        Returns:
+            (list of record elements, resumption token or None)
+        Note:
+            raises sickle oaiexceptions on OAI errors, e.g. NoRecordsMatch, BadResumptionToken.
+        """
+        xml = self.connection.harvest(**params).xml
+        error = xml.find('.//' + OAI_NS + 'error')
+        if error is not None:
+            code = error.attrib.get('code', 'UNKNOWN')
+            raise getattr(oaiexceptions, code[0].upper() + code[1:], oaiexceptions.OAIError)(error.text or '')
+        records = xml.findall('.//' + OAI_NS + 'record')
+        token = xml.find('.//' + OAI_NS + 'resumptionToken')
+        return records, (token.text if token is not None and token.text else None)
+
     async def download_category_metadata(
             self,
             category,
             from_date,
             until_date,
-            data_path):
+            data_path,
+            resume: bool = True):
         """Download metadata from arXiv for specific category and date range in batch.
         Args:
             category (str): Specify paper category like "cs", "math", etc.
                 Reference to category could be found in http://export.arxiv.org/oai2?verb=ListSets
                 Only accept one category at a time.
-            from_date (str): The start date for the date range in ReactNative-MM-DD format.
-            until_date (str): The end date for the date range in ReactNative-MM-DD format.
+            from_date (str): The start date for the date range in YYYY-MM-DD format.
+            until_date (str): The end date for the date range in YYYY-MM-DD format.
+            resume (bool): continue from checkpoint of previous run, otherwise start over.
         Returns:
             Downloaded xml file with arxiv metadata.
         Note:
             Function originated from jack-tol's [arXivGPT](https://github.com/jack-tol/arXivGPT/blob/main/metadata_pipeline.py).
             With minor modification to: 1. specify paper category (the setSpec param); 2. save one record per line.
+            Harvest is checkpointed after each page (resumption token in <xml file>.ckpt.json),
+            a restarted harvest continues from the checkpoint and records already in the file are skipped by identifier.
+            If the resumption token expired, harvest restarts from from_date, as ListRecords is not ordered by datestamp
+            and any later lower bound could skip records on pages not fetched yet.
+            Throttled (429/503) and unexpected errors count against the same cap of 5 consecutive failures.
         """
-        logger.info('Getting papers...')
-        params = {'metadataPrefix': 'arXiv',
-                'set': category,   # modification 1: add set para to specify paper category
-                'from': from_date,
-                'until': until_date,
-                'ignore_deleted': True}
-        data = self.connection.ListRecords(**params)
-        logger.info('Papers retrieved.')
-
-        iters = 0
-        errors = 0
-
-        xml_file_nm = f"{category}_{from_date}_{until_date}.xml"
+        xml_file_nm = f"{category.replace(':', '-')}_{from_date}_{until_date}.xml"  # set spec like "cs:cs:AI"
         full_path = os.path.join(data_path, xml_file_nm)
-        async with aiofiles.open(full_path, 'a+', encoding="utf-8") as f:
+        ckpt_path = full_path + CHECKPOINT_SUFFIX
+        if not resume:
+            for path in (full_path, ckpt_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        ckpt = load_checkpoint(ckpt_path)
+        if ckpt.get('complete'):
+            logger.info(f'{category} Metadata for {from_date} - {until_date} already downloaded.')
+            return full_path if os.path.exists(full_path) and os.path.getsize(full_path) > 0 else None
+        seen = await asyncio.to_thread(load_harvested_ids, full_path)
+        if seen:
+            logger.info(f'Resume harvest with {len(seen)} records already downloaded.')
+
+        params = {'verb': 'ListRecords',
+                  'metadataPrefix': 'arXiv',
+                  'set': category,   # modification 1: add set para to specify paper category
+                  'from': from_date,
+                  'until': until_date}
+        errors = 0
+        async with aiofiles.open(full_path, 'a', encoding="utf-8") as f:
             while True:
+                if ckpt.get('resumption_token'):
+                    page_params = {'verb': 'ListRecords', 'resumptionToken': ckpt['resumption_token']}
+                else:
+                    page_params = params
+                if self.budget is not None:
+                    await self.budget.wait()
                 try:
-                    record = await asyncio.to_thread(lambda: next(data, None))
-                    if record is None:
-                        logger.info(f'{category} Metadata for the specified period, {from_date} - {until_date} downloaded.')
-                        # Check if the file is empty
-                        if os.stat(full_path).st_size == 0:
-                            logger.warning("No records found matching the criteria.")
-                            return None  # Or raise a custom exception: raise NoRecordsFoundError()
-                        return full_path  # Return full_path even if no records are found
-                    cleaned_record = record.raw.replace('\n', ' ').replace('\r', ' ')  # modification 2: replace multi-line text to one line
-                    await f.write(cleaned_record)
-                    await f.write('\n')
-                    errors = 0
-                    iters += 1
-                    if iters % 1000 == 0:
-                        logger.info(f'{iters} processing attempts made successfully.')
-
+                    records, token = await asyncio.to_thread(self._harvest_page, page_params)
+                except oaiexceptions.NoRecordsMatch:
+                    records, token = [], None
+                except oaiexceptions.BadResumptionToken:
+                    logger.warning(f"Resumption token expired, restart from {from_date}.")
+                    ckpt['resumption_token'] = None
+                    continue
                 except HTTPError as e:
-                    await handle_http_error(e)
-
+                    errors += 1
+                    if errors > 5:
+                        logger.critical('Too many consecutive errors, stopping the harvester.')
+                        raise
+                    if self.budget is not None and e.response.status_code in (429, 503):
+                        self.budget.pause(e.response.headers.get('Retry-After'))  # all harvests back off together
+                    else:
+                        await handle_http_error(e)
+                    continue
                 except RequestException as e:
                     logger.error(f'RequestException: {e}')
                     raise
-
                 except Exception as e:
                     errors += 1
                     logger.error(f'Unexpected error: {e}')
                     if errors > 5:
                         logger.critical('Too many consecutive errors, stopping the harvester.')
                         raise
+                    continue
+                errors = 0
+
+                lines = []
+                for record in records:
+                    header = record.find(OAI_NS + 'header')
+                    if header is None or header.get('status') == 'deleted':
+                        continue
+                    identifier = header.findtext(OAI_NS + 'identifier')
+                    if identifier in seen:
+                        continue
+                    seen.add(identifier)
+                    raw = etree.tostring(record, encoding='unicode')
+                    lines.append(raw.replace('\n', ' ').replace('\r', ' ') + '\n')  # modification 2: one record per line
+
+                # records are flushed before the checkpoint moves on, a crash in between only re-fetches one page
+                await f.write(''.join(lines))
+                await f.flush()
+                ckpt['resumption_token'] = token
+                ckpt['pages'] = ckpt.get('pages', 0) + 1
+                ckpt['records'] = len(seen)
+                ckpt['complete'] = token is None
+                await asyncio.to_thread(save_checkpoint, ckpt_path, ckpt)
+                if ckpt['pages'] % 10 == 0:
+                    logger.info(f"{ckpt['pages']} pages, {len(seen)} records harvested.")
+                if token is None:
+                    break
+
+        logger.info(f'{category} Metadata for the specified period, {from_date} - {until_date} downloaded.')
+        if os.path.getsize(full_path) == 0:
+            logger.warning("No records found matching the criteria.")
+            return None
+        return full_path
 
     async def retrieve_metadata_by_category(self, category, from_date, until_date, data_path):
         """retrieve metadata by category through OAI protocol
@@ -148,79 +506,12 @@ class ArxivKit:
             from_date (str): The start date for the date range in YYYY-MM-DD format.
             until_date (str): The end date for the date range in YYYY-MM-DD format.
         Returns:
-            str: full path of the downloaded metadata file
+            list of record dicts, use iter_oai_records on the downloaded file to stream records instead
         """
         full_path = await self.download_category_metadata(category, from_date, until_date, data_path)
-        if os.path.exists(full_path) and full_path.endswith('.xml') and os.path.getsize(full_path) > 0:
-            # define namespace
-            namespaces = {
-                'oai': 'http://www.openarchives.org/OAI/2.0/',
-                'arxiv': 'http://arxiv.org/OAI/arXiv/'
-            }
-
-            oai_metadata = []
-            # read xml file by line
-            with open(full_path, 'r', encoding='utf-8') as file:
-                for line in file:
-                    xml_info = ET.fromstring(line)
-                
-                    # target on record element
-                    if xml_info.tag == '{http://www.openarchives.org/OAI/2.0/}record':
-                        # get header info
-                        header = xml_info.find('oai:header', namespaces)
-                        identifier = header.find('oai:identifier', namespaces).text
-                        datestamp = header.find('oai:datestamp', namespaces).text
-                        setSpec = header.find('oai:setSpec', namespaces).text
-
-                        # get metadata
-                        metadata = xml_info.find('oai:metadata', namespaces)
-                        arxiv = metadata.find('arxiv:arXiv', namespaces)
-                        
-                        # get arXiv info
-                        arxiv_id = arxiv.find('arxiv:id', namespaces).text
-                        created = arxiv.find('arxiv:created', namespaces).text
-                        updated = arxiv.find('arxiv:updated', namespaces).text if arxiv.find('arxiv:updated', namespaces) is not None else None
-                        
-                        # get authors info
-                        authors = []
-                        for author in arxiv.findall('arxiv:authors/arxiv:author', namespaces):
-                            keyname = author.find('arxiv:keyname', namespaces).text
-                            forenames = author.find('arxiv:forenames', namespaces).text if author.find('arxiv:forenames', namespaces) is not None else ''
-                            suffix = author.find('arxiv:suffix', namespaces)
-                            suffix_text = suffix.text if suffix is not None else ''
-                            authors.append(f"{forenames} {keyname} {suffix_text}".strip())
-                        
-                        # get title, abstract, etc
-                        title = arxiv.find('arxiv:title', namespaces).text
-                        categories = arxiv.find('arxiv:categories', namespaces).text.split(' ')
-                        comments = arxiv.find('arxiv:comments', namespaces).text if arxiv.find('arxiv:comments', namespaces) is not None else None
-                        journal_ref = arxiv.find('arxiv:journal-ref', namespaces)
-                        journal_ref_text = journal_ref.text if journal_ref is not None else None
-                        doi = arxiv.find('arxiv:doi', namespaces)
-                        doi_text = doi.text if doi is not None else None
-                        license = arxiv.find('arxiv:license', namespaces).text
-                        abstract = arxiv.find('arxiv:abstract', namespaces).text
-
-                        # construct dict
-                        record_data = {
-                            "identifier": identifier,
-                            "datestamp": datestamp,
-                            "setSpec": setSpec,
-                            "arxiv_id": arxiv_id,
-                            "created": created,
-                            "updated": updated,
-                            "authors": authors,
-                            "title": title,
-                            "categories": categories,
-                            "comments": comments,
-                            "journal_ref": journal_ref_text,
-                            "doi": doi_text,
-                            "license": license,
-                            "abstract": abstract
-                        }
-                        oai_metadata.append(record_data)
-        else:
+        if full_path is None:
+            return []  # no records matching the criteria
+        if not os.path.exists(full_path) or not full_path.endswith('.xml'):
             logger.error(f'Unexpected error: Failed to download metadata for category {category} from {from_date} to {until_date}.')
-            raise
-
-        return oai_metadata
\ No newline at end of file
+            raise RuntimeError(f'Failed to download metadata for category {category} from {from_date} to {until_date}.')
+        return list(iter_oai_records(full_path))
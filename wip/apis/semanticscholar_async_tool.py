@@ -0,0 +1,257 @@
+# Async Semantic Scholar client, refer to semanticscholar_tool.py for the sync version
+# same methods and dict outputs as SemanticScholarKit, but requests go straight to the graph API
+# through one pooled aiohttp session, so references / citations of many papers can be fetched concurrently.
+# the rate limiter of the API key tier is shared with the sync kit.
+import random
+import asyncio
+import aiohttp  # pip install aiohttp
+from typing import List, Dict, Optional
+
+from apis.semanticscholar_tool import AdaptiveRateLimiter, shared_limiter
+
+import logging
+logger = logging.getLogger(__name__)
+
+S2_API_URL = 'https://api.semanticscholar.org'
+GRAPH_PATH = '/graph/v1'
+RECOMMENDATIONS_PATH = '/recommendations/v1'
+BATCH_SIZE = 500  # max ids per /paper/batch request
+RETRY_STATUS = {500, 502, 503, 504}
+
+# default fields, same as semanticscholar package
+PAPER_FIELDS = ['abstract', 'authors', 'citationCount', 'citationStyles', 'corpusId', 'externalIds', 'fieldsOfStudy',
+                'influentialCitationCount', 'isOpenAccess', 'journal', 'openAccessPdf', 'paperId', 'publicationDate',
+                'publicationTypes', 'publicationVenue', 'referenceCount', 's2FieldsOfStudy', 'title', 'url', 'venue',
+                'year']
+REFERENCE_FIELDS = ['contexts', 'intents', 'contextsWithIntent', 'isInfluential'] + PAPER_FIELDS
+
+
+class AsyncSemanticScholarKit:
+    def __init__(self, ss_api_key: str = None, ss_api_url: str = None, rate_tier: str = None,
+                 limiter: AdaptiveRateLimiter = None, max_connections: int = 16, max_concurrency: int = 8,
+                 max_retries: int = 5, backoff_base: float = 1.0, backoff_max: float = 30.0, timeout: float = 60):
+        """
+        Args:
+            ss_api_key: (optional) private API key
+            ss_api_url: (optional) custom API url
+            rate_tier: (optional) key of S2_RATE_TIERS, 'api_key' if ss_api_key is given else 'unauthenticated'
+            limiter: (optional) custom limiter, the process-wide limiter of rate_tier by default
+            max_connections: size of the shared connection pool
+            max_concurrency: max number of papers expanded at the same time, refer to get_references_of_papers
+            max_retries: max retries per request on 429, 5xx and connection errors
+            backoff_base: base delay (in seconds) of exponential backoff on 5xx and connection errors
+            backoff_max: max delay (in seconds) between retries
+            timeout: total timeout (in seconds) per request
+        Note:
+            use as async context manager so that the connection pool is released:
+            async with AsyncSemanticScholarKit(api_key) as ss:
+                refs = await ss.get_references_of_papers(paper_ids)
+        """
+        self.api_url = ss_api_url or S2_API_URL
+        self.header = {'x-api-key': ss_api_key} if ss_api_key else {}
+        if rate_tier is None:
+            rate_tier = 'api_key' if ss_api_key else 'unauthenticated'
+        self.limiter = limiter if limiter is not None else shared_limiter(rate_tier)
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """shared client session, created on first use"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def close(self):
+        """release connection pool"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _request(self, path: str, params: Optional[Dict] = None, payload: Optional[Dict] = None):
+        """send request under the rate limiter with retries
+        Args:
+            path: path under api url, e.g. "/graph/v1/paper/batch"
+            params: query parameters
+            payload: json body, POST if given else GET
+        Returns:
+            response json
+        """
+        method = 'POST' if payload is not None else 'GET'
+        url = self.api_url + path
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire_async()
+            try:
+                async with self.session.request(method, url, params=params, json=payload,
+                                                headers=self.header) as response:
+                    if response.status == 429 and attempt < self.max_retries:
+                        retry_after = response.headers.get('Retry-After')
+                        self.limiter.on_throttle(float(retry_after) if retry_after and retry_after.isdigit() else None)
+                        continue
+                    if response.status in RETRY_STATUS and attempt < self.max_retries:
+                        delay = self._backoff(attempt)
+                        logger.warning(f"{method} {url} got {response.status}, retry in {delay:.1f} seconds...")
+                        await asyncio.sleep(delay)
+                        continue
+                    response.raise_for_status()
+                    self.limiter.on_success()
+                    return await response.json()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as err:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"{method} {url} failed: {err!r}, retry in {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
+
+    # get paper information
+    async def search_paper_by_ids(self, id_list, fields: list = None, validate: bool = False) -> List[Dict]:
+        """get papers by ids, batches of 500 ids run concurrently
+        Note:
+            Refer to SemanticScholarKit.search_paper_by_ids, papers not found are skipped.
+        """
+        id_list = [x for x in id_list if x and type(x)==str]
+        params = {"fields": ','.join(fields or PAPER_FIELDS)}
+        batches = [id_list[i:i+BATCH_SIZE] for i in range(0, len(id_list), BATCH_SIZE)]
+        results = await asyncio.gather(*[
+            self._request(f"{GRAPH_PATH}/paper/batch", params=params, payload={"ids": batch}) for batch in batches])
+
+        paper_metadata = []
+        for batch_results in results:
+            if isinstance(batch_results, list):  # error responses come as dict
+                paper_metadata.extend(item for item in batch_results if item is not None)
+        return paper_metadata
+
+    # get paper by search
+    async def search_paper_by_keywords(
+        self,
+        query: str,
+        year: str = None,
+        publication_types: list = None,
+        open_access_pdf: bool = None,
+        venue: list = None,
+        fields_of_study: list = None,
+        publication_date_or_year: str = None,
+        min_citation_count: int = None,
+        limit: int = 100,
+        bulk: bool = False,
+        sort: str = None,
+        match_title: bool = False
+    ) -> List[Dict]:
+        """search papers by keywords
+        Note:
+            Refer to SemanticScholarKit.search_paper_by_keywords, at most 100 papers are returned.
+        """
+        max_result = min(limit, 100)
+        params = {"query": query, "fields": ','.join(PAPER_FIELDS)}
+        optional = {"year": year,
+                    "publicationTypes": ','.join(publication_types) if publication_types else None,
+                    "openAccessPdf": '' if open_access_pdf else None,
+                    "venue": ','.join(venue) if venue else None,
+                    "fieldsOfStudy": ','.join(fields_of_study) if fields_of_study else None,
+                    "publicationDateOrYear": publication_date_or_year,
+                    "minCitationCount": min_citation_count}
+        params.update({k: v for k, v in optional.items() if v is not None})
+
+        path = f"{GRAPH_PATH}/paper/search"
+        if match_title:
+            path += '/match'
+        elif bulk:
+            path += '/bulk'
+            if sort:
+                params['sort'] = sort
+        else:
+            params['limit'] = max_result
+        results = await self._request(path, params=params)
+        return (results.get('data') or [])[0:max_result]
+
+    # get paper references
+    async def get_semanticscholar_references(
+        self,
+        paper_id: str,
+        fields: list = None,
+        limit: int = 100
+    ) -> List[Dict]:
+        """Get details about a paper's references
+        Note:
+            Refer to SemanticScholarKit.get_semanticscholar_references.
+        """
+        params = {"fields": ','.join(fields or REFERENCE_FIELDS), "limit": limit}
+        results = await self._request(f"{GRAPH_PATH}/paper/{paper_id}/references", params=params)
+        return (results.get('data') or [])[0:limit]
+
+    # get paper citedby
+    async def get_semanticscholar_citedby(
+        self,
+        paper_id: str,
+        fields: list = None,
+        limit: int = 100
+    ) -> List[Dict]:
+        """Get details about a paper's citations
+        Note:
+            Refer to SemanticScholarKit.get_semanticscholar_citedby.
+        """
+        params = {"fields": ','.join(fields or REFERENCE_FIELDS), "limit": limit}
+        results = await self._request(f"{GRAPH_PATH}/paper/{paper_id}/citations", params=params)
+        return (results.get('data') or [])[0:limit]
+
+    async def find_recommendations(
+        self,
+        positive_paper_ids: List[str],
+        negative_paper_ids: List[str] = None,
+        fields: list = None,
+        limit: int = 100
+    ) -> List[Dict]:
+        """Get recommended papers for lists of positive and negative examples.
+        Note:
+            Refer to SemanticScholarKit.find_recommendations.
+        """
+        params = {"fields": ','.join(fields or PAPER_FIELDS), "limit": limit}
+        payload = {"positivePaperIds": positive_paper_ids, "negativePaperIds": negative_paper_ids or []}
+        results = await self._request(f"{RECOMMENDATIONS_PATH}/papers/", params=params, payload=payload)
+        return (results.get('recommendedPapers') or [])[0:limit]
+
+    # expand many papers concurrently
+    async def _map_papers(self, func, paper_ids: List[str], **kwargs) -> Dict[str, Optional[List[Dict]]]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(paper_id):
+            async with semaphore:
+                try:
+                    return await func(paper_id, **kwargs)
+                except Exception as err:
+                    logger.error(f"{func.__name__} failed for {paper_id}: {err!r}")
+                    return None
+
+        results = await asyncio.gather(*[run(paper_id) for paper_id in paper_ids])
+        return dict(zip(paper_ids, results))
+
+    async def get_references_of_papers(self, paper_ids: List[str], fields: list = None,
+                                       limit: int = 100) -> Dict[str, Optional[List[Dict]]]:
+        """get references of many papers concurrently
+        Returns:
+            {paper_id: references (refer to get_semanticscholar_references)}, None if failed
+        """
+        return await self._map_papers(self.get_semanticscholar_references, paper_ids, fields=fields, limit=limit)
+
+    async def get_citedby_of_papers(self, paper_ids: List[str], fields: list = None,
+                                    limit: int = 100) -> Dict[str, Optional[List[Dict]]]:
+        """get citations of many papers concurrently
+        Returns:
+            {paper_id: citations (refer to get_semanticscholar_citedby)}, None if failed
+        """
+        return await self._map_papers(self.get_semanticscholar_citedby, paper_ids, fields=fields, limit=limit)
@@ -3,22 +3,160 @@
 
 import math
 import time
-import random
+import asyncio
+import threading
 from semanticscholar import SemanticScholar  # pip install semanticscholar 
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# request rate (per second) by API key tier, refer to https://www.semanticscholar.org/product/api
+# unauthenticated requests share one pool with all other users, so start lower and let the limiter adapt
+S2_RATE_TIERS = {
+    'unauthenticated': {"rate": 0.5, "burst": 1, "min_rate": 0.05},
+    'api_key': {"rate": 1.0, "burst": 1, "min_rate": 0.1},
+}
+
+
+class AdaptiveRateLimiter:
+    """token bucket shared by Semantic Scholar requests, usable from threads and coroutines
+    Note:
+        every 429 cuts the rate by `decrease` and holds requests for `cooldown` seconds,
+        every `relax_after` successes in a row raise it by `increase`, within [min_rate, max_rate].
+    """
+    def __init__(self, rate: float, burst: int = 1, min_rate: Optional[float] = None, max_rate: Optional[float] = None,
+                 decrease: float = 0.5, increase: float = 1.1, relax_after: int = 20, cooldown: float = 5.0):
+        """
+        Args:
+            rate: initial requests per second
+            burst: max number of requests sent back to back
+            min_rate: (optional) floor of rate after 429s, rate / 10 by default
+            max_rate: (optional) ceiling of rate after successes, initial rate by default
+            decrease: rate multiplier on 429
+            increase: rate multiplier after relax_after successes in a row
+            relax_after: number of successes in a row before raising the rate
+            cooldown: seconds to hold requests after 429 when Retry-After is unknown
+        """
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate if min_rate is not None else rate / 10
+        self.max_rate = max_rate if max_rate is not None else rate
+        self.decrease = decrease
+        self.increase = increase
+        self.relax_after = relax_after
+        self.cooldown = cooldown
+        self.tokens = float(burst)  # negative when requests are queued
+        self.updated = time.monotonic()
+        self.successes = 0
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "throttled": 0, "wait_time": 0.0, "max_wait": 0.0}
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """take one token
+        Returns:
+            seconds to wait before sending the request
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            wait = max(0.0, -self.tokens / self.rate)
+            self.stats['requests'] += 1
+            self.stats['wait_time'] += wait
+            self.stats['max_wait'] = max(self.stats['max_wait'], wait)
+        return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.successes += 1
+            if self.successes >= self.relax_after and self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate * self.increase)
+                self.successes = 0
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        """tighten after 429: lower the rate and hold every caller for retry_after (or cooldown) seconds"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.successes = 0
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            hold = retry_after if retry_after is not None else self.cooldown
+            self.tokens = min(self.tokens, 0.0) - hold * self.rate
+            self.stats['throttled'] += 1
+        logger.warning(f"Semantic Scholar rate limited, rate lowered to {self.rate:.3f} requests/s.")
+
+    def metrics(self) -> Dict:
+        """current rate and wait time statistics"""
+        with self._lock:
+            requests = self.stats['requests']
+            return {**self.stats, "rate": self.rate,
+                    "avg_wait": self.stats['wait_time'] / requests if requests else 0.0}
+
+
+_SHARED_LIMITERS = {}
+_SHARED_LIMITERS_LOCK = threading.Lock()
+
+
+def shared_limiter(tier: str) -> AdaptiveRateLimiter:
+    """process-wide limiter of the API key tier (refer to S2_RATE_TIERS), shared by all kits"""
+    with _SHARED_LIMITERS_LOCK:
+        if tier not in _SHARED_LIMITERS:
+            _SHARED_LIMITERS[tier] = AdaptiveRateLimiter(**S2_RATE_TIERS[tier])
+        return _SHARED_LIMITERS[tier]
+
+
+def is_rate_limited(err: Exception) -> bool:
+    """semanticscholar raises ConnectionRefusedError on 429, wrapped in tenacity RetryError when retry is off"""
+    last_attempt = getattr(err, 'last_attempt', None)
+    if last_attempt is not None:
+        err = last_attempt.exception()
+    return isinstance(err, ConnectionRefusedError)
+
 
 class SemanticScholarKit:
-    def __init__(self, ss_api_key: str = None, ss_api_url: str = None):
+    def __init__(self, ss_api_key: str = None, ss_api_url: str = None, rate_tier: str = None,
+                 limiter: AdaptiveRateLimiter = None, max_retries: int = 5):
         """
         :param str ss_api_key: (optional) private API key.
         :param str ss_api_url: (optional) custom API url.
+        :param str rate_tier: (optional) key of S2_RATE_TIERS, 'api_key' if ss_api_key is given else 'unauthenticated'.
+        :param AdaptiveRateLimiter limiter: (optional) custom limiter, the process-wide limiter of rate_tier by default.
+        :param int max_retries: (optional) retries of a request after 429.
         """
-        self.scholar = SemanticScholar(api_key=ss_api_key, api_url=ss_api_url)
+        # retries are left to the limiter instead of semanticscholar's fixed 30 seconds wait
+        self.scholar = SemanticScholar(api_key=ss_api_key, api_url=ss_api_url, retry=False)
+        if rate_tier is None:
+            rate_tier = 'api_key' if ss_api_key else 'unauthenticated'
+        self.limiter = limiter if limiter is not None else shared_limiter(rate_tier)
+        self.max_retries = max_retries
+
+    def _call(self, func, *args, **kwargs):
+        """call semanticscholar under the rate limiter, retry after 429"""
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as err:
+                if not is_rate_limited(err) or attempt == self.max_retries:
+                    raise
+                self.limiter.on_throttle()
+                continue
+            self.limiter.on_success()
+            return result
 
     # get paper information
     def search_paper_by_ids(self, id_list, fields: list = None, validate: bool = False) -> List[Dict]:
@@ -49,10 +187,9 @@ class SemanticScholarKit:
             batch_cnt = math.ceil(id_cnt / 500)
             for i in range(batch_cnt):
                 batch_ids = id_list[i*500:(i+1)*500]
-                batch_results = self.scholar.get_papers(paper_ids=batch_ids, fields=fields)
+                batch_results = self._call(self.scholar.get_papers, paper_ids=batch_ids, fields=fields)
                 for item in batch_results:
                     paper_metadata.append(item.__dict__.get('_data', {}))
-                time.sleep(random.uniform(10, 15))
         return paper_metadata
 
     # get paper by search
@@ -112,7 +249,7 @@ class SemanticScholarKit:
             Refer to search_paper function.
         """
         max_result = min(limit, 100)
-        results = self.scholar.search_paper(query=query,
+        results = self._call(self.scholar.search_paper, query=query,
                 year=year,
                 publication_types=publication_types,
                 open_access_pdf=open_access_pdf,
@@ -160,7 +297,7 @@ class SemanticScholarKit:
         Note:
             Null data for newly released papers.
         """
-        results = self.scholar.get_paper_references(paper_id, fields,limit)
+        results = self._call(self.scholar.get_paper_references, paper_id, fields, limit)
 
         refs_metadata = []
         for item in results[0:limit]:
@@ -195,7 +332,7 @@ class SemanticScholarKit:
                            'citingPaper'  # cited paper metadata
                            ])
         """
-        results = self.scholar.get_paper_citations(paper_id, fields, limit)
+        results = self._call(self.scholar.get_paper_citations, paper_id, fields, limit)
     
         citedby_metadata = []
         for item in results[0:limit]:
@@ -221,7 +358,7 @@ class SemanticScholarKit:
         Returns:
             :returns: list of recommendations.
         """
-        results = self.scholar.get_recommended_papers_from_lists(
+        results = self._call(self.scholar.get_recommended_papers_from_lists,
             positive_paper_ids, negative_paper_ids, fields, limit
             )
         
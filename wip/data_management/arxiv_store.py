@@ -0,0 +1,235 @@
+# Local arXiv metadata store
+# harvested OAI records (refer to apis/arxiv_tool.py) in SQLite with primary-key lookup by arxiv_id,
+# FTS5 full text index over title and abstract, and category / date secondary indexes.
+import re
+import json
+import sqlite3
+import threading
+from typing import List, Dict, Optional, Iterable
+
+import logging
+logger = logging.getLogger(__name__)
+
+ARXIV_ID_PTRN = re.compile(r'^(?:arxiv:|https?://arxiv\.org/abs/)?(.+?)(?:v\d+)?$', re.IGNORECASE)
+
+RECORD_COLUMNS = ['arxiv_id', 'identifier', 'datestamp', 'setSpec', 'created', 'updated', 'authors', 'title',
+                  'categories', 'comments', 'journal_ref', 'doi', 'license', 'abstract']
+JSON_COLUMNS = ('authors', 'categories')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS arxiv_papers (
+    arxiv_id TEXT PRIMARY KEY,
+    identifier TEXT,
+    datestamp TEXT,
+    setSpec TEXT,
+    created TEXT,
+    updated TEXT,
+    authors TEXT,      -- json list
+    title TEXT,
+    categories TEXT,   -- json list
+    comments TEXT,
+    journal_ref TEXT,
+    doi TEXT,
+    license TEXT,
+    abstract TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_arxiv_papers_created ON arxiv_papers(created);
+CREATE INDEX IF NOT EXISTS idx_arxiv_papers_datestamp ON arxiv_papers(datestamp);
+
+CREATE TABLE IF NOT EXISTS arxiv_categories (
+    category TEXT,
+    arxiv_id TEXT,
+    created TEXT,
+    PRIMARY KEY (category, arxiv_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_arxiv_categories_created ON arxiv_categories(category, created);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS arxiv_fts USING fts5(
+    title, abstract, content='arxiv_papers', content_rowid='rowid', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS arxiv_papers_ai AFTER INSERT ON arxiv_papers BEGIN
+    INSERT INTO arxiv_fts(rowid, title, abstract) VALUES (new.rowid, new.title, new.abstract);
+END;
+CREATE TRIGGER IF NOT EXISTS arxiv_papers_ad AFTER DELETE ON arxiv_papers BEGIN
+    INSERT INTO arxiv_fts(arxiv_fts, rowid, title, abstract) VALUES ('delete', old.rowid, old.title, old.abstract);
+END;
+CREATE TRIGGER IF NOT EXISTS arxiv_papers_au AFTER UPDATE ON arxiv_papers BEGIN
+    INSERT INTO arxiv_fts(arxiv_fts, rowid, title, abstract) VALUES ('delete', old.rowid, old.title, old.abstract);
+    INSERT INTO arxiv_fts(rowid, title, abstract) VALUES (new.rowid, new.title, new.abstract);
+END;
+"""
+
+UPSERT_SQL = f"""
+INSERT INTO arxiv_papers ({', '.join(RECORD_COLUMNS)}) VALUES ({', '.join('?' * len(RECORD_COLUMNS))})
+ON CONFLICT(arxiv_id) DO UPDATE SET {', '.join(f'{c}=excluded.{c}' for c in RECORD_COLUMNS[1:])}
+WHERE excluded.datestamp IS NULL OR arxiv_papers.datestamp IS NULL OR excluded.datestamp >= arxiv_papers.datestamp
+"""
+
+
+def normalize_arxiv_id(arxiv_id: str) -> str:
+    """strip prefix and version, e.g. "arXiv:2401.00001v2" -> "2401.00001" """
+    return ARXIV_ID_PTRN.match(arxiv_id.strip()).group(1)
+
+
+def fts_query(query_term: str) -> str:
+    """quote each term so that user input is never parsed as FTS5 syntax"""
+    terms = re.findall(r'\w+', query_term)
+    return ' '.join(f'"{t}"' for t in terms)
+
+
+class ArxivMetadataStore:
+    """SQLite store of arXiv metadata records (dict layout of apis.arxiv_tool.parse_oai_record)"""
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: sqlite database file, created if not exists
+        """
+        self.db_path = db_path
+        self._local = threading.local()  # one connection per thread
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @staticmethod
+    def _to_row(record: Dict) -> tuple:
+        row = []
+        for col in RECORD_COLUMNS:
+            value = record.get(col)
+            if col == 'arxiv_id':
+                value = normalize_arxiv_id(value)
+            elif col in JSON_COLUMNS:
+                value = json.dumps(value or [], ensure_ascii=False)
+            row.append(value)
+        return tuple(row)
+
+    @staticmethod
+    def _to_record(row: sqlite3.Row) -> Dict:
+        record = {col: row[col] for col in RECORD_COLUMNS}
+        for col in JSON_COLUMNS:
+            record[col] = json.loads(record[col]) if record[col] else []
+        return record
+
+    def upsert(self, records: Iterable[Dict], batch_size: int = 5000) -> int:
+        """insert records, existing papers are updated unless the stored record is newer
+        Args:
+            records: iterable of record dicts, e.g. apis.arxiv_tool.iter_oai_records(path)
+            batch_size: records per transaction
+        Returns:
+            number of records written
+        """
+        cnt, rows = 0, []
+        for record in records:
+            if not record.get('arxiv_id'):
+                continue
+            rows.append(self._to_row(record))
+            if len(rows) >= batch_size:
+                cnt += self._write(rows)
+                rows = []
+        if rows:
+            cnt += self._write(rows)
+        return cnt
+
+    def _write(self, rows: List[tuple], chunk_size: int = 500) -> int:
+        ids = list(dict.fromkeys(row[0] for row in rows))
+        with self.conn:
+            self.conn.executemany(UPSERT_SQL, rows)
+            # rebuild category rows from the stored records, the upsert may have kept a newer version
+            for i in range(0, len(ids), chunk_size):
+                chunk = ids[i:i+chunk_size]
+                placeholders = ', '.join('?' * len(chunk))
+                self.conn.execute(f"DELETE FROM arxiv_categories WHERE arxiv_id IN ({placeholders})", chunk)
+                stored = self.conn.execute(
+                    f"SELECT arxiv_id, categories, created FROM arxiv_papers WHERE arxiv_id IN ({placeholders})",
+                    chunk).fetchall()
+                cat_rows = [(cat, row['arxiv_id'], row['created'])
+                            for row in stored for cat in json.loads(row['categories'] or '[]')]
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO arxiv_categories (category, arxiv_id, created) VALUES (?, ?, ?)", cat_rows)
+        return len(rows)
+
+    def get(self, arxiv_id: str) -> Optional[Dict]:
+        """get record by arxiv id (version and "arXiv:" prefix are ignored)"""
+        row = self.conn.execute("SELECT * FROM arxiv_papers WHERE arxiv_id = ?",
+                                (normalize_arxiv_id(arxiv_id),)).fetchone()
+        return self._to_record(row) if row is not None else None
+
+    def get_many(self, arxiv_ids: List[str], chunk_size: int = 500) -> Dict[str, Dict]:
+        """get records by arxiv ids
+        Returns:
+            {normalized arxiv id: record} for ids found in store
+        """
+        ids = list(dict.fromkeys(normalize_arxiv_id(x) for x in arxiv_ids))
+        found = {}
+        for i in range(0, len(ids), chunk_size):  # stay below sqlite variable limit
+            chunk = ids[i:i+chunk_size]
+            rows = self.conn.execute(f"SELECT * FROM arxiv_papers WHERE arxiv_id IN ({', '.join('?' * len(chunk))})",
+                                     chunk).fetchall()
+            for row in rows:
+                found[row['arxiv_id']] = self._to_record(row)
+        return found
+
+    def search(self, query_term: str, max_cnt: int = 100, category: Optional[str] = None,
+               from_date: Optional[str] = None, until_date: Optional[str] = None) -> List[Dict]:
+        """full text search over title and abstract, ranked by bm25 (title weighted higher)
+        Args:
+            query_term: keywords
+            max_cnt: max number of records
+            category: (optional) arXiv category like "cs.CL"
+            from_date: (optional) min created date in YYYY-MM-DD format
+            until_date: (optional) max created date in YYYY-MM-DD format
+        """
+        match = fts_query(query_term)
+        if not match:
+            return []
+        sql = ["SELECT p.* FROM arxiv_fts JOIN arxiv_papers p ON p.rowid = arxiv_fts.rowid"]
+        params = []
+        if category is not None:
+            sql.append("JOIN arxiv_categories c ON c.arxiv_id = p.arxiv_id AND c.category = ?")
+            params.append(category)
+        sql.append("WHERE arxiv_fts MATCH ?")
+        params.append(match)
+        if from_date is not None:
+            sql.append("AND p.created >= ?")
+            params.append(from_date)
+        if until_date is not None:
+            sql.append("AND p.created <= ?")
+            params.append(until_date)
+        sql.append("ORDER BY bm25(arxiv_fts, 2.0, 1.0) LIMIT ?")
+        params.append(max_cnt)
+        return [self._to_record(row) for row in self.conn.execute(' '.join(sql), params)]
+
+    def by_category(self, category: str, from_date: Optional[str] = None, until_date: Optional[str] = None,
+                    max_cnt: Optional[int] = None) -> List[Dict]:
+        """records of category created within date range, newest first"""
+        sql = ["SELECT p.* FROM arxiv_categories c JOIN arxiv_papers p ON p.arxiv_id = c.arxiv_id WHERE c.category = ?"]
+        params = [category]
+        if from_date is not None:
+            sql.append("AND c.created >= ?")
+            params.append(from_date)
+        if until_date is not None:
+            sql.append("AND c.created <= ?")
+            params.append(until_date)
+        sql.append("ORDER BY c.created DESC")
+        if max_cnt is not None:
+            sql.append("LIMIT ?")
+            params.append(max_cnt)
+        return [self._to_record(row) for row in self.conn.execute(' '.join(sql), params)]
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM arxiv_papers").fetchone()[0]
@@ -0,0 +1,62 @@
+# Persisted alignment state for incremental post process
+# content list items are fingerprinted by their MinerU content, alignment results are kept per fingerprint,
+# so that re-running MinerU on a paper only re-aligns new or changed items.
+import os
+import json
+import hashlib
+from collections import Counter
+from typing import List, Dict, Optional
+
+# fields written by PDFProcess.align_md_toc, align_content_json and align_reference_info
+ALIGN_FIELDS = ['type', 'if_aligned', 'text_level', 'aligned_text', 'if_appendix', 'if_collapse',
+                'id', 'related_ids', 'ss_paper_id']
+
+# MinerU fields that identify an item's content (page_idx is left out as it may shift between runs)
+CONTENT_FIELDS = ['type', 'text', 'text_level', 'img_path', 'img_caption', 'img_footnote',
+                  'table_caption', 'table_footnote', 'table_body', 'text_format']
+
+
+def hash_json(data) -> str:
+    return hashlib.sha1(json.dumps(data, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def fingerprint_items(pdf_json: List[Dict]) -> List[str]:
+    """fingerprint raw content list items (before alignment)
+    Note:
+        identical items are told apart by their occurrence count, e.g. "<hash>#0", "<hash>#1".
+    """
+    seen = Counter()
+    fps = []
+    for item in pdf_json:
+        digest = hash_json({k: item.get(k) for k in CONTENT_FIELDS if k in item})
+        fps.append(f"{digest}#{seen[digest]}")
+        seen[digest] += 1
+    return fps
+
+
+def toc_fingerprint(pdf_toc: List[Dict]) -> str:
+    return hash_json([[x.get('level'), x.get('title'), x.get('page'), x.get('nameddest')] for x in pdf_toc])
+
+
+def reference_fingerprint(reference_metadata: Optional[List[Dict]]) -> Optional[str]:
+    if reference_metadata is None:
+        return None
+    return hash_json([[ref.get('citedPaper', {}).get('paperId'), ref.get('citedPaper', {}).get('title')]
+                      for ref in reference_metadata])
+
+
+def load_align_state(state_path: str, toc_fp: str, ref_fp: Optional[str]) -> Dict:
+    """load alignment state, start from scratch if toc or references changed"""
+    empty = {"toc_fp": toc_fp, "ref_fp": ref_fp, "items": {}, "toc_idx": {}}
+    if state_path is None or not os.path.exists(state_path):
+        return empty
+    with open(state_path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    if state.get('toc_fp') != toc_fp or state.get('ref_fp') != ref_fp:
+        return empty
+    return state
+
+
+def save_align_state(state: Dict, state_path: str):
+    with open(state_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
@@ -151,4 +151,29 @@ def dump_toml(spn: dict, level: int, trail_nl: bool = False) -> str:
     if trail_nl:
         result.append("")
 
-    return '\n'.join(result)
\ No newline at end of file
+    return '\n'.join(result)
+
+
+def dump_heading(spn: dict, level: int) -> dict:
+    """Build the heading filter dict that `dump_toml` would produce
+
+    Same effective settings as the toml string (level, greedy, font name and
+    size), but without the round trip through `toml.loads`.
+
+    Argument
+      spn: span dict of the heading
+      level: heading level
+    Returns
+      a heading filter dict usable in `{'heading': [...]}` recipes
+    """
+    before, sep, after = spn['font'].partition('+')
+    font = after if sep else before
+
+    return {
+        'level': level,
+        'greedy': True,
+        'font': {
+            'name': font,
+            'size': spn['size'],
+        },
+    }
\ No newline at end of file
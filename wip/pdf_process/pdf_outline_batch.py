@@ -0,0 +1,259 @@
+# Batch outline generation
+# run PDFOutline over a whole directory (or manifest) of pdf files and stream results to jsonl
+import os
+import json
+import time
+import signal
+import multiprocessing
+from pathlib import Path
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Iterator
+
+from pdf_process.pdf_outline_gen import PDFOutline, toc_to_jsonable
+from pdf_process.pdf_recipe_cache import RecipeCache
+
+_RECIPE_CACHE = None  # recipe cache of current worker process
+
+
+def _init_worker(cache_size, pid_queue=None):
+    """create one recipe cache per worker process (pymupdf documents are not shared across processes)
+    Args:
+        cache_size: size of recipe cache
+        pid_queue: (optional) queue to report worker pid to, so that hung workers can be killed
+    """
+    global _RECIPE_CACHE
+    _RECIPE_CACHE = RecipeCache(max_size=cache_size)
+    if pid_queue is not None:
+        pid_queue.put(os.getpid())
+
+
+def list_pdf_files(input_path: str) -> List[str]:
+    """list pdf files from a directory or a manifest
+    Args:
+        input_path: directory (searched recursively for pdf files),
+            or manifest file: .jsonl with "pdf_path" key per line, or plain text with one path per line
+    Returns:
+        list of pdf paths
+    """
+    if os.path.isdir(input_path):
+        return sorted(str(p) for p in Path(input_path).rglob('*') if p.suffix.lower() == '.pdf')
+
+    pdf_files = []
+    with open(input_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if input_path.endswith('.jsonl'):
+                pdf_files.append(json.loads(line).get('pdf_path'))
+            else:
+                pdf_files.append(line)
+    return [x for x in pdf_files if x]
+
+
+def outline_one(pdf_path: str, excpert_len: int = 300) -> Dict:
+    """generate outline for one pdf, try toc_extraction first and fall back to toc_detection
+    Returns:
+        dict with pdf_path, method, toc, error and per-stage timings (in seconds)
+    """
+    result = {"pdf_path": pdf_path, "method": None, "toc": [], "error": None, "timings": {}}
+    start = time.perf_counter()
+    try:
+        with PDFOutline(pdf_path, recipe_cache=_RECIPE_CACHE) as outline:
+            if outline.doc is None:
+                raise RuntimeError(f"failed to open {pdf_path}")
+            result['timings']['open'] = time.perf_counter() - start
+
+            tic = time.perf_counter()
+            pdf_toc = outline.toc_extraction(excpert_len)
+            result['timings']['extraction'] = time.perf_counter() - tic
+            method = 'extraction'
+
+            if len(pdf_toc) == 0:
+                tic = time.perf_counter()
+                pdf_toc = outline.toc_detection(excpert_len)
+                result['timings']['detection'] = time.perf_counter() - tic
+                method = 'detection'
+
+            result['method'] = method
+            result['toc'] = toc_to_jsonable(outline.identify_toc_appendix(pdf_toc))
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['timings']['total'] = time.perf_counter() - start
+    return result
+
+
+def _failed_result(pdf_path: str, error: str) -> Dict:
+    return {"pdf_path": pdf_path, "method": None, "toc": [], "error": error, "timings": {}}
+
+
+def _load_done(output_path: str) -> set:
+    """get pdf paths already written to output jsonl"""
+    done = set()
+    if os.path.exists(output_path):
+        with open(output_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line).get('pdf_path'))
+                except json.JSONDecodeError:
+                    continue  # partially written line from an interrupted run
+    return done
+
+
+def _drop_partial_line(output_path: str, block_size: int = 4096):
+    """truncate the partially written last line of an interrupted run, so that appended results start on a new line"""
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, 'rb+') as f:
+        end = pos = f.seek(0, os.SEEK_END)
+        while pos > 0:
+            step = min(block_size, pos)
+            f.seek(pos - step)
+            idx = f.read(step).rfind(b'\n')
+            if idx >= 0:
+                pos = pos - step + idx + 1
+                break
+            pos -= step
+        if pos < end:
+            f.truncate(pos)
+
+
+def _shutdown_pool(executor: ProcessPoolExecutor, pid_queue):
+    """stop pool without waiting for hung workers, workers are killed by the pids reported in _init_worker"""
+    pids = set()
+    while not pid_queue.empty():
+        pids.add(pid_queue.get())
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except (ProcessLookupError, PermissionError):
+            pass  # worker already exited
+    executor.shutdown(wait=True, cancel_futures=True)
+    pid_queue.close()
+
+
+def iter_batch_outline(pdf_files: List[str],
+                       max_workers: int = 4,
+                       excpert_len: int = 300,
+                       cache_size: int = 256,
+                       timeout: float = 300,
+                       max_retries: int = 1) -> Iterator[Dict]:
+    """generate outlines on a bounded process pool, yield results as soon as they finish
+    Args:
+        pdf_files: list of pdf paths
+        max_workers: number of worker processes
+        excpert_len: excerpt lenght of initial text
+        cache_size: size of recipe cache in each worker
+        timeout: max seconds per file, None for no limit
+        max_retries: max retries of a file in flight when a worker process died
+    Note:
+        at most max_workers files are in flight, so the pending queue stays small for huge batches and
+        the timeout of a file counts its own run time only.
+        a file over timeout is yielded as failed, the pool is rebuilt as hung workers can't be reused,
+        and the other in-flight files are resubmitted. same for a broken pool (e.g. a worker killed by a crash
+        in pymupdf), where files in flight are retried one at a time and yielded as failed after max_retries.
+    """
+    pdf_iter = iter(pdf_files)
+    retry_queue = []  # in-flight files of a stopped pool
+    attempts = Counter()
+
+    def new_pool():
+        pid_queue = multiprocessing.SimpleQueue()
+        executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                       initargs=(cache_size, pid_queue))
+        return executor, pid_queue
+
+    executor, pid_queue = new_pool()
+    pending = {}  # future -> (pdf_path, deadline)
+    try:
+        while True:
+            while len(pending) < max_workers:
+                pdf_path = retry_queue.pop() if retry_queue else next(pdf_iter, None)
+                if pdf_path is None:
+                    break
+                if pending and (attempts[pdf_path] or any(attempts[x] for x, _ in pending.values())):
+                    retry_queue.append(pdf_path)  # retried files run alone, so that only the crashing file fails again
+                    break
+                deadline = time.monotonic() + timeout if timeout is not None else None
+                pending[executor.submit(outline_one, pdf_path, excpert_len)] = (pdf_path, deadline)
+            if not pending:
+                break
+
+            wait_time = None
+            if timeout is not None:
+                wait_time = max(0.0, min(deadline for _, deadline in pending.values()) - time.monotonic())
+            done, _ = wait(pending, timeout=wait_time, return_when=FIRST_COMPLETED)
+
+            broken = False
+            for future in done:
+                pdf_path, _ = pending.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    broken = True
+                    attempts[pdf_path] += 1
+                    if attempts[pdf_path] <= max_retries:
+                        retry_queue.append(pdf_path)
+                        continue
+                    result = _failed_result(pdf_path, f"{type(e).__name__}: {e}")
+                except Exception as e:
+                    result = _failed_result(pdf_path, f"{type(e).__name__}: {e}")
+                yield result
+
+            now = time.monotonic()
+            expired = [future for future, (_, deadline) in pending.items() if deadline is not None and deadline <= now]
+            for future in expired:
+                pdf_path, _ = pending.pop(future)
+                yield _failed_result(pdf_path, f"TimeoutError: exceeded {timeout} seconds")
+
+            if broken or expired:
+                retry_queue.extend(pdf_path for pdf_path, _ in pending.values())
+                pending = {}
+                _shutdown_pool(executor, pid_queue)
+                executor, pid_queue = new_pool()
+    finally:
+        _shutdown_pool(executor, pid_queue)
+
+
+def batch_outline(input_path: str,
+                  output_path: str,
+                  max_workers: int = 4,
+                  excpert_len: int = 300,
+                  timeout: float = 300,
+                  resume: bool = True) -> Dict:
+    """outline all pdf files in a directory or manifest and stream results to jsonl
+    Args:
+        input_path: directory or manifest of pdf files, refer to list_pdf_files
+        output_path: output jsonl file, one line per pdf
+        max_workers: number of worker processes
+        excpert_len: excerpt lenght of initial text
+        timeout: max seconds per file, refer to iter_batch_outline
+        resume: skip pdf files already in output_path
+    Returns:
+        summary of the batch run
+    """
+    pdf_files = list_pdf_files(input_path)
+    if resume:
+        _drop_partial_line(output_path)
+        done = _load_done(output_path)
+        pdf_files = [x for x in pdf_files if x not in done]
+
+    summary = {"total": len(pdf_files), "extraction": 0, "detection": 0, "failed": 0, "elapsed": 0.0}
+    start = time.perf_counter()
+    with open(output_path, 'a' if resume else 'w', encoding='utf-8') as f:
+        for i, result in enumerate(iter_batch_outline(pdf_files, max_workers, excpert_len, timeout=timeout)):
+            f.write(json.dumps(result, ensure_ascii=False) + '\n')
+            f.flush()
+
+            if result['error'] is not None:
+                summary['failed'] += 1
+            else:
+                summary[result['method']] += 1
+            if (i + 1) % 1000 == 0:
+                print(f"{i + 1}/{len(pdf_files)} pdf files outlined.")
+
+    summary['elapsed'] = time.perf_counter() - start
+    print(f"Batch outline finished: {summary}")
+    return summary
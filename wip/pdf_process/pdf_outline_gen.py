@@ -1,14 +1,17 @@
 import re
 import fitz
-import toml
 import copy
+import time
+from bisect import bisect_left
 from collections import Counter
 from typing import List, Dict, Optional
 
-from pdf_process.pdf_meta_det import extract_meta, dump_toml
-from pdf_process.pdf_toc_det import gen_toc
+from pdf_process.pdf_meta_det import extract_meta, dump_heading
+from pdf_process.pdf_toc_det import Point, Recipe, gen_toc
+from pdf_process.pdf_recipe_cache import RecipeCache
 
-from pdf_process import SECTION_TITLES, APPENDDIX_TITLES
+from pdf_process import SECTION_TITLES
+from pdf_process.pdf_title_align import is_appendix_title
 
 def count_by_keys(lst_dct, keys):
     """get item count within a list of dict by specified dict keys
@@ -27,11 +30,106 @@ def count_by_keys(lst_dct, keys):
     return sorted_result
 
 
+def toc_to_jsonable(pdf_toc: List[Dict]) -> List[Dict]:
+    """copy toc with position points converted to [x, y], so that toc could be dumped as json"""
+    toc_json = []
+    for item in pdf_toc:
+        item = copy.copy(item)
+        pos = item.get('position')
+        if pos is not None and not isinstance(pos, (list, tuple)):
+            item['position'] = [pos.x, pos.y]
+        toc_json.append(item)
+    return toc_json
+
+
+class PageBlockIndex:
+    """text blocks of a page sorted by reading position, used to fetch excerpts from an anchor point"""
+    def __init__(self, page, anchor_tolerance: float = 1.0, min_col_share: float = 0.25):
+        """
+        Args:
+            page: pymupdf page
+            anchor_tolerance: vertical tolerance (in points) when locating the first block after an anchor
+            min_col_share: min share of text area each half must hold for the page to count as two-column
+        """
+        self.mid_x = page.rect.width / 2
+        self.anchor_tolerance = anchor_tolerance
+
+        blocks = [blk for blk in page.get_text("blocks") if blk[6] == 0]  # text blocks only
+        self.n_cols = 2 if self.is_two_column(blocks, self.mid_x, min_col_share) else 1
+
+        blocks.sort(key=lambda blk: (self.column(blk[0]), blk[1], blk[0]))
+        self.keys = [(self.column(blk[0]), blk[1], blk[0]) for blk in blocks]
+        self.texts = [blk[4] for blk in blocks]
+
+    @staticmethod
+    def is_two_column(blocks, mid_x: float, min_col_share: float = 0.25) -> bool:
+        """check if both halves of the page hold a large share of the text area
+        Note:
+            blocks crossing the middle (titles, full width figures) only count to the total, so small blocks
+            right of center like equation numbers, headers or footnote markers don't make a page two-column.
+        """
+        area = lambda blk: (blk[2] - blk[0]) * (blk[3] - blk[1])
+        total = sum(area(blk) for blk in blocks)
+        left = sum(area(blk) for blk in blocks if blk[2] <= mid_x)
+        right = sum(area(blk) for blk in blocks if blk[0] >= mid_x)
+        return total > 0 and left >= min_col_share * total and right >= min_col_share * total
+
+    def column(self, x: float) -> int:
+        """get column index for x coordinate"""
+        return 1 if self.n_cols == 2 and x >= self.mid_x else 0
+
+    def excerpt(self, pos=None, excpert_len: int = 300) -> str:
+        """get initial text starting from anchor point
+        Args:
+            pos: anchor point with x, y attribute, x picks the column so use the left edge of a heading;
+                start from top of page if None
+            excpert_len: excerpt lenght of initial text
+        """
+        if pos is None:
+            start = 0
+        else:
+            start = bisect_left(self.keys, (self.column(pos.x), pos.y - self.anchor_tolerance, float('-inf')))
+
+        lines = ""
+        for text in self.texts[start:]:
+            if len(lines) >= excpert_len:
+                break
+            lines += text
+        return lines
+
+
 # OUtline Detection
 class PDFOutline:
-    def __init__(self, pdf_path):
+    def __init__(self, pdf_path, recipe_cache: Optional[RecipeCache]=None):
+        """
+        Args:
+            pdf_path: path to pdf file
+            recipe_cache: (optional) recipe cache shared among documents, used by toc_detection
+        """
         self.pdf_path = pdf_path
-        self.doc = self.open_pdf()
+        self.recipe_cache = recipe_cache
+        self._doc = None  # opened lazily on first access, release with close()
+        self._block_index = {}  # page number (1-based) -> PageBlockIndex, shared by all toc entries on the page
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def doc(self):
+        """pdf doc, opened on first access"""
+        if self._doc is None:
+            self._doc = self.open_pdf()
+        return self._doc
+
+    def close(self):
+        """close pdf doc and release page indexes"""
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+        self._block_index = {}
 
     def open_pdf(self):
         """open pdf doc"""
@@ -41,6 +139,17 @@ class PDFOutline:
         except Exception as e:
             print(f"处理 PDF 文件时出错: {self.pdf_path}, 错误信息: {e}")
             return None # 或者抛出异常，根据实际需求决定
+
+    def get_excerpt(self, page_num, pos=None, excpert_len:Optional[int]=300):
+        """get initial text of a toc entry from its anchor point
+        Args:
+            page_num: page number (1-based index)
+            pos: anchor point of toc entry
+            excpert_len: excerpt lenght of initial text
+        """
+        if page_num not in self._block_index:
+            self._block_index[page_num] = PageBlockIndex(self.doc[page_num-1])
+        return self._block_index[page_num].excerpt(pos, excpert_len) + "..."
         
     def toc_extraction(self, excpert_len:Optional[int]=300):
         """apply pymupdf to extract outline
@@ -65,18 +174,7 @@ class PDFOutline:
                 if_collapse = item[3].get('collapse', False) if len(item) > 3 and item[3] else None
 
                 # get initial lines
-                lines = ""
                 if start_page is not None:
-                    page = self.doc[start_page-1]
-                    blocks = page.get_text("blocks")
-                    for block in blocks:
-                        x0, y0, x1, y1, text, _, _ = block
-                        if len(lines) < excpert_len:
-                            if pos and x0 >= pos.x:
-                                lines += text
-                        else:
-                            break
-
                     pdf_toc.append({
                         "level": lvl,
                         "title": title,
@@ -84,15 +182,20 @@ class PDFOutline:
                         "position": pos,
                         "nameddest": nameddest,
                         'if_collapse': if_collapse,
-                        "excerpt": lines + "..."
+                        "excerpt": self.get_excerpt(start_page, pos, excpert_len)
                     })
         return pdf_toc
     
-    def toc_detection(self, excpert_len:Optional[int]=300, titles=SECTION_TITLES):
-        """identify toc based on title font, layout, etc"""
+    def build_title_recipe(self, titles=SECTION_TITLES, max_pages:Optional[int]=None) -> Recipe:
+        """build heading recipe based on font of frequently used section titles
+        Args:
+            titles: frequently used section titles to learn title font from
+            max_pages: (optional) only scan the leading pages, all pages by default
+        """
         matched_meta_lst = []
         pattern = '|'.join(re.escape(title) for title in titles)  
-        for i in range(len(self.doc)):
+        page_cnt = len(self.doc) if max_pages is None else min(len(self.doc), max_pages)
+        for i in range(page_cnt):
             # extract_meta returns font size (size), font style (flags), font type (char_flags) 
             res = extract_meta(self.doc, pattern=pattern, page=i+1, ign_case=True)
             matched_meta_lst.extend(res)
@@ -108,33 +211,51 @@ class PDFOutline:
         # return to sampled_metadata to match all potential combinations
         title_meta_sample = [item for item in matched_meta_lst if item.get('size') == font_size]
 
+        # build heading filters in memory instead of dumping and re-loading toml strings
         auto_level = 1
-        addnl = False
-        title_meta_toml = [dump_toml(m, auto_level, addnl) for m in title_meta_sample]
+        headings = {}
+        for m in title_meta_sample:
+            heading = dump_heading(m, auto_level)
+            headings.setdefault((heading['font']['name'], heading['font']['size']), heading)  # drop duplicated filters
+        return Recipe({'heading': list(headings.values())})
+
+    def toc_detection(self, excpert_len:Optional[int]=300, titles=SECTION_TITLES,
+                      max_level:Optional[int]=None, stop_after_title:Optional[str]=None,
+                      recipe_pages:Optional[int]=None):
+        """identify toc based on title font, layout, etc
+        Args:
+            excpert_len: excerpt lenght of initial text
+            titles: frequently used section titles to learn title font from
+            max_level: (optional) only keep titles up to this level
+            stop_after_title: (optional) regex pattern, stop scanning pages after the first matched title (e.g. "References")
+            recipe_pages: (optional) learn title font from the leading pages only, refer to build_title_recipe
+        Note:
+            max_level and stop_after_title only stop toc scanning. on a recipe cache miss, build_title_recipe
+            still reads every page unless recipe_pages is given.
+        """
+        recipe, cache_key = None, None
+        if self.recipe_cache is not None:
+            cache_key = self.recipe_cache.fingerprint(self.doc, extra=(tuple(titles), recipe_pages))
+            recipe = self.recipe_cache.get(cache_key)
+
+        if recipe is None:
+            start = time.perf_counter()
+            recipe = self.build_title_recipe(titles, max_pages=recipe_pages)
+            if self.recipe_cache is not None:
+                self.recipe_cache.put(cache_key, recipe, time.perf_counter() - start)
 
-        # 直接使用 toml.loads 从字符串中加载 TOML 数据
-        recipe = toml.loads('\n'.join(title_meta_toml))
-        toc = gen_toc(self.doc, recipe)
+        toc = gen_toc(self.doc, recipe, max_level=max_level, stop_after_title=stop_after_title)
 
         pdf_toc = []
         if len(toc) > 0:
             for item in toc:
                 start_page = item.pagenum
                 pos = item.pos
+                # pos is the bottom right corner of the heading, pick the column by its left edge
+                anchor = Point(item.left, pos.y) if pos is not None and item.left is not None else pos
                 
                 # get initial lines
                 if start_page is not None:
-                    page = self.doc[start_page-1]
-                    blocks = page.get_text("blocks")
-                    lines = ""
-                    for block in blocks:
-                        x0, y0, x1, y1, text, _, _ = block
-                        if len(lines) < excpert_len:
-                            if pos and x0 >= pos.x:
-                                lines += text
-                        else:
-                            break
-
                     pdf_toc.append({
                         "level": item.level,
                         "title": item.title,
@@ -142,19 +263,16 @@ class PDFOutline:
                         "position": item.pos,
                         "nameddest": "section.",
                         'if_collapse': None,
-                        "excerpt": lines + "..."
+                        "excerpt": self.get_excerpt(start_page, anchor, excpert_len)
                     })
         return pdf_toc
     
     def identify_toc_appendix(self, pdf_toc):
-        pdf_toc_rvsd = copy.deepcopy(pdf_toc)
-        pattern = '|'.join(re.escape(title) for title in APPENDDIX_TITLES) 
-
+        pdf_toc_rvsd = [copy.copy(item) for item in pdf_toc]  # only if_appendix is added, no need to deep copy
         for idx, item in enumerate(pdf_toc_rvsd):
-            mtch = re.search(pattern, item.get('title'), re.IGNORECASE)
-            if mtch:
+            if is_appendix_title(item.get('title')):
                 item['if_appendix'] = True
-            elif 'appendix' in item.get('nameddest'):
+            elif 'appendix' in (item.get('nameddest') or ''):
                 item['if_appendix'] = True
             elif idx > 0 and pdf_toc_rvsd[idx-1].get('if_appendix') == True:
                 item['if_appendix'] = True
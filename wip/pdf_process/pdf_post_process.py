@@ -5,37 +5,32 @@ import re
 from typing import List, Dict, Optional
 
 import copy
-import string
 from bs4 import BeautifulSoup
 from thefuzz import fuzz # pip install thefuzz  https://github.com/seatgeek/thefuzz
 
-from pdf_process import APPENDDIX_TITLES, IMG_REGX_NAME_PTRN, TBL_REGX_NAME_PTRN, EQT_REGX_NAME_PTRN
+from pdf_process.pdf_xref import IMG_REGX, TBL_REGX, EQT_REGX, XRefIndex
+from pdf_process.pdf_align_state import ALIGN_FIELDS, fingerprint_items, toc_fingerprint, reference_fingerprint, \
+    load_align_state, save_align_state
+from pdf_process.pdf_ref_align import ReferenceMatcher
+from pdf_process.pdf_title_align import normalize_text, strip_title_enum, is_appendix_title, align_titles
 
+import logging
+logger = logging.getLogger(__name__)
 
-def remove_non_text_chars(text, with_digits: Optional[bool]=True):
-    """remove non text chars
-    """
-    valid_chars = string.ascii_letters
-    if with_digits == True:
-        valid_chars += string.digits  # 包含所有字母和数字的字符串
-    cleaned_text = ''
-    for char in text:
-        if char in valid_chars:
-            cleaned_text += char
-    return cleaned_text
+FALLBACK_ID_PTRN = re.compile(r"^(Image|Table|Equation)_Number_(\d+)$")  # ids given when no name found in captions
 
 
 def text_match(text_a, text_b, with_digits: Optional[bool]=True):
     """"fuzzy match between text_a and text_b"""
-    text_a = remove_non_text_chars(text_a, with_digits).lower()
-    text_b = remove_non_text_chars(text_b, with_digits).lower()
+    text_a = normalize_text(text_a, with_digits)
+    text_b = normalize_text(text_b, with_digits)
     return fuzz.ratio(text_a, text_b)
 
 
 def text_patial_match(shorter_text, longer_text, with_digits: Optional[bool]=True):
     """"partial fuzzy match between text_a and text_b"""
-    shorter_text = remove_non_text_chars(shorter_text, with_digits).lower()
-    longer_text = remove_non_text_chars(longer_text, with_digits).lower()
+    shorter_text = normalize_text(shorter_text, with_digits)
+    longer_text = normalize_text(longer_text, with_digits)
     return fuzz.partial_ratio(shorter_text, longer_text)
 
 class PDFProcess:
@@ -49,56 +44,88 @@ class PDFProcess:
         self.pdf_path = pdf_path
         self.pdf_toc = pdf_toc
         self.pdf_json = pdf_json
+        self.xref_index = None  # built by align_content_json
 
     # match title information from content list to that from PDF ToC
-    def align_md_toc(self):
-        """match title information from content list to that from PDF ToC"""
-        mtched_toc_idx = []
-        for idx1, item1 in enumerate(self.pdf_json):  # enumerate content json for titles
-            if item1.get('type') == 'text' and item1.get('text_level') is not None:
-                item1_page_idx = item1.get('page_idx')
-                item1_title = item1.get('text')
-                item1_title = re.sub(r"^[A-Za-z]\.", "", item1_title)
-                
-                pattern = '|'.join(re.escape(title) for title in APPENDDIX_TITLES) 
-                if re.search(pattern, item1_title, re.IGNORECASE):
-                    item1['type'] = 'title'
-                    item1['if_aligned'] = True
-                    item1['text_level'] = 1
-                    item1['aligned_text'] = item1_title
-                    item1['if_appendix'] = True
-                    item1['if_collapse'] = False
+    def align_md_toc(self, threshold: Optional[int]=90, item_idx: Optional[List[int]]=None, exclude_toc_idx: Optional[set]=None):
+        """match title information from content list to that from PDF ToC
+        Args:
+            threshold: min fuzzy ratio to confirm a title
+            item_idx: (optional) only align items at these positions
+            exclude_toc_idx: (optional) positions of toc entries already matched
+        Returns:
+            dict of matched content list position -> toc position
+        Note:
+            refer to pdf_title_align.align_titles for alignment rules
+        """
+        item_set = set(item_idx) if item_idx is not None else None
+        exclude_toc_idx = exclude_toc_idx or set()
+
+        md_idx, md_titles, md_pages = [], [], []
+        for idx, item in enumerate(self.pdf_json):  # enumerate content json for titles
+            if item_set is not None and idx not in item_set:
+                continue
+            if item.get('type') == 'text' and item.get('text_level') is not None:
+                item_title = strip_title_enum(item.get('text'))
+                if is_appendix_title(item_title):
+                    item['type'] = 'title'
+                    item['if_aligned'] = True
+                    item['text_level'] = 1
+                    item['aligned_text'] = item_title
+                    item['if_appendix'] = True
+                    item['if_collapse'] = False
                     continue
+                md_idx.append(idx)
+                md_titles.append(item_title)
+                md_pages.append(item.get('page_idx'))
+
+        toc_titles = [strip_title_enum(x.get('title')) for x in self.pdf_toc]
+        toc_pages = [x.get('page') if idx not in exclude_toc_idx else None for idx, x in enumerate(self.pdf_toc)]
+
+        matched = {}
+        for pos1, pos2 in align_titles(md_titles, md_pages, toc_titles, toc_pages, threshold):
+            item1 = self.pdf_json[md_idx[pos1]]
+            item2 = self.pdf_toc[pos2]
+            item1['type'] = 'title'  # confirmed title
+            item1['if_aligned'] = True
+            item1['text_level'] = item2.get('level')
+            item1['aligned_text'] = f"{item2['nameddest']} {toc_titles[pos2]}"
+            item1['if_appendix'] = item2.get('if_appendix')
+            item1['if_collapse'] = item2.get('if_collapse')
+            matched[md_idx[pos1]] = pos2
+        return matched
 
-                for idx2, item2 in enumerate(self.pdf_toc):  # enumerate pdf toc 
-                    if idx2 not in mtched_toc_idx:
-                        item2_title = item2.get('title')
-                        item2_title = re.sub(r"^[A-Za-z]\.", "", item2_title)
-                        item2_page_idx = item2.get('page')
-
-                        if item1_page_idx == item2_page_idx or item1_page_idx + 1 == item2_page_idx:  # titles of the same page
-                            match_ratio = text_match(item1_title, item2_title, False)
-                            if match_ratio > 90:  # confirmed title
-                                item1['type'] = 'title'
-                                item1['if_aligned'] = True
-                                item1['text_level'] = item2.get('level')
-                                item1['aligned_text'] = f"{item2['nameddest']} {item2_title}"
-                                item1['if_appendix'] = item2.get('if_appendix')
-                                item1['if_collapse'] = item2.get('if_collapse')
-                                mtched_toc_idx.append(idx2)
-                                break
-
-    def align_content_json(self):
+    def align_content_json(self, item_idx: Optional[List[int]]=None):
         """assign ids to images, tables and equations so as to better identify them in text
+        Args:
+            item_idx: (optional) only assign ids to items at these positions, other items keep their ids
         Note:
             id: an unique identifier for each image, table and equation
             related_ids: other related ids of images, tables and equation that discussed in context 
+        Returns:
+            cross-reference index of the document, refer to XRefIndex
         """
         i, j, k = 0, 0, 0
-        for item in self.pdf_json:
+        item_set = set(item_idx) if item_idx is not None else None
+        if item_set is not None:
+            # continue numbering after fallback ids kept by other items
+            for idx, item in enumerate(self.pdf_json):
+                mtch = FALLBACK_ID_PTRN.match(str(item.get('id'))) if idx not in item_set else None
+                if mtch:
+                    num = int(mtch.group(2)) + 1
+                    if mtch.group(1) == 'Image':
+                        i = max(i, num)
+                    elif mtch.group(1) == 'Table':
+                        j = max(j, num)
+                    else:
+                        k = max(k, num)
+
+        for idx, item in enumerate(self.pdf_json):
+            if item_set is not None and idx not in item_set:
+                continue
             if item['type'] in ['image']:
                 desc = "\n".join(item.get('img_caption', [])) + "\n" + "\n".join(item.get('img_footnote', []))
-                mtch_rslts = re.finditer(IMG_REGX_NAME_PTRN, desc, re.IGNORECASE)
+                mtch_rslts = IMG_REGX.finditer(desc)
 
                 img_ids = []
                 for match in mtch_rslts:
@@ -114,7 +141,7 @@ class PDFProcess:
 
             elif item['type'] == 'table':
                 desc = "\n".join(item.get('table_caption', [])) + "\n" + "\n".join(item.get('table_footnote', []))
-                mtch_rslts = re.finditer(TBL_REGX_NAME_PTRN, desc, re.IGNORECASE)
+                mtch_rslts = TBL_REGX.finditer(desc)
 
                 tbl_ids = []
                 for match in mtch_rslts:
@@ -130,7 +157,7 @@ class PDFProcess:
 
             elif item['type'] == 'equation':
                 desc = item.get('text')
-                mtch_rslts = re.finditer(EQT_REGX_NAME_PTRN, desc, re.IGNORECASE)
+                mtch_rslts = EQT_REGX.finditer(desc)
 
                 equation_ids = []
                 for match in mtch_rslts:
@@ -144,9 +171,19 @@ class PDFProcess:
                 item['related_ids'] = equation_ids[1:]
                 item['if_aligned'] = True
 
+        # ids are ready, index where each element is mentioned
+        self.xref_index = XRefIndex(self.pdf_json)
+        return self.xref_index
 
-    def align_reference_info(self, reference_metadata):
-        """"identify reference items in pdf content json"""
+    def align_reference_info(self, reference_metadata, use_index: Optional[bool]=True, item_idx: Optional[List[int]]=None):
+        """"identify reference items in pdf content json
+        Args:
+            reference_metadata: references from SemanticScholarKit.get_semanticscholar_references
+            use_index: shortlist cited titles with n-gram index before fuzzy scoring, otherwise score all titles
+            item_idx: (optional) only align items at these positions
+        Returns:
+            matching stats, refer to ReferenceMatcher (None if no reference metadata)
+        """
         start_pos = 0
         end_pos = len(self.pdf_json)
 
@@ -163,22 +200,74 @@ class PDFProcess:
                     end_pos = j
                     break
 
+        matcher = ReferenceMatcher(reference_metadata) if len(reference_metadata) > 0 else None
+        item_set = set(item_idx) if item_idx is not None else None
         for idx in range(start_pos, end_pos):
+            if item_set is not None and idx not in item_set:
+                continue
             item = self.pdf_json[idx]
             if item.get('type') == 'text' and len(item.get('text')) < 500:
-                if len(reference_metadata) > 0:
-                    for ref in reference_metadata:
-                        title = ref.get('citedPaper', {}).get('title')
-                        ss_paper_id = ref.get('citedPaper', {}).get('paperId')
-                        if title:
-                            match_ratio = text_patial_match(title, item.get('text'), True) 
-                            if match_ratio > 80:
-                                item['if_aligned'] = True
-                                item['type'] = "reference"
-                                item['ss_paper_id'] = ss_paper_id
-                                break
+                if matcher is not None:
+                    ref_pos = matcher.match(item.get('text')) if use_index else matcher.match_bruteforce(item.get('text'))
+                    if ref_pos is not None:
+                        item['if_aligned'] = True
+                        item['type'] = "reference"
+                        item['ss_paper_id'] = matcher.paper_ids[ref_pos]
                 else:
                     if start_pos > 0 and end_pos < len(self.pdf_json) and start_pos < end_pos:
                         item['if_aligned'] = True
                         item['type'] = "reference"
-                        item['ss_paper_id'] = None
\ No newline at end of file
+                        item['ss_paper_id'] = None
+
+        if matcher is not None:
+            logger.info(f"reference alignment: {matcher.stats}")
+            return matcher.stats
+        return None
+
+    def incremental_align(self, reference_metadata: Optional[List[Dict]]=None, state_path: Optional[str]=None):
+        """run align_md_toc, align_content_json and align_reference_info only on new or changed items
+        Args:
+            reference_metadata: (optional) references from SemanticScholarKit.get_semanticscholar_references
+            state_path: (optional) json file keeping alignment results of previous runs
+        Returns:
+            stats of reused and re-aligned items
+        Note:
+            items are matched to previous runs by content fingerprint (refer to pdf_align_state),
+            unchanged items keep their ids and ss_paper_ids. State is reset when toc or references change.
+        """
+        fps = fingerprint_items(self.pdf_json)  # fingerprint raw items before they are aligned
+        state = load_align_state(state_path, toc_fingerprint(self.pdf_toc), reference_fingerprint(reference_metadata))
+
+        pending, raw_fields = [], {}
+        for idx, (fp, item) in enumerate(zip(fps, self.pdf_json)):
+            if fp in state['items']:
+                item.update(state['items'][fp])
+            else:
+                pending.append(idx)
+                raw_fields[idx] = {k: item[k] for k in ALIGN_FIELDS if k in item}
+
+        used_toc_idx = {state['toc_idx'][fp] for fp in fps if fp in state['toc_idx']}
+        matched = self.align_md_toc(item_idx=pending, exclude_toc_idx=used_toc_idx)
+        self.align_content_json(item_idx=pending)
+        if reference_metadata is not None:
+            self.align_reference_info(reference_metadata, item_idx=pending)
+
+        # keep state of items in current run only
+        new_state = {"toc_fp": state['toc_fp'], "ref_fp": state['ref_fp'], "items": {}, "toc_idx": {}}
+        for idx, fp in enumerate(fps):
+            if fp in state['items']:
+                new_state['items'][fp] = state['items'][fp]
+                if fp in state['toc_idx']:
+                    new_state['toc_idx'][fp] = state['toc_idx'][fp]
+            else:
+                item = self.pdf_json[idx]
+                new_state['items'][fp] = {k: item[k] for k in ALIGN_FIELDS
+                                          if k in item and (k not in raw_fields[idx] or raw_fields[idx][k] != item[k])}
+                if idx in matched:
+                    new_state['toc_idx'][fp] = matched[idx]
+        if state_path is not None:
+            save_align_state(new_state, state_path)
+
+        stats = {"items": len(fps), "reused": len(fps) - len(pending), "realigned": len(pending)}
+        logger.info(f"incremental alignment: {stats}")
+        return stats
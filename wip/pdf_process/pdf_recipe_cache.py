@@ -0,0 +1,101 @@
+# Recipe cache for heading detection
+# Papers built from the same venue template (NeurIPS, ACL, IEEE, etc.) share heading typography,
+# so the heading recipe found for one paper can be reused for the next paper of the same template.
+import time
+import threading
+from collections import Counter, OrderedDict
+from typing import Optional, Tuple, Hashable
+
+from fitz import Document
+
+from pdf_process.pdf_toc_det import Recipe
+
+
+def typography_fingerprint(doc: Document, pages: int = 2, top_k: int = 5) -> Tuple:
+    """get typography fingerprint of a pdf from its first pages
+    Args:
+        doc: pdf document from pymupdf
+        pages: number of leading pages to sample
+        top_k: number of dominant (font, size) pairs kept in the fingerprint
+    Returns:
+        tuple of (font name, font size) pairs in descending order of character count
+    """
+    font_cnt = Counter()
+    for page in doc.pages(0, min(pages, doc.page_count)):
+        for blk in page.get_textpage().extractDICT().get('blocks', []):
+            for ln in blk.get('lines', []):
+                for spn in ln.get('spans', []):
+                    text = spn.get('text', "").strip()
+                    if not text:
+                        continue
+                    # strip font subset prefix like "ABCDEF+Times-Roman"
+                    before, sep, after = spn.get('font', "").partition('+')
+                    font = after if sep else before
+                    font_cnt[(font, round(spn.get('size', 0), 1))] += len(text)
+    return tuple(key for key, _ in font_cnt.most_common(top_k))
+
+
+class RecipeCache:
+    """LRU cache of heading recipes keyed by typography fingerprint"""
+    def __init__(self, max_size: int = 256, pages: int = 2, top_k: int = 5):
+        """
+        Args:
+            max_size: max number of recipes kept in cache
+            pages: number of leading pages used for fingerprint
+            top_k: number of dominant (font, size) pairs used for fingerprint
+        """
+        self.max_size = max_size
+        self.pages = pages
+        self.top_k = top_k
+        self._recipes = OrderedDict()  # key -> (recipe, build_time)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.saved_time = 0.0   # recipe build time avoided by cache hits (in seconds)
+        self.fingerprint_time = 0.0  # time spent on computing fingerprints (in seconds)
+
+    def fingerprint(self, doc: Document, extra: Hashable = None) -> Tuple:
+        """compute cache key for doc
+        Args:
+            doc: pdf document from pymupdf
+            extra: other settings that affect the recipe (e.g. title pattern)
+        """
+        start = time.perf_counter()
+        key = (typography_fingerprint(doc, self.pages, self.top_k), extra)
+        with self._lock:
+            self.fingerprint_time += time.perf_counter() - start
+        return key
+
+    def get(self, key: Tuple) -> Optional[Recipe]:
+        """get recipe by key, return None if not cached"""
+        with self._lock:
+            if key in self._recipes:
+                self._recipes.move_to_end(key)
+                recipe, build_time = self._recipes[key]
+                self.hits += 1
+                self.saved_time += build_time
+                return recipe
+            self.misses += 1
+            return None
+
+    def put(self, key: Tuple, recipe: Recipe, build_time: float = 0.0):
+        """put recipe into cache along with the time it took to build"""
+        with self._lock:
+            self._recipes[key] = (recipe, build_time)
+            self._recipes.move_to_end(key)
+            while len(self._recipes) > self.max_size:
+                self._recipes.popitem(last=False)
+
+    def report(self) -> dict:
+        """report cache hit rate and saved time"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._recipes),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total > 0 else 0.0,
+                "saved_time": self.saved_time,
+                "fingerprint_time": self.fingerprint_time,
+            }
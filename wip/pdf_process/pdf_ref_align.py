@@ -0,0 +1,158 @@
+# Reference alignment between MinerU content list and Semantic Scholar references
+# cited titles are normalized once and indexed by character n-grams, so each reference item
+# is only fuzzy-scored against a short list of candidate titles instead of all of them.
+# Usage (from wip/), check indexed matching against brute force on MinerU output folders:
+#     python -m pdf_process.pdf_ref_align <folder with content_list.json and references.json> ...
+# a small fixture is kept in pdf_process/fixtures/ref_align, refer to pdf_ref_align_test.py
+import os
+import json
+import time
+import argparse
+from itertools import chain
+from collections import Counter, defaultdict
+from typing import List, Dict, Optional
+
+from thefuzz import fuzz # pip install thefuzz  https://github.com/seatgeek/thefuzz
+
+from pdf_process.pdf_title_align import normalize_text
+
+
+def char_ngrams(text: str, n: int = 3) -> set:
+    """get set of character n-grams of text"""
+    return {text[i:i+n] for i in range(len(text) - n + 1)}
+
+
+class ReferenceMatcher:
+    """match reference items against cited paper titles with n-gram candidate pruning"""
+    def __init__(self, reference_metadata: List[Dict], threshold: int = 80, ngram: int = 3,
+                 top_k: Optional[int] = None, min_overlap: float = 0.0):
+        """
+        Args:
+            reference_metadata: references from SemanticScholarKit.get_semanticscholar_references
+            threshold: min partial ratio to confirm a reference
+            ngram: length of character n-grams
+            top_k: (optional) max number of candidates kept for exact scoring, all candidates by default
+                (a cap may drop the first matching title and differ from brute force)
+            min_overlap: min share of shared n-grams, relative to the shorter of title and item text,
+                to become a candidate, by default any title sharing an n-gram is scored
+                (a higher value may drop short OCR-noisy titles and differ from brute force)
+        """
+        self.threshold = threshold
+        self.ngram = ngram
+        self.top_k = top_k
+        self.min_overlap = min_overlap
+
+        start = time.perf_counter()
+        self.titles = []      # normalized cited titles, same order as reference_metadata
+        self.paper_ids = []
+        self.gram_cnt = []    # number of n-grams per title
+        self.always = []      # titles too short to be indexed, always scored
+        self.index = defaultdict(list)  # n-gram -> title positions
+        for ref in reference_metadata:
+            title = ref.get('citedPaper', {}).get('title')
+            pos = len(self.titles)
+            self.titles.append(normalize_text(title, True) if title else '')
+            self.paper_ids.append(ref.get('citedPaper', {}).get('paperId'))
+
+            grams = char_ngrams(self.titles[pos], ngram)
+            self.gram_cnt.append(len(grams))
+            if not self.titles[pos]:
+                continue
+            if len(grams) == 0:
+                self.always.append(pos)
+            for gram in grams:
+                self.index[gram].append(pos)
+
+        self.stats = {
+            "items": 0,
+            "matched": 0,
+            "unmatched": 0,
+            "scored_pairs": 0,       # fuzzy scoring calls actually made
+            "bruteforce_pairs": 0,   # fuzzy scoring calls brute force would make
+            "index_time": time.perf_counter() - start,
+            "match_time": 0.0,
+        }
+
+    def candidates(self, text_norm: str) -> List[int]:
+        """shortlist title positions for normalized item text, in original reference order"""
+        grams = char_ngrams(text_norm, self.ngram)
+        if not grams:  # too short to be indexed, fall back to all titles
+            return [pos for pos, title in enumerate(self.titles) if title]
+        shared = Counter(chain.from_iterable(self.index[gram] for gram in grams if gram in self.index))
+        # partial_ratio aligns the shorter string within the longer one, so normalize by the shorter side
+        overlaps = [(cnt / min(self.gram_cnt[pos], len(grams)), pos) for pos, cnt in shared.items()]
+        overlaps = [x for x in overlaps if x[0] >= self.min_overlap]
+        if self.top_k is not None:
+            overlaps = sorted(overlaps, reverse=True)[:self.top_k]
+        return sorted([pos for _, pos in overlaps] + self.always)
+
+    def match(self, text: str) -> Optional[int]:
+        """get position of the first matched reference for item text, None if not matched"""
+        start = time.perf_counter()
+        text_norm = normalize_text(text, True)
+        cand = self.candidates(text_norm)
+
+        result = None
+        for pos in cand:
+            self.stats['scored_pairs'] += 1
+            if fuzz.partial_ratio(self.titles[pos], text_norm) > self.threshold:
+                result = pos
+                break
+
+        self.stats['items'] += 1
+        self.stats['bruteforce_pairs'] += sum(1 for x in self.titles if x)
+        self.stats['matched' if result is not None else 'unmatched'] += 1
+        self.stats['match_time'] += time.perf_counter() - start
+        return result
+
+    def match_bruteforce(self, text: str) -> Optional[int]:
+        """get position of the first matched reference by scoring all titles"""
+        text_norm = normalize_text(text, True)
+        for pos, title in enumerate(self.titles):
+            if title and fuzz.partial_ratio(title, text_norm) > self.threshold:
+                return pos
+        return None
+
+    def compare_with_bruteforce(self, texts: List[str]) -> List[Dict]:
+        """run both indexed and brute force matching, return items where they disagree"""
+        diffs = []
+        for idx, text in enumerate(texts):
+            indexed, brute = self.match(text), self.match_bruteforce(text)
+            if indexed != brute:
+                diffs.append({"idx": idx, "text": text, "indexed": indexed, "bruteforce": brute})
+        return diffs
+
+
+def check_fixtures(fixture_dirs: List[str], max_len: int = 500) -> Dict[str, List[Dict]]:
+    """compare indexed and brute force matching on MinerU output folders
+    Args:
+        fixture_dirs: folders with content_list.json (MinerU output) and references.json
+            (SemanticScholarKit.get_semanticscholar_references)
+        max_len: items longer than max_len are skipped, same as PDFProcess.align_reference_info
+    Returns:
+        {fixture dir: items where indexed and brute force matching disagree}
+    """
+    diffs = {}
+    for fixture_dir in fixture_dirs:
+        with open(os.path.join(fixture_dir, "content_list.json"), 'r', encoding='utf-8') as f:
+            content_list = json.load(f)
+        with open(os.path.join(fixture_dir, "references.json"), 'r', encoding='utf-8') as f:
+            reference_metadata = json.load(f)
+        texts = [item['text'] for item in content_list if item.get('type') == 'text' and item.get('text')
+                 and len(item['text']) < max_len]
+        matcher = ReferenceMatcher(reference_metadata)
+        diffs[fixture_dir] = matcher.compare_with_bruteforce(texts)
+        print(f"{fixture_dir}: {len(texts)} items, {len(diffs[fixture_dir])} differences, "
+              f"{matcher.stats['scored_pairs']}/{matcher.stats['bruteforce_pairs']} pairs scored")
+    return diffs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="check indexed reference matching against brute force")
+    parser.add_argument("fixture_dirs", nargs="+")
+    args = parser.parse_args()
+    diffs = check_fixtures(args.fixture_dirs)
+    for fixture_dir, items in diffs.items():
+        for item in items:
+            print(fixture_dir, item)
+    raise SystemExit(1 if any(diffs.values()) else 0)
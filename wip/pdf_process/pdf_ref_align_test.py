@@ -0,0 +1,36 @@
+# Indexed reference matching must give the same results as brute force
+# run from wip/: python -m pytest pdf_process/pdf_ref_align_test.py
+import os
+import json
+
+from pdf_process.pdf_ref_align import ReferenceMatcher, check_fixtures
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "ref_align")
+
+
+def load_fixture():
+    with open(os.path.join(FIXTURE_DIR, "content_list.json"), 'r', encoding='utf-8') as f:
+        content_list = json.load(f)
+    with open(os.path.join(FIXTURE_DIR, "references.json"), 'r', encoding='utf-8') as f:
+        reference_metadata = json.load(f)
+    return [item['text'] for item in content_list if item.get('type') == 'text'], reference_metadata
+
+
+def test_match_equals_bruteforce():
+    texts, reference_metadata = load_fixture()
+    matcher = ReferenceMatcher(reference_metadata)
+    for text in texts:
+        assert matcher.match(text) == matcher.match_bruteforce(text), text
+    assert matcher.stats['scored_pairs'] < matcher.stats['bruteforce_pairs']
+
+
+def test_short_noisy_titles_are_kept():
+    texts, reference_metadata = load_fixture()
+    matcher = ReferenceMatcher(reference_metadata)
+    noisy = [text for text in texts if "Dea epets" in text or "Imbag Net" in text]
+    assert len(noisy) == 2
+    assert all(matcher.match(text) is not None for text in noisy)
+
+
+def test_check_fixtures():
+    assert check_fixtures([FIXTURE_DIR]) == {FIXTURE_DIR: []}
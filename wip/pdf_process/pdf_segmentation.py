@@ -1,14 +1,110 @@
 # PDF Markdown Segmentation
 # Run pdf_outline_gen, minerU process, pdf_post_process before this
 
-import re 
-from typing import List, Dict, Optional
+import tiktoken
+from bisect import bisect_right
+from itertools import accumulate
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Tuple, Set, Iterator
+
+from pdf_process.pdf_xref import ELEMENT_TYPES, XRefIndex
+
+TOKEN_ENCODING = "cl100k_base"
+
+
+def item_text(item: Dict) -> str:
+    """text of a content list item as sent to LLM (text, table body and captions)"""
+    return "\n".join(
+        [item.get('text') or '', item.get('table_body') or ''] +
+        item.get('img_caption', []) + item.get('table_caption', []))
+
+
+def gen_md_from_json(content_json) -> str:
+    """convert content list items (list or Segment) to markdown"""
+    md_text = ""
+    for item in content_json:
+        if item.get('type') == 'title':
+            md_text += f"{'#'*item.get('text_level')} {item.get('text')}  \n" 
+
+        elif item.get('type') in ['image']:
+            alt_text = "\n".join(item.get('img_caption', [])) 
+            md_text += f"\n![{alt_text}]({item.get('img_path')} '{item.get('id')}')  \n"  
+            md_text += "\n".join(item.get('img_footnote', [])) 
+
+        elif item.get('type') in ['table']:
+            alt_text = "\n".join(item.get('table_caption', [])) 
+            if item.get('img_path') is not None:
+                md_text += f"\n![{alt_text}]({item.get('img_path')} '{item.get('id')}')  \n" 
+            else:
+                md_text += f"\n{item.get('table_body')}  \n"  
+            md_text += "\n".join(item.get('table_footnote', [])) 
+
+        elif item.get('type') in ['equation']:
+            md_text += f"""```latex\n{item.get('text')}\n```"""
+
+        elif item.get('type') in ['text', 'reference']:
+            md_text += f"{item.get('text')}  \n"  
+    return md_text
+
+
+@dataclass
+class Segment:
+    """a view over the shared content list: an index range plus attached elements, items are not copied"""
+    pdf_json: List[Dict] = field(repr=False)
+    start_position: int
+    end_position: int  # inclusive
+    attached: Set[int] = field(default_factory=set)  # positions of elements mentioned in range but located elsewhere
+
+    def positions(self) -> List[int]:
+        """positions of items in segment, range first then attached elements in document order"""
+        return list(range(self.start_position, self.end_position+1)) + sorted(self.attached)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for pos in self.positions():
+            yield self.pdf_json[pos]
+
+    def __len__(self) -> int:
+        return self.end_position - self.start_position + 1 + len(self.attached)
+
+    def to_json(self) -> List[Dict]:
+        """materialize segment to list of items (items themselves are shared, not copied)"""
+        return list(self)
+
+    def to_markdown(self) -> str:
+        """materialize segment to markdown"""
+        return gen_md_from_json(self)
 
-from pdf_process import IMG_REGX_NAME_PTRN, TBL_REGX_NAME_PTRN, EQT_REGX_NAME_PTRN
 
 class PDFSeg:
-    def __init__(self, pdf_json):
+    def __init__(self, pdf_json, xref_index: Optional[XRefIndex]=None):
+        """
+        Args:
+            pdf_json: content list after PDFProcess post process
+            xref_index: (optional) cross-reference index from PDFProcess.align_content_json, built on demand if None
+        """
         self.pdf_json = pdf_json
+        self._xref_index = xref_index
+        self._token_prefix = None  # prefix sums of per-item token counts
+
+    @property
+    def xref_index(self) -> XRefIndex:
+        """cross-reference index of images, tables and equations"""
+        if self._xref_index is None:
+            self._xref_index = XRefIndex(self.pdf_json)
+        return self._xref_index
+
+    @property
+    def token_prefix(self) -> List[int]:
+        """prefix sums of token counts, token_prefix[k] is the token count of pdf_json[0:k]"""
+        if self._token_prefix is None:
+            encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+            tokens = encoding.encode_ordinary_batch([item_text(item) for item in self.pdf_json])
+            self._token_prefix = [0] + list(accumulate(len(x) for x in tokens))
+        return self._token_prefix
+
+    def count_tokens(self, start_pos: int, end_pos: int) -> int:
+        """token count of pdf_json[start_pos:end_pos+1]"""
+        return self.token_prefix[end_pos+1] - self.token_prefix[start_pos]
 
     def get_toc_hierachy(self):
         """generate ToC tree
@@ -46,84 +142,88 @@ class PDFSeg:
 
         return toc_hierachy
     
-    def gen_seg_paras(self, toc_hierachy, seg_text_length:Optional[int]=20000):
-        """segment content json based on toc hierachy"""
-        pdf_texts = [item.get('text', '') for item in self.pdf_json]
-
-        all_seg_paras = []
-        for section in toc_hierachy:
-            section_paras = []
-            
-            start_pos = section['start_position']
-            end_pos = section['end_position']
-            tmp_text = "\n".join(pdf_texts[start_pos:end_pos+1])
-            
-            if len(tmp_text) > seg_text_length and section.get('subsection', []) != []:
-                # if the section is too long, then breakdown to subsection
-                for subsection in section.get('subsection'):
-                    sub_start_pos = subsection['start_position']
-                    sub_end_pos = subsection['end_position']
-                    section_paras.append(self.pdf_json[sub_start_pos:sub_end_pos+1])
-                    tmp_text = "\n".join(pdf_texts[sub_start_pos:sub_end_pos+1])
-                    print('subsection', subsection.get('title'), len(tmp_text))
+    def _split_paragraphs(self, start_pos: int, end_pos: int, max_tokens: int) -> List[Tuple[int, int]]:
+        """split items into ranges of at most max_tokens at paragraph (item) boundaries"""
+        prefix = self.token_prefix
+        ranges = []
+        pos = start_pos
+        while pos <= end_pos:
+            # last item that keeps the range within budget, a single oversized item makes its own range
+            last = bisect_right(prefix, prefix[pos] + max_tokens, pos + 1, end_pos + 2) - 2
+            last = max(last, pos)
+            ranges.append((pos, last))
+            pos = last + 1
+        return ranges
+
+    def _merge_ranges(self, ranges: List[Tuple[int, int]], max_tokens: int) -> List[Tuple[int, int]]:
+        """merge adjacent ranges as long as they fit in max_tokens"""
+        merged = []
+        for start_pos, end_pos in ranges:
+            if merged and merged[-1][1] + 1 == start_pos and \
+               self.count_tokens(merged[-1][0], end_pos) <= max_tokens:
+                merged[-1] = (merged[-1][0], end_pos)
             else:
-                section_paras.append(self.pdf_json[start_pos:end_pos+1])
-                print('section', section.get('title'), len(tmp_text))
-                    
-            all_seg_paras.extend(section_paras)
-        return all_seg_paras
+                merged.append((start_pos, end_pos))
+        return merged
+
+    def _split_section(self, section: Dict, max_tokens: int) -> List[Tuple[int, int]]:
+        """split section recursively through subsections, then paragraphs, until each range fits in max_tokens"""
+        start_pos = section['start_position']
+        end_pos = section['end_position']
+        if self.count_tokens(start_pos, end_pos) <= max_tokens:
+            return [(start_pos, end_pos)]
+
+        subsections = section.get('subsection', [])
+        if subsections == []:
+            return self._split_paragraphs(start_pos, end_pos, max_tokens)
+
+        ranges = []
+        intro_end = subsections[0]['start_position'] - 1  # text between section title and first subsection
+        if intro_end >= start_pos:
+            ranges.extend(self._split_paragraphs(start_pos, intro_end, max_tokens))
+        for subsection in subsections:
+            ranges.extend(self._split_section(subsection, max_tokens))
+        return self._merge_ranges(ranges, max_tokens)
+
+    def gen_seg_ranges(self, toc_hierachy, max_tokens:Optional[int]=5000) -> List[Tuple[int, int]]:
+        """segment content json based on toc hierachy and token budget
+        Args:
+            toc_hierachy: toc tree from get_toc_hierachy
+            max_tokens: token budget for each segment (per LLM call)
+        Returns:
+            list of (start_position, end_position) index ranges (both inclusive) in pdf_json
+        """
+        all_seg_ranges = []
+        for section in toc_hierachy:
+            all_seg_ranges.extend(self._split_section(section, max_tokens))
+        return all_seg_ranges
 
-    def restore_seg_elements(self, seg_paras):
-        """put all elements (images, tables, equations, refs) metioned in place where the refered to"""
+    def gen_seg_paras(self, toc_hierachy, max_tokens:Optional[int]=5000) -> List[Segment]:
+        """segment content json based on toc hierachy, refer to gen_seg_ranges
+        Returns:
+            list of Segment views over pdf_json
+        """
+        return [Segment(self.pdf_json, start_pos, end_pos)
+                for start_pos, end_pos in self.gen_seg_ranges(toc_hierachy, max_tokens)]
 
-        img_lst = [x for x in self.pdf_json if x.get('type')=='image']
-        tbl_lst = [x for x in self.pdf_json if x.get('type')=='table']
-        eqt_lst = [x for x in self.pdf_json if x.get('type')=='equation']
-        ref_lst = [x for x in self.pdf_json if x.get('type')=='reference']
+    def restore_seg_elements(self, seg_paras: List[Segment]) -> List[Segment]:
+        """put all elements (images, tables, equations, refs) metioned in place where the refered to"""
+        xref = self.xref_index
 
-        seg_paras_rvsd = []
         for seg in seg_paras:
-            seg_img_lst = [x for x in seg if x.get('type')=='image']
-            seg_tbl_lst = [x for x in seg if x.get('type')=='table']
-            seg_eqt_lst = [x for x in seg if x.get('type')=='equation']
-            seg_ref_lst = [x for x in seg if x.get('type')=='reference']
-
-            for item in seg:
-                if item.get('if_being_reffered') is None:
-                    item_text = item.get('text', '')
-
-                    mtch_rslts = re.finditer(IMG_REGX_NAME_PTRN, item_text, re.IGNORECASE)
-                    for match in mtch_rslts:
-                        img_id = match.group(0)
-                        if img_id not in [x.get('id') for x in seg_img_lst]:
-                            added_items = [x for x in img_lst if x.get('id')==img_id]
-                            print(added_items)
-                            for y in added_items:
-                                y['if_being_reffered'] = True
-                            seg_img_lst.extend(added_items)
-                            seg.extend(added_items)
-
-                    mtch_rslts = re.finditer(TBL_REGX_NAME_PTRN, item_text, re.IGNORECASE)
-                    for match in mtch_rslts:
-                        tbl_id = match.group(0)
-                        if tbl_id not in [x.get('id') for x in seg_tbl_lst]:
-                            added_items = [x for x in tbl_lst if x.get('id')==tbl_id]
-                            for y in added_items:
-                                y['if_being_reffered'] = True
-                            seg_tbl_lst.extend(added_items)
-                            seg.extend(added_items)
-
-                    mtch_rslts = re.finditer(EQT_REGX_NAME_PTRN, item_text, re.IGNORECASE)
-                    for match in mtch_rslts:
-                        eqt_id = match.group(0)
-                        if eqt_id not in [x.get('id') for x in seg_eqt_lst]:
-                            added_items = [x for x in eqt_lst if x.get('id')==eqt_id]
-                            for y in added_items:
-                                y['if_being_reffered'] = True
-                            seg_eqt_lst.extend(added_items)
-                            seg.extend(added_items)
-            seg_paras_rvsd.append(seg)
+            seg_ids = {x.get('id') for x in seg if x.get('type') in ELEMENT_TYPES}
+
+            for pos in range(seg.start_position, seg.end_position+1):
+                if self.pdf_json[pos].get('if_being_reffered') is None:
+                    for xid in xref.mentioned_ids(pos):
+                        if xid not in seg_ids:
+                            for elem_pos in xref.elements.get(xid, []):
+                                self.pdf_json[elem_pos]['if_being_reffered'] = True
+                                seg.attached.add(elem_pos)
+                            seg_ids.add(xid)
         
-        return seg_paras_rvsd
-                
-                
\ No newline at end of file
+        return seg_paras
+
+    def gen_md_from_json(self, content_json) -> str:
+        """convert content list items (list or Segment) to markdown"""
+        return gen_md_from_json(content_json)
@@ -0,0 +1,95 @@
+# Title alignment between MinerU content list and PDF ToC
+# titles are normalized once, candidate pairs are limited to titles on the same page,
+# scored in one batch with rapidfuzz and then matched by optimal assignment.
+import re
+import numpy as np
+from collections import defaultdict
+from typing import List, Tuple, Optional
+
+from rapidfuzz import fuzz, process  # pip install rapidfuzz>=3.6
+from scipy.optimize import linear_sum_assignment
+
+from pdf_process import APPENDDIX_TITLES
+
+NON_LETTER_PTRN = re.compile(r"[^A-Za-z]")
+NON_ALNUM_PTRN = re.compile(r"[^A-Za-z0-9]")
+TITLE_ENUM_PTRN = re.compile(r"^[A-Za-z]\.")  # enumeration like "A." in appendix titles
+APPENDIX_PTRN = re.compile('|'.join(re.escape(title) for title in APPENDDIX_TITLES), re.IGNORECASE)
+
+
+def normalize_text(text: str, with_digits: Optional[bool] = True) -> str:
+    """keep ascii letters (and digits) only, in lower case"""
+    ptrn = NON_ALNUM_PTRN if with_digits else NON_LETTER_PTRN
+    return ptrn.sub('', text or '').lower()
+
+
+def strip_title_enum(title: str) -> str:
+    """remove leading enumeration like "A." from title"""
+    return TITLE_ENUM_PTRN.sub('', title or '')
+
+
+def is_appendix_title(title: str) -> bool:
+    """check if title is one of appendix like titles (references, acknowledgments, etc)"""
+    return APPENDIX_PTRN.search(title or '') is not None
+
+
+def align_titles(
+        md_titles: List[str],
+        md_pages: List[Optional[int]],
+        toc_titles: List[str],
+        toc_pages: List[Optional[int]],
+        threshold: int = 90
+        ) -> List[Tuple[int, int]]:
+    """align content list titles with toc titles
+    Args:
+        md_titles: titles from content list (enumeration already stripped)
+        md_pages: page index of titles from content list (0-based, as in MinerU)
+        toc_titles: titles from pdf toc (enumeration already stripped)
+        toc_pages: page number of toc titles (1-based, as in pymupdf)
+        threshold: min fuzzy ratio to confirm a title
+    Returns:
+        list of (md title position, toc title position) pairs
+    Note:
+        a md title on page p is only compared with toc titles on page p or p+1 (same rule as before);
+        pairs are chosen to maximize total ratio instead of greedy first match.
+    """
+    md_norm = [normalize_text(x, False) for x in md_titles]
+    toc_norm = [normalize_text(x, False) for x in toc_titles]
+
+    # bucket toc titles by page
+    toc_by_page = defaultdict(list)
+    for j, page in enumerate(toc_pages):
+        if page is not None and toc_norm[j]:
+            toc_by_page[page].append(j)
+
+    # collect candidate pairs on the same page
+    rows, cols = [], []
+    for i, page in enumerate(md_pages):
+        if page is None or not md_norm[i]:
+            continue
+        for j in toc_by_page.get(page, []) + toc_by_page.get(page + 1, []):
+            rows.append(i)
+            cols.append(j)
+    if len(rows) == 0:
+        return []
+
+    # score all candidate pairs in one batch, rounded as thefuzz does
+    scores = process.cpdist([md_norm[i] for i in rows], [toc_norm[j] for j in cols], scorer=fuzz.ratio)
+    scores = np.rint(scores)
+    passed = scores > threshold
+    if not passed.any():
+        return []
+
+    rows = np.asarray(rows)[passed]
+    cols = np.asarray(cols)[passed]
+    scores = scores[passed]
+
+    # optimal assignment on the (small) matrix of titles having at least one candidate
+    row_ids, row_pos = np.unique(rows, return_inverse=True)
+    col_ids, col_pos = np.unique(cols, return_inverse=True)
+    score_mtx = np.zeros((len(row_ids), len(col_ids)))
+    score_mtx[row_pos, col_pos] = scores
+    assigned_rows, assigned_cols = linear_sum_assignment(score_mtx, maximize=True)
+
+    return [(int(row_ids[r]), int(col_ids[c]))
+            for r, c in zip(assigned_rows, assigned_cols) if score_mtx[r, c] > 0]
@@ -7,7 +7,7 @@ from fitz import Document
 from itertools import chain
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Optional, List, Tuple, Iterator, Dict
+from typing import Optional, List, Tuple, Iterator, Dict, Union, Callable
 
 DEF_TOLERANCE: float = 1e-5
 
@@ -23,6 +23,7 @@ class ToCEntry:
     title: str
     pagenum: int
     pos: Optional[Point] = None
+    left: Optional[float] = None  # left x of the heading block, pos is its bottom right corner
     # vpos == bbox.top, used for sorting
     # vpos: Optional[float] = None
 
@@ -344,42 +345,76 @@ class Recipe:
             titles = concatFrag(frags)
 
             return [
-                ToCEntry(level, title, page, pos)
+                ToCEntry(level, title, page, pos, bbox[0])
                 for level, title in titles.items()
             ]
         except FoundGreedy as e:
             # return the entire block as a single entry
-            return [ToCEntry(e.level, blk_to_str(block), page, pos)]
+            return [ToCEntry(e.level, blk_to_str(block), page, pos, bbox[0])]
 
 
-def extract_toc(doc: Document, recipe: Recipe) -> List[ToCEntry]:
-    """Extract toc entries from a document
+def iter_toc(doc: Document,
+             recipe: Recipe,
+             max_level: Optional[int] = None,
+             stop_after_title: Optional[str] = None,
+             stop_when: Optional[Callable[[ToCEntry], bool]] = None
+             ) -> Iterator[ToCEntry]:
+    """Lazily extract toc entries from a document, page by page
+
+    Pages are only parsed when the caller asks for more entries, so stopping
+    early (e.g. at "References") skips the remaining pages entirely.
 
     Arguments
       doc: a pdf document
       recipe: recipe from user
+      max_level: (optional) skip entries deeper than this level
+      stop_after_title: (optional) regex pattern (case insensitive), stop
+                        after yielding the first entry whose title matches
+      stop_when: (optional) predicate on entry, stop after yielding the first
+                 entry for which it returns True
     Returns
-      a list of toc entries in the document
+      an iterator of toc entries in the document
     """
-    result = []
+    stop_regex = re.compile(stop_after_title, re.IGNORECASE) \
+        if stop_after_title else None
 
     for page in doc.pages():
         for blk in page.get_textpage().extractDICT().get('blocks', []):
-            result.extend(
-                recipe.extract_block(blk, page.number + 1)
-            )
+            for entry in recipe.extract_block(blk, page.number + 1):
+                if max_level is not None and entry.level > max_level:
+                    continue
 
-    return result
+                yield entry
+
+                if (stop_regex is not None and stop_regex.search(entry.title)) or \
+                   (stop_when is not None and stop_when(entry)):
+                    return
+
+
+def extract_toc(doc: Document, recipe: Recipe) -> List[ToCEntry]:
+    """Extract toc entries from a document
+
+    Arguments
+      doc: a pdf document
+      recipe: recipe from user
+    Returns
+      a list of toc entries in the document
+    """
+    return list(iter_toc(doc, recipe))
 
 
 # Reference link: [pdf.toc](https://github.com/Krasjet/pdf.tocgen/blob/master/pdftocgen/tocgen.py)
-def gen_toc(doc: Document, recipe_dict: dict) -> List[ToCEntry]:
+def gen_toc(doc: Document, recipe_dict: Union[dict, Recipe], **kwargs) -> List[ToCEntry]:
     """Generate the table of content for a document from recipe
 
     Argument
       doc: a pdf document
-      recipe_dict: the recipe dictionary used to generate the toc
+      recipe_dict: the recipe dictionary used to generate the toc, or an
+                   already built `Recipe`
+      kwargs: (optional) early stop settings passed to `iter_toc`, like
+              `max_level` or `stop_after_title`
     Returns
       a list of ToC entries
     """
-    return extract_toc(doc, Recipe(recipe_dict))
\ No newline at end of file
+    recipe = recipe_dict if isinstance(recipe_dict, Recipe) else Recipe(recipe_dict)
+    return list(iter_toc(doc, recipe, **kwargs))
\ No newline at end of file
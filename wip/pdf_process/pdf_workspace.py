@@ -0,0 +1,189 @@
+# Paper workspace
+# one object per paper that lazily loads and memoizes the pdf doc, MinerU content list, ToC,
+# cross-reference index and segments, and persists derived artifacts next to the MinerU output folder.
+import os
+import copy
+import json
+from typing import List, Dict, Optional
+
+from pdf_process.pdf_align_state import reference_fingerprint
+from pdf_process.pdf_outline_gen import PDFOutline, toc_to_jsonable
+from pdf_process.pdf_post_process import PDFProcess
+from pdf_process.pdf_recipe_cache import RecipeCache
+from pdf_process.pdf_segmentation import PDFSeg, Segment
+from pdf_process.pdf_xref import XRefIndex
+
+CONTENT_LIST_FILE = "content_list.json"  # renamed from "_content_list.json" by MinerUKit.download_and_unzip
+TOC_FILE = "toc.json"
+PROCESSED_CONTENT_LIST_FILE = "processed_content_list.json"
+SEGMENTS_FILE = "segments.json"
+ALIGN_STATE_FILE = "align_state.json"
+
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def dump_json(data, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+
+
+class PaperWorkspace:
+    def __init__(self, pdf_path: str, mineru_path: str,
+                 reference_metadata: Optional[List[Dict]] = None,
+                 max_tokens: int = 5000,
+                 recipe_cache: Optional[RecipeCache] = None,
+                 persist: bool = True):
+        """
+        Args:
+            pdf_path: path to pdf file
+            mineru_path: folder of MinerU output for the pdf (with full.md, content_list.json, images)
+            reference_metadata: (optional) references from SemanticScholarKit.get_semanticscholar_references
+            max_tokens: token budget for each segment
+            recipe_cache: (optional) recipe cache for toc detection
+            persist: save derived artifacts (toc, processed content list, segments) into mineru_path
+        Note:
+            artifacts are reused on later runs as long as they are newer than the files they are derived from,
+            the processed content list also requires the same reference_metadata (refer to reference_fingerprint).
+        """
+        self.pdf_path = pdf_path
+        self.mineru_path = mineru_path
+        self.reference_metadata = reference_metadata
+        self.max_tokens = max_tokens
+        self.recipe_cache = recipe_cache
+        self.persist = persist
+
+        self._outline = None
+        self._content_list = None
+        self._toc = None
+        self._pdf_json = None
+        self._xref_index = None
+        self._seg = None
+        self._segments = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """release pdf doc"""
+        if self._outline is not None:
+            self._outline.close()
+
+    def artifact_path(self, file_name: str) -> str:
+        return os.path.join(self.mineru_path, file_name)
+
+    def _is_fresh(self, file_name: str, *sources: str) -> bool:
+        """check if artifact exists and is newer than its sources"""
+        path = self.artifact_path(file_name)
+        if not os.path.exists(path):
+            return False
+        mtime = os.path.getmtime(path)
+        return all(not os.path.exists(src) or os.path.getmtime(src) <= mtime for src in sources)
+
+    def _same_references(self) -> bool:
+        """check if saved alignment state was built from the current reference metadata"""
+        path = self.artifact_path(ALIGN_STATE_FILE)
+        if not os.path.exists(path):
+            return False
+        return load_json(path).get('ref_fp') == reference_fingerprint(self.reference_metadata)
+
+    def _save(self, data, file_name: str):
+        if self.persist:
+            dump_json(data, self.artifact_path(file_name))
+
+    @property
+    def outline(self) -> PDFOutline:
+        """outline generator, owns the pdf doc"""
+        if self._outline is None:
+            self._outline = PDFOutline(self.pdf_path, recipe_cache=self.recipe_cache)
+        return self._outline
+
+    @property
+    def doc(self):
+        """pdf doc from pymupdf"""
+        return self.outline.doc
+
+    @property
+    def content_list(self) -> List[Dict]:
+        """raw content list from MinerU, left unchanged by post process (refer to pdf_json)"""
+        if self._content_list is None:
+            self._content_list = load_json(self.artifact_path(CONTENT_LIST_FILE))
+        return self._content_list
+
+    @property
+    def toc(self) -> List[Dict]:
+        """pdf toc with appendix flags, toc_extraction first and toc_detection as fall back"""
+        if self._toc is None:
+            if self._is_fresh(TOC_FILE, self.pdf_path):
+                self._toc = load_json(self.artifact_path(TOC_FILE))
+            else:
+                pdf_toc = self.outline.toc_extraction()
+                if len(pdf_toc) == 0:
+                    pdf_toc = self.outline.toc_detection()
+                self._toc = toc_to_jsonable(self.outline.identify_toc_appendix(pdf_toc))
+                self._save(self._toc, TOC_FILE)
+        return self._toc
+
+    @property
+    def pdf_json(self) -> List[Dict]:
+        """content list after post process (titles, element ids and references aligned)"""
+        if self._pdf_json is None:
+            if (self._is_fresh(PROCESSED_CONTENT_LIST_FILE, self.artifact_path(CONTENT_LIST_FILE), self.artifact_path(TOC_FILE))
+                    and self._same_references()):
+                self._pdf_json = load_json(self.artifact_path(PROCESSED_CONTENT_LIST_FILE))
+            else:
+                # PDFProcess aligns items in place, work on a copy so content_list stays raw
+                pdf = PDFProcess(pdf_path=self.pdf_path, pdf_toc=self.toc, pdf_json=copy.deepcopy(self.content_list))
+                # only new or changed items are re-aligned when MinerU output is refreshed
+                pdf.incremental_align(self.reference_metadata,
+                                      state_path=self.artifact_path(ALIGN_STATE_FILE) if self.persist else None)
+                self._xref_index = pdf.xref_index
+                self._pdf_json = pdf.pdf_json
+                self._save(self._pdf_json, PROCESSED_CONTENT_LIST_FILE)
+        return self._pdf_json
+
+    @property
+    def xref_index(self) -> XRefIndex:
+        """cross-reference index of images, tables and equations"""
+        if self._xref_index is None:
+            self._xref_index = XRefIndex(self.pdf_json)
+        return self._xref_index
+
+    @property
+    def seg(self) -> PDFSeg:
+        """segmenter sharing the processed content list and cross-reference index"""
+        if self._seg is None:
+            self._seg = PDFSeg(self.pdf_json, self.xref_index)
+        return self._seg
+
+    @property
+    def segments(self) -> List[Segment]:
+        """segments of the paper with mentioned elements attached"""
+        if self._segments is None:
+            saved = None
+            if self._is_fresh(SEGMENTS_FILE, self.artifact_path(PROCESSED_CONTENT_LIST_FILE)):
+                saved = load_json(self.artifact_path(SEGMENTS_FILE))
+
+            if saved is not None and saved.get('max_tokens') == self.max_tokens:
+                self._segments = [
+                    Segment(self.pdf_json, x['start_position'], x['end_position'], set(x['attached']))
+                    for x in saved.get('segments', [])]
+                # same flags as set by restore_seg_elements on attached elements
+                for seg in self._segments:
+                    for pos in seg.attached:
+                        self.pdf_json[pos]['if_being_reffered'] = True
+            else:
+                toc_hierachy = self.seg.get_toc_hierachy()
+                self._segments = self.seg.restore_seg_elements(self.seg.gen_seg_paras(toc_hierachy, self.max_tokens))
+                self._save({
+                    "max_tokens": self.max_tokens,
+                    "segments": [{"start_position": x.start_position,
+                                  "end_position": x.end_position,
+                                  "attached": sorted(x.attached)} for x in self._segments]
+                    }, SEGMENTS_FILE)
+        return self._segments
@@ -0,0 +1,69 @@
+# Cross-reference index for images, tables and equations
+# Run after PDFProcess.align_content_json, which assigns ids to images, tables and equations.
+import re
+from collections import defaultdict
+from typing import List, Dict, Tuple, Optional
+
+from pdf_process import IMG_REGX_NAME_PTRN, TBL_REGX_NAME_PTRN, EQT_REGX_NAME_PTRN
+
+ELEMENT_TYPES = ('image', 'table', 'equation')
+
+IMG_REGX = re.compile(IMG_REGX_NAME_PTRN, re.IGNORECASE)
+TBL_REGX = re.compile(TBL_REGX_NAME_PTRN, re.IGNORECASE)
+EQT_REGX = re.compile(EQT_REGX_NAME_PTRN, re.IGNORECASE)
+
+# all element names in one pass: keywords keep the relative order of the patterns above,
+# so each match is the same string the single patterns would give at that position.
+# the lookahead also admits overlapping matches like "table 3" inside "figure table 3".
+XREF_REGX = re.compile(
+    r"(?=((?:pic|picture|img|image|chart|figure|fig|table|tbl|formula|equation|notation|syntax)"
+    r"\s*(?:[0-9]+(?:\.[0-9]+)?|[0-9]+|[IVXLCDM]+|[a-zA-Z]+)))",
+    re.IGNORECASE)
+
+
+class XRefIndex:
+    """document-wide index of images, tables and equations and where they are mentioned"""
+    def __init__(self, pdf_json: List[Dict]):
+        """
+        Args:
+            pdf_json: content list after PDFProcess.align_content_json
+        """
+        self.pdf_json = pdf_json
+        self.positions = {}  # id(item) -> position in pdf_json
+        self.elements = defaultdict(list)  # element id -> element positions
+        self.mentions = defaultdict(list)  # element id -> [(item position, start offset, end offset)]
+        self.item_mentions = defaultdict(list)  # item position -> element ids mentioned, in text order
+
+        for pos, item in enumerate(pdf_json):
+            self.positions[id(item)] = pos
+            if item.get('type') in ELEMENT_TYPES and item.get('id') is not None:
+                self.elements[item['id']].append(pos)
+
+            text = item.get('text') or ''
+            if not text:
+                continue
+            for match in XREF_REGX.finditer(text):
+                xid = match.group(1)
+                self.mentions[xid].append((pos, match.start(), match.start() + len(xid)))
+                if xid not in self.item_mentions[pos]:
+                    self.item_mentions[pos].append(xid)
+
+    def position(self, item: Dict) -> Optional[int]:
+        """get position of item in pdf_json"""
+        return self.positions.get(id(item))
+
+    def get_elements(self, xid: str) -> List[Dict]:
+        """get images, tables or equations by id"""
+        return [self.pdf_json[pos] for pos in self.elements.get(xid, [])]
+
+    def mentioned_ids(self, pos: int) -> List[str]:
+        """get element ids mentioned in item at position"""
+        return self.item_mentions.get(pos, [])
+
+    def mentioning_items(self, xid: str) -> List[int]:
+        """get positions of items mentioning element id"""
+        return sorted({pos for pos, _, _ in self.mentions.get(xid, [])})
+
+    def mention_offsets(self, xid: str) -> List[Tuple[int, int, int]]:
+        """get (item position, start, end) of each mention of element id"""
+        return self.mentions.get(xid, [])
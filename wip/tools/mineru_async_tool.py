@@ -0,0 +1,341 @@
+# Async minerU API client, refer to mineru_tool.py for the sync version
+# one aiohttp session (connection pool) is shared by all requests of the client,
+# uploads and downloads run concurrently under their own semaphores,
+# and transient failures (connection errors, truncated bodies, 429, 5xx) are retried with jittered exponential backoff.
+import os
+import copy
+import uuid
+import hashlib
+import zipfile
+import random
+import asyncio
+import aiohttp  # pip install aiohttp
+from typing import List, Dict, Optional, Callable
+
+from tools.mineru_tool import (TASK_URL, BATCH_URL, BATCH_STATUS_URL, CHUNK_SIZE,
+                               verify_download, extract_results)
+from tools.mineru_result_cache import MinerUResultCache
+from tools.mineru_shard import plan_shards, load_manifest, merge_manifest
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# connection dropped, timed out, or closed in the middle of a streamed body
+RETRY_ERRORS = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)
+
+
+class AsyncMinerUKit:
+    def __init__(self, api_key,
+                 max_connections: int = 32,
+                 max_uploads: int = 16,
+                 max_downloads: int = 8,
+                 max_retries: int = 5,
+                 backoff_base: float = 1.0,
+                 backoff_max: float = 30.0,
+                 timeout: float = 600,
+                 result_cache: Optional[MinerUResultCache] = None):
+        """
+        Args:
+            api_key: MinerU api key
+            max_connections: size of the shared connection pool
+            max_uploads: max number of concurrent file uploads
+            max_downloads: max number of concurrent result downloads
+            max_retries: max retries per request on connection errors, truncated bodies, 429 and 5xx
+            backoff_base: base delay (in seconds) of exponential backoff
+            backoff_max: max delay (in seconds) between retries
+            timeout: total timeout (in seconds) per request
+            result_cache: (optional) MinerU result cache, refer to batch_process_files_cached
+        Note:
+            use as async context manager so that the connection pool is released:
+            async with AsyncMinerUKit(api_key) as mineru:
+                batch_id = await mineru.batch_process_files(pdf_files)
+        """
+        self.api_key = api_key
+        self.task_url = TASK_URL
+        self.batch_url = BATCH_URL
+        self.batch_status_url = BATCH_STATUS_URL
+        self.header = {
+                    'Content-Type':'application/json',
+                    "Authorization":f"Bearer {self.api_key}"
+                 }
+        self.config = {
+            "enable_formula": True,
+            "language": "en",
+            "layout_model":"doclayout_yolo",
+            "enable_table": True
+        }
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.upload_semaphore = asyncio.Semaphore(max_uploads)
+        self.download_semaphore = asyncio.Semaphore(max_downloads)
+        self._session = None
+        self.result_cache = result_cache
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """shared client session, created on first use"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def close(self):
+        """release connection pool"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """full jitter backoff, honor Retry-After header if given"""
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _request(self, method: str, url: str, handler: Callable, **kwargs):
+        """send request with retries
+        Args:
+            method: http method
+            url: request url
+            handler: async function applied to the response (inside the connection context)
+            kwargs: arguments for aiohttp request, "data" can be a callable returning a fresh body per attempt
+        Returns:
+            result of handler
+        """
+        data = kwargs.pop('data', None)
+        for attempt in range(self.max_retries + 1):
+            body = data() if callable(data) else data
+            try:
+                async with self.session.request(method, url, data=body, **kwargs) as response:
+                    if response.status in RETRY_STATUS and attempt < self.max_retries:
+                        delay = self._backoff(attempt, response.headers.get('Retry-After'))
+                        print(f"{method} {url} got {response.status}, retry in {delay:.1f} seconds...")
+                        await asyncio.sleep(delay)
+                        continue
+                    response.raise_for_status()
+                    return await handler(response)
+            except RETRY_ERRORS as err:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"{method} {url} failed: {err!r}, retry in {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
+            finally:
+                if hasattr(body, 'close'):
+                    body.close()
+
+    async def _request_json(self, method: str, url: str, **kwargs) -> Dict:
+        async def handler(response):
+            return await response.json()
+        return await self._request(method, url, handler, headers=self.header, **kwargs)
+
+    async def single_process_url(self, pdf_url, if_ocr, lang) -> Dict:
+        """apply MinerU API to process single PDF
+        Returns:
+            json response of MinerU API
+        """
+        data = copy.deepcopy(self.config)
+        data['url'] = pdf_url
+        data['is_ocr'] = if_ocr
+        data['language'] = lang
+        return await self._request_json('POST', self.task_url, json=data)
+
+    async def upload_file(self, upload_url: str, file_path: str) -> bool:
+        """upload local file to presigned url, file body is streamed from disk"""
+        async def handler(response):
+            return response.status == 200
+
+        async with self.upload_semaphore:
+            try:
+                # reopen file on every attempt, aiohttp streams file objects in chunks with content length set;
+                # presigned urls are signed without Content-Type, so do not let aiohttp add one
+                return await self._request('PUT', upload_url, handler, data=lambda: open(file_path, 'rb'),
+                                           skip_auto_headers=('Content-Type',))
+            except Exception as err:
+                print(f"upload failed: {file_path}, {err!r}")
+                return False
+
+    async def batch_process_files(self, pdf_files: List[str], if_ocr: Optional[bool] = False,
+                                  lang: Optional[str] = 'en', data_ids: Optional[List[str]] = None) -> Optional[Dict]:
+        """apply MinerU API to process multiple PDF in local path, files are uploaded concurrently
+        Returns:
+            json response of MinerU API with "uploaded" (upload success flag per file) added,
+            None if failed to apply upload urls
+        """
+        files = []
+        data_ids = data_ids or [str(uuid.uuid1()) for _ in pdf_files]
+        for file, data_id in zip(pdf_files, data_ids):
+            files.append({"name": os.path.basename(file),
+                          "data_id": data_id})
+        data = copy.deepcopy(self.config)
+        data['is_ocr'] = if_ocr
+        data['language'] = lang
+        data['files'] = files
+
+        try:
+            result = await self._request_json('POST', self.batch_url, json=data)
+        except Exception as err:
+            print(err)
+            return None
+
+        if result.get("code") != 0:
+            print('apply upload url failed,reason:{}'.format(result.get('msg')))
+            return None
+
+        batch_id = result["data"]["batch_id"]
+        urls = result["data"]["file_urls"]
+        print('batch_id:{}, {} upload urls applied'.format(batch_id, len(urls)))
+
+        uploaded = await asyncio.gather(*[self.upload_file(url, file_path) for url, file_path in zip(urls, pdf_files)])
+        print(f"{sum(uploaded)}/{len(pdf_files)} files uploaded.")
+        result['uploaded'] = list(uploaded)
+        return result
+
+    async def batch_process_files_cached(self, pdf_files: List[str], save_path: str,
+                                         if_ocr: Optional[bool] = False, lang: Optional[str] = 'en') -> Dict:
+        """same as batch_process_files, but pdf files already in result cache are restored into save_path
+        instead of being submitted; the rest are cached once downloaded by the batch tracker (matched by data_id)
+        Returns:
+            dict with "cached" ({pdf file: restored folder}) and "response" (None if nothing submitted)
+        """
+        if self.result_cache is None:
+            return {"cached": {}, "response": await self.batch_process_files(pdf_files, if_ocr, lang)}
+        config = dict(self.config, is_ocr=if_ocr, language=lang)
+        remaining, restored, data_ids = await asyncio.to_thread(self.result_cache.filter_files, pdf_files, config, save_path)
+        response = await self.batch_process_files(remaining, if_ocr, lang, data_ids) if remaining else None
+        uploaded = response['uploaded'] if response is not None else [False] * len(data_ids)
+        for data_id, flag in zip(data_ids, uploaded):
+            if not flag:  # never processed, don't keep it pending
+                self.result_cache.discard(data_id)
+        return {"cached": restored, "response": response}
+
+    async def batch_process_files_sharded(self, pdf_files: List[str], shard_dir: str, max_pages: int = 20,
+                                         min_pages: int = 40, if_ocr: Optional[bool] = False,
+                                         lang: Optional[str] = 'en') -> Dict:
+        """split long pdfs into page-range shards and submit all shards in one batch
+        Args:
+            pdf_files: list of local pdf paths
+            shard_dir: folder to save shards and shard manifest
+            max_pages: max number of pages per shard
+            min_pages: pdf with fewer pages is submitted as is
+        Returns:
+            dict with "manifest" ({pdf file: shards}) and "response" of batch_process_files
+        Note:
+            once the batch is downloaded, call merge_sharded_results to get one result folder per pdf.
+        """
+        manifest = await asyncio.to_thread(plan_shards, pdf_files, shard_dir, max_pages, min_pages)
+        shard_files = [x['shard_path'] for shards in manifest.values() for x in shards]
+        print(f"{len(pdf_files)} pdf files submitted as {len(shard_files)} shards.")
+        return {"manifest": manifest, "response": await self.batch_process_files(shard_files, if_ocr, lang)}
+
+    async def merge_sharded_results(self, save_path: str, shard_dir: str, remove_shards: bool = True) -> Dict:
+        """merge downloaded shard results back into one folder per pdf, refer to mineru_shard.merge_manifest
+        Returns:
+            {pdf file: merged folder}, None if some shard result is missing
+        """
+        return await asyncio.to_thread(merge_manifest, load_manifest(shard_dir), save_path, remove_shards)
+
+    async def batch_process_urls(self, pdf_urls: List[str], if_ocr: Optional[bool] = False,
+                                 lang: Optional[str] = 'en', data_ids: Optional[List[str]] = None) -> Optional[Dict]:
+        """apply MinerU API to process multiple PDF urls
+        Returns:
+            json response of MinerU API, None if request failed
+        """
+        files = []
+        data_ids = data_ids or [str(uuid.uuid1()) for _ in pdf_urls]
+        for pdf_url, data_id in zip(pdf_urls, data_ids):
+            files.append({"url": pdf_url,
+                          "data_id": data_id})
+        data = copy.deepcopy(self.config)
+        data['is_ocr'] = if_ocr
+        data['language'] = lang
+        data['files'] = files
+
+        try:
+            result = await self._request_json('POST', self.batch_url, json=data)
+        except Exception as err:
+            print(err)
+            return None
+        if result.get("code") != 0:
+            print('submit task failed,reason:{}'.format(result.get('msg')))
+        return result
+
+    async def batch_process_urls_cached(self, pdf_urls: List[str], save_path: str,
+                                        if_ocr: Optional[bool] = False, lang: Optional[str] = 'en') -> Dict:
+        """same as batch_process_files_cached for pdf urls"""
+        if self.result_cache is None:
+            return {"cached": {}, "response": await self.batch_process_urls(pdf_urls, if_ocr, lang)}
+        config = dict(self.config, is_ocr=if_ocr, language=lang)
+        remaining, restored, data_ids = await asyncio.to_thread(self.result_cache.filter_urls, pdf_urls, config, save_path)
+        response = await self.batch_process_urls(remaining, if_ocr, lang, data_ids) if remaining else None
+        if response is None or response.get('code') != 0:
+            for data_id in data_ids:
+                self.result_cache.discard(data_id)
+        return {"cached": restored, "response": response}
+
+    async def batch_status_check(self, batch_id) -> Dict:
+        """check status of batch task
+        Returns:
+            json response of MinerU API
+        """
+        url = f'{self.batch_status_url}/{batch_id}'
+        return await self._request_json('GET', url)
+
+    async def download_file(self, url: str, filename: str, expected_size: Optional[int] = None,
+                            expected_sha256: Optional[str] = None) -> Optional[str]:
+        """download file in chunks, so memory use does not grow with file size
+        Returns:
+            sha256 hex digest of downloaded file, None if download or verification failed
+        """
+        async def handler(response):
+            size_expected = expected_size
+            if size_expected is None and response.content_length is not None:
+                size_expected = response.content_length
+            sha256, size = hashlib.sha256(), 0
+            try:
+                with open(filename, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        f.write(chunk)
+                        sha256.update(chunk)
+                        size += len(chunk)
+            except RETRY_ERRORS:
+                os.remove(filename)  # drop the partial file before the request is retried
+                raise
+            verify_download(filename, size, sha256.hexdigest(), size_expected, expected_sha256)
+            return sha256.hexdigest()
+
+        async with self.download_semaphore:
+            try:
+                digest = await self._request('GET', url, handler)
+                print(f"Successfully downloaded: {filename}")
+                return digest
+            except Exception as err:
+                print(f"Error downloading: {err!r}")
+                if os.path.exists(filename):
+                    os.remove(filename)
+                return None
+
+    async def download_and_unzip(self, zip_url, download_file_name, unzip_folder_name,
+                                 expected_sha256=None) -> Optional[List[str]]:
+        """download and unzip MinerU processed files, refer to MinerUKit.download_and_unzip
+        Returns:
+            list of extracted file names, None if download or extraction failed
+        """
+        if await self.download_file(zip_url, download_file_name, expected_sha256=expected_sha256) is None:
+            return None
+        try:
+            return await asyncio.to_thread(extract_results, download_file_name, unzip_folder_name)
+        except zipfile.BadZipFile as err:
+            print(f"Error extracting {download_file_name}: {err}")
+            return None
+        finally:
+            os.remove(download_file_name)
@@ -0,0 +1,337 @@
+# MinerU batch tracker
+# poll batch status with adaptive backoff, download finished files on a bounded pool,
+# hand each finished file to downstream processing as soon as it is unzipped,
+# and persist tracking state so that an interrupted monitor can resume.
+import os
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Optional, Callable, Iterator, AsyncIterator
+
+TERMINAL_STATES = ('done', 'failed')
+
+
+class _BatchTrackerBase:
+    def __init__(self, kit, batch_id: str, save_path: str,
+                 state_path: Optional[str] = None,
+                 min_interval: float = 5,
+                 max_interval: float = 120,
+                 backoff: float = 1.5,
+                 max_wait: Optional[float] = None,
+                 max_polls: Optional[int] = None,
+                 max_download_retries: int = 3,
+                 failed_files: Optional[List[str]] = None):
+        """
+        Args:
+            kit: MinerUKit (sync tracker) or AsyncMinerUKit (async tracker)
+            batch_id: batch id
+            save_path: path to save processed files (in folder whose name aligned with orginal pdf)
+            state_path: (optional) json file to persist tracking state, default to <save_path>/<batch_id>.tracker.json
+            min_interval: min time interval between status checks (in seconds)
+            max_interval: max time interval between status checks (in seconds)
+            backoff: multiplier of interval when no file finished since last check
+            max_wait: (optional) stop tracking after max_wait seconds
+            max_polls: (optional) stop tracking after max_polls status checks
+            max_download_retries: max retries of a failed download before giving up the file
+            failed_files: (optional) file names whose upload failed, they stay in "waiting-file" at MinerU
+                and are recorded as failed instead of being waited for
+        """
+        self.kit = kit
+        self.batch_id = batch_id
+        self.save_path = save_path
+        self.state_path = state_path or os.path.join(save_path, f"{batch_id}.tracker.json")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_wait = max_wait
+        self.max_polls = max_polls
+        self.max_download_retries = max_download_retries
+
+        self.interval = min_interval
+        self.polls = 0
+        self.finished_cnt = 0   # files in terminal state at MinerU, as of last check
+        self.last_poll = None
+        self.inflight = set()   # file names being downloaded
+        self.undownloaded = set()  # file names done at MinerU but not downloaded yet
+        self.download_failures = {}  # file name -> number of failed downloads
+        self.data_ids = {}  # file name -> data_id echoed by MinerU, used to fill the kit's result cache
+        self.all_finished = False
+        self.state = self.load_state()
+        for file_name in failed_files or []:
+            self.state['failed'].setdefault(file_name, "upload failed")
+
+    def load_state(self) -> Dict:
+        """load tracking state of previous run, files already done are not downloaded again"""
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('batch_id') == self.batch_id:
+                return state
+        return {"batch_id": self.batch_id, "done": {}, "failed": {}}
+
+    def save_state(self):
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)  # never leave a half written state file
+
+    def _update_interval(self, results: List[Dict]):
+        """adapt interval to observed completion rate
+        Note:
+            if files finished since last check, next check is scheduled after the average time per finished file;
+            otherwise the interval grows by backoff.
+        """
+        now = time.monotonic()
+        finished_cnt = sum(1 for item in results if self._is_terminal(item))
+        newly_finished = finished_cnt - self.finished_cnt
+        if self.last_poll is not None:
+            if newly_finished > 0:
+                self.interval = (now - self.last_poll) / newly_finished
+            else:
+                self.interval = self.interval * self.backoff
+            self.interval = max(self.min_interval, min(self.max_interval, self.interval))
+        self.finished_cnt = finished_cnt
+        self.last_poll = now
+
+    def _is_terminal(self, item: Dict) -> bool:
+        return item.get('state') in TERMINAL_STATES or item.get('file_name') in self.state['failed']
+
+    def _wait_timeout(self, deadline: float) -> Optional[float]:
+        """timeout for waiting downloads: block until the next one finishes once MinerU has nothing left to run"""
+        if self.all_finished:
+            return None
+        return max(0, deadline - time.monotonic())
+
+    def _handle_status(self, result: Dict) -> tuple:
+        """parse batch status
+        Returns:
+            (files to download as (file_name, zip_url), events of newly failed files)
+        """
+        self.polls += 1
+        if result.get('msg') != 'ok':
+            print(f"Batch {self.batch_id} status check failed: {result.get('msg')}")
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+            return [], []
+
+        results = result.get('data', {}).get('extract_result', [])
+        self._update_interval(results)
+
+        to_download, failed = [], []
+        for item in results:
+            file_name = item.get('file_name')
+            if item.get('data_id'):
+                self.data_ids[file_name] = item['data_id']
+            if file_name in self.state['done'] or file_name in self.inflight:
+                continue
+            if item.get('state') == 'done':
+                self.undownloaded.add(file_name)
+                if self.download_failures.get(file_name, 0) > self.max_download_retries:
+                    continue
+                self.inflight.add(file_name)
+                to_download.append((file_name, item.get('full_zip_url')))
+            elif item.get('state') == 'failed' and file_name not in self.state['failed']:
+                self.state['failed'][file_name] = item.get('err_msg')
+                failed.append({"file_name": file_name, "state": "failed", "folder": None, "err_msg": item.get('err_msg')})
+            if file_name in self.state['failed'] and self.result_cache is not None and item.get('data_id'):
+                self.result_cache.discard(item['data_id'])
+
+        self.all_finished = len(results) > 0 and all(self._is_terminal(item) for item in results)
+        if failed:
+            self.save_state()
+        print(f"Batch {self.batch_id}: {self.finished_cnt}/{len(results)} finished, recheck in {self.interval:.0f} seconds...")
+        return to_download, failed
+
+    @property
+    def result_cache(self):
+        return getattr(self.kit, 'result_cache', None)
+
+    def _cache_result(self, file_name: str, folder: str):
+        """store downloaded result in the kit's result cache, if the file was submitted through it"""
+        data_id = self.data_ids.get(file_name)
+        if self.result_cache is not None and data_id:
+            self.result_cache.complete(data_id, folder)
+
+    def _paths(self, file_name: str) -> tuple:
+        file_name_nosuffix = file_name.rsplit('.', 1)[0]
+        return (os.path.join(self.save_path, file_name_nosuffix + ".zip"),
+                os.path.join(self.save_path, file_name_nosuffix))
+
+    def _handle_download(self, file_name: str, extracted: Optional[List[str]]) -> Dict:
+        """record download result, failed downloads are retried on next status check"""
+        self.inflight.discard(file_name)
+        folder = self._paths(file_name)[1]
+        if extracted is None:
+            self.download_failures[file_name] = self.download_failures.get(file_name, 0) + 1
+            return {"file_name": file_name, "state": "download_failed", "folder": None, "err_msg": None}
+        self.state['done'][file_name] = folder
+        self.undownloaded.discard(file_name)
+        self.save_state()
+        return {"file_name": file_name, "state": "done", "folder": folder, "err_msg": None}
+
+    def _should_stop(self, start: float) -> bool:
+        retryable = [x for x in self.undownloaded if self.download_failures.get(x, 0) <= self.max_download_retries]
+        if self.all_finished and not self.inflight and not retryable:
+            return True
+        if self.max_polls is not None and self.polls >= self.max_polls:
+            print(f"Exit as batch {self.batch_id} reached max polls.")
+            return True
+        if self.max_wait is not None and time.monotonic() - start >= self.max_wait:
+            print(f"Exit as batch {self.batch_id} reached max wait time.")
+            return True
+        return False
+
+    def summary(self) -> Dict:
+        return {"batch_id": self.batch_id, "done": len(self.state['done']), "failed": len(self.state['failed']),
+                "download_failed": len(self.undownloaded), "polls": self.polls, "all_finished": self.all_finished}
+
+
+class BatchTracker(_BatchTrackerBase):
+    """track MinerU batch with MinerUKit, downloads run on a bounded thread pool
+    Usage:
+        for event in BatchTracker(mineru, batch_id, save_path):
+            if event['state'] == 'done':
+                process(event['folder'])
+    """
+    def __init__(self, kit, batch_id: str, save_path: str, max_workers: int = 4, **kwargs):
+        """
+        Args:
+            max_workers: max number of concurrent downloads
+            kwargs: refer to _BatchTrackerBase
+        """
+        super().__init__(kit, batch_id, save_path, **kwargs)
+        self.max_workers = max_workers
+
+    def _download(self, file_name: str, zip_url: str) -> Optional[List[str]]:
+        zip_path, folder = self._paths(file_name)
+        extracted = self.kit.download_and_unzip(zip_url, zip_path, folder)
+        if extracted is not None:
+            self._cache_result(file_name, folder)
+        return extracted
+
+    def __iter__(self) -> Iterator[Dict]:
+        """yield one event per file as soon as it is downloaded and unzipped (or failed at MinerU)
+        Returns:
+            event dict with file_name, state ('done', 'failed' or 'download_failed'), folder and err_msg
+        """
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {}  # future -> file name
+            while True:
+                try:
+                    result = self.kit.batch_status_check(self.batch_id).json()
+                except Exception as err:
+                    result = {"msg": repr(err)}
+                to_download, failed = self._handle_status(result)
+                yield from failed
+                for file_name, zip_url in to_download:
+                    pending[executor.submit(self._download, file_name, zip_url)] = file_name
+
+                # wait for downloads until next check, hand over each file once it is ready
+                deadline = time.monotonic() + self.interval
+                while pending and (time.monotonic() < deadline or self.all_finished):
+                    done, _ = wait(pending, timeout=self._wait_timeout(deadline), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        file_name = pending.pop(future)
+                        try:
+                            extracted = future.result()
+                        except Exception as err:
+                            print(f"Error downloading {file_name}: {err!r}")
+                            extracted = None
+                        yield self._handle_download(file_name, extracted)
+
+                if self._should_stop(start):
+                    break
+                time.sleep(max(0, deadline - time.monotonic()))
+
+            for future in list(pending):  # leave with max_polls / max_wait: finish running downloads
+                file_name = pending.pop(future)
+                try:
+                    extracted = future.result()
+                except Exception as err:
+                    print(f"Error downloading {file_name}: {err!r}")
+                    extracted = None
+                yield self._handle_download(file_name, extracted)
+
+    def run(self, callback: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """track batch until all files finished, call callback on each event
+        Returns:
+            summary of the batch
+        """
+        for event in self:
+            if callback is not None:
+                callback(event)
+        print(f"Batch {self.batch_id} tracking finished: {self.summary()}")
+        return self.summary()
+
+
+class AsyncBatchTracker(_BatchTrackerBase):
+    """track MinerU batch with AsyncMinerUKit, downloads are bounded by the kit's download semaphore
+    Usage:
+        async for event in AsyncBatchTracker(mineru, batch_id, save_path):
+            ...
+    """
+    async def _download(self, file_name: str, zip_url: str) -> Optional[List[str]]:
+        zip_path, folder = self._paths(file_name)
+        extracted = await self.kit.download_and_unzip(zip_url, zip_path, folder)
+        if extracted is not None:
+            await asyncio.to_thread(self._cache_result, file_name, folder)
+        return extracted
+
+    def __aiter__(self) -> AsyncIterator[Dict]:
+        return self.events()
+
+    async def events(self) -> AsyncIterator[Dict]:
+        """async version of BatchTracker.__iter__"""
+        start = time.monotonic()
+        pending = {}  # task -> file name
+        try:
+            while True:
+                try:
+                    result = await self.kit.batch_status_check(self.batch_id)
+                except Exception as err:
+                    result = {"msg": repr(err)}
+                to_download, failed = self._handle_status(result)
+                for event in failed:
+                    yield event
+                for file_name, zip_url in to_download:
+                    pending[asyncio.create_task(self._download(file_name, zip_url))] = file_name
+
+                deadline = time.monotonic() + self.interval
+                while pending and (time.monotonic() < deadline or self.all_finished):
+                    done, _ = await asyncio.wait(pending, timeout=self._wait_timeout(deadline),
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        file_name = pending.pop(task)
+                        try:
+                            extracted = task.result()
+                        except Exception as err:
+                            print(f"Error downloading {file_name}: {err!r}")
+                            extracted = None
+                        yield self._handle_download(file_name, extracted)
+
+                if self._should_stop(start):
+                    break
+                await asyncio.sleep(max(0, deadline - time.monotonic()))
+
+            for task in list(pending):
+                file_name = pending.pop(task)
+                try:
+                    extracted = await task
+                except Exception as err:
+                    print(f"Error downloading {file_name}: {err!r}")
+                    extracted = None
+                yield self._handle_download(file_name, extracted)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def run(self, callback: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """track batch until all files finished, call callback (sync or async) on each event"""
+        async for event in self:
+            if callback is not None:
+                ret = callback(event)
+                if asyncio.iscoroutine(ret):
+                    await ret
+        print(f"Batch {self.batch_id} tracking finished: {self.summary()}")
+        return self.summary()
@@ -0,0 +1,122 @@
+# End-to-end MinerU ingestion benchmark against the local stand-in server
+# Usage (from wip/):
+#     python -m tools.mineru_benchmark --papers 200 --batch-size 50 --mode async --rate-5xx 0.02 --fail-rate 0.05
+# Note: MinerUKit does not retry uploads, with error injection in sync mode files whose upload failed
+# are recorded as failed instead of being waited for.
+import os
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+from typing import List, Dict, Optional
+
+from tools.mineru_tool import MinerUKit
+from tools.mineru_async_tool import AsyncMinerUKit
+from tools.mineru_batch_tracker import AsyncBatchTracker
+from tools.mineru_standin import MinerUStandIn
+
+
+def make_pdf_files(folder: str, n: int, size_kb: int) -> List[str]:
+    """dummy pdf files, the stand-in does not parse them"""
+    pdf_files = []
+    for i in range(n):
+        path = os.path.join(folder, f"paper_{i:05d}.pdf")
+        with open(path, 'wb') as f:
+            f.write(b"%PDF-1.4\n" + os.urandom(size_kb * 1024))
+        pdf_files.append(path)
+    return pdf_files
+
+
+def run_sync(server: MinerUStandIn, batches: List[List[str]], save_path: str, interval: float,
+             max_polls: Optional[int] = None) -> Dict:
+    """submit batches one after another with MinerUKit.process_files"""
+    mineru = server.point(MinerUKit("stand-in"))
+    folders = {}
+    for batch in batches:
+        folders.update(mineru.process_files(batch, save_path, interval=interval, max_polls=max_polls))
+    return folders
+
+
+async def run_async(server: MinerUStandIn, batches: List[List[str]], save_path: str, interval: float) -> Dict:
+    """submit all batches concurrently with AsyncMinerUKit, track each with AsyncBatchTracker"""
+    folders = {}
+    async with AsyncMinerUKit("stand-in", backoff_base=0.2, backoff_max=2) as mineru:
+        server.point(mineru)
+
+        async def one_batch(batch):
+            result = await mineru.batch_process_files(batch)
+            if result is None:
+                return
+            failed_files = [os.path.basename(x) for x, ok in zip(batch, result['uploaded']) if not ok]
+            tracker = AsyncBatchTracker(mineru, result['data']['batch_id'], save_path, min_interval=interval,
+                                        failed_files=failed_files)
+            async for event in tracker:
+                if event['state'] == 'done':
+                    folders[event['file_name']] = event['folder']
+
+        await asyncio.gather(*[one_batch(batch) for batch in batches])
+    return folders
+
+
+def benchmark(papers: int = 50, batch_size: int = 50, mode: str = 'async', size_kb: int = 256,
+              interval: float = 1, max_polls: Optional[int] = None, **standin_kwargs) -> Dict:
+    """run one benchmark
+    Args:
+        papers: number of papers
+        batch_size: papers per MinerU batch
+        mode: "sync" (MinerUKit) or "async" (AsyncMinerUKit)
+        size_kb: size of each dummy pdf
+        interval: min polling interval (in seconds)
+        max_polls: (optional) max status checks per batch in sync mode
+        standin_kwargs: arguments of MinerUStandIn (latency, error injection)
+    Returns:
+        report with papers/minute and stand-in stats
+    """
+    work_dir = tempfile.mkdtemp(prefix="mineru_bench_")
+    try:
+        pdf_files = make_pdf_files(work_dir, papers, size_kb)
+        save_path = os.path.join(work_dir, "results")
+        os.makedirs(save_path)
+        batches = [pdf_files[i:i+batch_size] for i in range(0, len(pdf_files), batch_size)]
+
+        with MinerUStandIn(**standin_kwargs) as server:
+            start = time.perf_counter()
+            if mode == 'sync':
+                folders = run_sync(server, batches, save_path, interval, max_polls)
+            else:
+                folders = asyncio.run(run_async(server, batches, save_path, interval))
+            elapsed = time.perf_counter() - start
+            stats = dict(server.stats)
+
+        done = sum(1 for x in folders.values() if x)
+        report = {"mode": mode, "papers": papers, "batches": len(batches), "done": done,
+                  "elapsed": round(elapsed, 2), "papers_per_minute": round(done / elapsed * 60, 1),
+                  "standin": stats}
+        print(report)
+        return report
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MinerU ingestion benchmark against local stand-in server")
+    parser.add_argument("--papers", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--mode", choices=["sync", "async"], default="async")
+    parser.add_argument("--size-kb", type=int, default=256)
+    parser.add_argument("--interval", type=float, default=1)
+    parser.add_argument("--max-polls", type=int, default=None)
+    parser.add_argument("--fixture-dir", default=None)
+    parser.add_argument("--queue-latency", type=float, nargs=2, default=[0.5, 1.0])
+    parser.add_argument("--run-latency", type=float, nargs=2, default=[1.0, 3.0])
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    benchmark(args.papers, args.batch_size, args.mode, args.size_kb, args.interval, args.max_polls,
+              fixture_dir=args.fixture_dir, queue_latency=tuple(args.queue_latency),
+              run_latency=tuple(args.run_latency), rate_429=args.rate_429, rate_5xx=args.rate_5xx,
+              fail_rate=args.fail_rate, seed=args.seed)
@@ -0,0 +1,185 @@
+# Local MinerU-compatible producer
+# run PDF2MARKDOWN (PDF-Extract-Kit models) on box and write the same output folder as MinerU API:
+# content_list.json, full.md and images/, so that PDFProcess and PDFSeg work on either backend.
+# LocalMinerUKit and MinerUKit share process_files(pdf_files, save_path, if_ocr, lang), use either one.
+import os
+import json
+import hashlib
+from typing import List, Dict, Optional
+
+from tools.mineru_tool import CONTENT_LIST_FILE
+from pdf_process.pdf_layout_det import PDF2MARKDOWN, crop_img
+
+TEXT_CATEGORIES = ('plain text', 'formula_caption')
+CAPTION_OWNER = {'figure_caption': 'figure', 'table_caption': 'table', 'table_footnote': 'table'}
+
+
+def block_bbox(block) -> List[float]:
+    xmin, ymin, _, _, xmax, ymax, _, _ = block['poly']
+    return [xmin, ymin, xmax, ymax]
+
+
+def nearest_owner(caption, owners: List[Dict]) -> Optional[int]:
+    """index of the figure / table closest to caption (vertical gap, then horizontal overlap), None if no owner"""
+    if not owners:
+        return None
+    cx0, cy0, cx1, cy1 = block_bbox(caption)
+
+    def distance(owner):
+        ox0, oy0, ox1, oy1 = block_bbox(owner)
+        gap = max(0, oy0 - cy1, cy0 - oy1)
+        overlap = max(0, min(cx1, ox1) - max(cx0, ox0))
+        return (gap, -overlap)
+    return min(range(len(owners)), key=lambda i: distance(owners[i]))
+
+
+def equation_text(latex: str) -> str:
+    latex = (latex or '').strip()
+    if latex.startswith('$$'):
+        return latex
+    return f"$$\n{latex.strip('$')}\n$$"
+
+
+def blocks_to_content_list(final_block: List[Dict], page_idx: int, page_image=None,
+                           image_dir: Optional[str] = None) -> List[Dict]:
+    """convert final_block of PDF2MARKDOWN.convert2md (one page) into MinerU content list items
+    Args:
+        final_block: ordered blocks of one page
+        page_idx: 0-based page index
+        page_image: (optional) PIL image of the page, used to crop figures and tables
+        image_dir: (optional) folder to save cropped images, named by sha256 of image as MinerU does
+    Returns:
+        list of content list items with type, text, text_level, page_idx, img_path and captions
+    Note:
+        "abandon" blocks (headers, footers, page numbers) are dropped like MinerU does.
+        captions and table footnotes are attached to the nearest figure / table of the page.
+    """
+    owners = {'figure': [], 'table': []}
+    for block in final_block:
+        if block['category_type'] in owners:
+            owners[block['category_type']].append(block)
+    attached = {id(block): {'caption': [], 'footnote': []} for lst in owners.values() for block in lst}
+
+    orphans = set()
+    for block in final_block:
+        owner_type = CAPTION_OWNER.get(block['category_type'])
+        if owner_type is None:
+            continue
+        idx = nearest_owner(block, owners[owner_type])
+        if idx is None:
+            orphans.add(id(block))  # keep as plain text
+            continue
+        key = 'footnote' if block['category_type'] == 'table_footnote' else 'caption'
+        attached[id(owners[owner_type][idx])][key].append((block.get('text') or '').strip())
+
+    content_list = []
+    for block in final_block:
+        category = block['category_type']
+        text = (block.get('text') or '').strip()
+        if category == 'title' and text:
+            content_list.append({"type": "text", "text": text, "text_level": 1, "page_idx": page_idx})
+        elif (category in TEXT_CATEGORIES or id(block) in orphans) and text:
+            content_list.append({"type": "text", "text": text, "page_idx": page_idx})
+        elif category == 'isolate_formula':
+            content_list.append({"type": "equation", "text": equation_text(block.get('latex')),
+                                 "text_format": "latex", "page_idx": page_idx})
+        elif category in owners:
+            img_path = None
+            if page_image is not None and image_dir is not None:
+                img_path = save_block_image(block, page_image, image_dir)
+            extra = attached[id(block)]
+            if category == 'figure':
+                content_list.append({"type": "image", "img_path": img_path, "img_caption": extra['caption'],
+                                     "img_footnote": [], "page_idx": page_idx})
+            else:
+                content_list.append({"type": "table", "img_path": img_path, "table_caption": extra['caption'],
+                                     "table_footnote": extra['footnote'], "table_body": "", "page_idx": page_idx})
+    return content_list
+
+
+def save_block_image(block, page_image, image_dir: str) -> str:
+    """crop block from page image and save as jpg
+    Returns:
+        image path relative to the result folder, e.g. images/<sha256>.jpg
+    """
+    os.makedirs(image_dir, exist_ok=True)
+    image, _ = crop_img(block, page_image)
+    data = image.tobytes()
+    img_nm = hashlib.sha256(data).hexdigest() + ".jpg"
+    img_file = os.path.join(image_dir, img_nm)
+    if not os.path.exists(img_file):
+        image.save(img_file, "JPEG")
+    return f"images/{img_nm}"
+
+
+def content_list_to_md(content_list: List[Dict]) -> str:
+    """MinerU style full.md from content list"""
+    parts = []
+    for item in content_list:
+        if item['type'] == 'text':
+            level = item.get('text_level')
+            parts.append(f"{'#' * level} {item['text']}" if level else item['text'])
+        elif item['type'] == 'equation':
+            parts.append(item['text'])
+        elif item['type'] == 'image':
+            parts.append("\n".join([f"![]({item['img_path'] or ''})"] + item['img_caption']))
+        elif item['type'] == 'table':
+            parts.append("\n".join(item['table_caption'] + [f"![]({item['img_path'] or ''})"] + item['table_footnote']))
+    return "\n\n".join(parts) + "\n"
+
+
+class LocalMinerUKit:
+    """MinerU-compatible backend running PDF2MARKDOWN locally
+    Usage:
+        mineru = LocalMinerUKit(PDF2MARKDOWN(layout_model, mfd_model, mfr_model, ocr_model))
+        # or mineru = MinerUKit(api_key)
+        folders = mineru.process_files(pdf_files, save_path)
+    """
+    def __init__(self, pdf2md: PDF2MARKDOWN):
+        """
+        Args:
+            pdf2md: PDF2MARKDOWN with loaded models (mfd_model is required for page results)
+        """
+        self.pdf2md = pdf2md
+
+    def process_file(self, pdf_file: str, unzip_folder_name: str) -> List[Dict]:
+        """process one pdf into MinerU output folder
+        Returns:
+            content list
+        """
+        pdf_extract_res, images = self.pdf2md.process_single_pdf(pdf_file)
+        image_dir = os.path.join(unzip_folder_name, "images")
+        os.makedirs(unzip_folder_name, exist_ok=True)
+
+        content_list = []
+        for page_idx, extract_res in enumerate(pdf_extract_res):
+            final_block, _ = self.pdf2md.convert2md(extract_res)
+            page_image = images[page_idx] if page_idx < len(images) else None
+            content_list.extend(blocks_to_content_list(final_block, page_idx, page_image, image_dir))
+
+        with open(os.path.join(unzip_folder_name, CONTENT_LIST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(content_list, f, ensure_ascii=False, indent=4)
+        with open(os.path.join(unzip_folder_name, "full.md"), 'w', encoding='utf-8') as f:
+            f.write(content_list_to_md(content_list))
+        return content_list
+
+    def process_files(self, pdf_files: List[str], save_path: str, if_ocr: Optional[bool] = False,
+                      lang: Optional[str] = 'en') -> Dict[str, Optional[str]]:
+        """process pdf files into MinerU output folders (named after pdf files) under save_path
+        Note:
+            if_ocr and lang are kept for interface compatibility with MinerUKit.process_files,
+            whether ocr is used depends on the ocr_model given to PDF2MARKDOWN.
+        Returns:
+            {pdf file: result folder}, None if failed
+        """
+        folders = {}
+        for pdf_file in pdf_files:
+            folder = os.path.join(save_path, os.path.basename(pdf_file).rsplit('.', 1)[0])
+            try:
+                self.process_file(pdf_file, folder)
+                folders[pdf_file] = folder
+                print(f"Successfully processed: {pdf_file}")
+            except Exception as err:
+                print(f"Error processing {pdf_file}: {err!r}")
+                folders[pdf_file] = None
+        return folders
@@ -0,0 +1,191 @@
+# Content-addressed cache of MinerU results
+# results are stored under the sha256 of the pdf plus the MinerU config that produced them,
+# so that a pdf submitted again (from any pipeline, under any file name) is served locally
+# instead of being uploaded and processed again.
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from typing import List, Dict, Optional, Tuple
+
+# MinerU options that change the output, other options (e.g. data_id) do not affect the cache key
+CACHE_CONFIG_KEYS = ('enable_formula', 'enable_table', 'layout_model', 'is_ocr', 'language')
+CACHE_META_FILE = "meta.json"
+CHUNK_SIZE = 1 << 20
+PENDING_TTL = 7 * 24 * 3600  # pending submissions older than this (in seconds) are dropped from the index
+
+
+def file_sha256(file_path: str) -> str:
+    """sha256 hex digest of file, read in chunks"""
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def config_digest(config: Dict) -> str:
+    """digest of the MinerU options that affect the output"""
+    data = {k: config.get(k) for k in CACHE_CONFIG_KEYS}
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+class MinerUResultCache:
+    """local store of MinerU outputs keyed by pdf sha256 and MinerU config"""
+    def __init__(self, cache_dir: str):
+        """
+        Args:
+            cache_dir: folder of the cache, created if not exists
+        Note:
+            <cache_dir>/results/<sha256[:2]>/<sha256>_<config digest>/ holds full.md, content_list.json,
+            layout.json, images and meta.json;
+            <cache_dir>/index.json maps submitted urls to result keys and keeps submissions still pending at MinerU,
+            keyed by the data_id sent with each file.
+        """
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(cache_dir, "results"), exist_ok=True)
+        self.index = self._load_index()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _load_index(self) -> Dict:
+        if not os.path.exists(self.index_path):
+            return {"urls": {}, "pending": {}}
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        expire = time.time() - PENDING_TTL
+        index['pending'] = {k: v for k, v in index['pending'].items() if v.get('created', 0) >= expire}
+        return index
+
+    def _save_index(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def cache_key(pdf_sha256: str, config: Dict) -> str:
+        return f"{pdf_sha256}_{config_digest(config)}"
+
+    @staticmethod
+    def url_key(pdf_url: str, config: Dict) -> str:
+        return f"{pdf_url}#{config_digest(config)}"
+
+    def result_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, "results", key[:2], key)
+
+    def get(self, key: str) -> Optional[str]:
+        """get cached result folder by key, None if not cached"""
+        path = self.result_path(key)
+        if os.path.exists(os.path.join(path, CACHE_META_FILE)):
+            self.stats['hits'] += 1
+            return path
+        self.stats['misses'] += 1
+        return None
+
+    def put(self, key: str, result_folder: str, meta: Optional[Dict] = None) -> str:
+        """copy MinerU result folder into cache
+        Note:
+            meta.json is written last, so an interrupted copy is never treated as cached.
+        """
+        path = self.result_path(key)
+        shutil.copytree(result_folder, path, dirs_exist_ok=True)
+        with open(os.path.join(path, CACHE_META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta or {}, f, ensure_ascii=False)
+        return path
+
+    def restore(self, key: str, dest_folder: str) -> Optional[str]:
+        """copy cached result into dest_folder, None if not cached"""
+        path = self.get(key)
+        if path is None:
+            return None
+        shutil.copytree(path, dest_folder, dirs_exist_ok=True, ignore=shutil.ignore_patterns(CACHE_META_FILE))
+        return dest_folder
+
+    def _add_pending(self, entry: Dict) -> str:
+        """register a file to be submitted, returns the data_id to submit it with"""
+        data_id = str(uuid.uuid1())
+        with self._lock:
+            self.index['pending'][data_id] = dict(entry, created=time.time())
+        return data_id
+
+    def filter_files(self, pdf_files: List[str], config: Dict,
+                     save_path: str) -> Tuple[List[str], Dict[str, str], List[str]]:
+        """restore cached pdf files into save_path and register the rest as pending
+        Args:
+            pdf_files: list of local pdf paths
+            config: MinerU config of the batch (with is_ocr and language)
+            save_path: path to save processed files (in folder whose name aligned with orginal pdf)
+        Returns:
+            (pdf files to submit, {pdf file: restored folder}, data_ids to submit the files with)
+        """
+        remaining, restored, data_ids = [], {}, []
+        digest = config_digest(config)
+        for pdf_file in pdf_files:
+            key = self.cache_key(file_sha256(pdf_file), config)
+            folder_nm = os.path.basename(pdf_file).rsplit('.', 1)[0]
+            folder = self.restore(key, os.path.join(save_path, folder_nm))
+            if folder is not None:
+                restored[pdf_file] = folder
+            else:
+                remaining.append(pdf_file)
+                data_ids.append(self._add_pending({"key": key, "source": pdf_file, "config": digest}))
+        with self._lock:
+            self._save_index()
+        print(f"{len(restored)}/{len(pdf_files)} pdf files served from MinerU result cache.")
+        return remaining, restored, data_ids
+
+    def filter_urls(self, pdf_urls: List[str], config: Dict,
+                    save_path: str) -> Tuple[List[str], Dict[str, str], List[str]]:
+        """same as filter_files for pdf urls
+        Note:
+            urls are mapped to results by url, as the pdf content is unknown before MinerU fetches it.
+        """
+        remaining, restored, data_ids = [], {}, []
+        digest = config_digest(config)
+        for pdf_url in pdf_urls:
+            url_key = self.url_key(pdf_url, config)
+            folder_nm = pdf_url.rstrip('/').rsplit('/', 1)[-1].rsplit('.', 1)[0]
+            key = self.index['urls'].get(url_key)
+            folder = self.restore(key, os.path.join(save_path, folder_nm)) if key else None
+            if folder is not None:
+                restored[pdf_url] = folder
+            else:
+                remaining.append(pdf_url)
+                data_ids.append(self._add_pending({"key": hashlib.sha256(url_key.encode('utf-8')).hexdigest(),
+                                                   "source": pdf_url, "url_key": url_key, "config": digest}))
+        with self._lock:
+            self._save_index()
+        print(f"{len(restored)}/{len(pdf_urls)} pdf urls served from MinerU result cache.")
+        return remaining, restored, data_ids
+
+    def complete(self, data_id: str, result_folder: str) -> Optional[str]:
+        """store downloaded result of a pending file, called by the batch trackers
+        Args:
+            data_id: data_id the file was submitted with (from filter_files / filter_urls)
+            result_folder: downloaded MinerU result
+        Returns:
+            cached result folder, None if data_id is not pending
+        """
+        with self._lock:
+            pending = self.index['pending'].get(data_id)
+        if pending is None:
+            return None
+
+        path = self.put(pending['key'], result_folder, meta={"source": pending['source']})
+        with self._lock:
+            if pending.get('url_key'):
+                self.index['urls'][pending['url_key']] = pending['key']
+            self.index['pending'].pop(data_id, None)
+            self._save_index()
+        return path
+
+    def discard(self, data_id: str):
+        """drop a pending file which failed at MinerU or failed to upload"""
+        with self._lock:
+            if self.index['pending'].pop(data_id, None) is not None:
+                self._save_index()
@@ -0,0 +1,158 @@
+# Page-range sharding of large PDFs for MinerU
+# long pdfs are split into page-range shards which are processed in parallel within one MinerU batch,
+# then shard outputs (content_list.json, full.md, layout.json, images) are merged back into one folder
+# with page_idx shifted to the original pages and image paths made unique.
+import os
+import re
+import json
+import shutil
+import fitz
+from typing import List, Dict, Optional
+
+SHARD_MANIFEST_FILE = "shard_manifest.json"
+MD_IMG_PTRN = re.compile(r"\]\(images/([^)\s]+)\)")
+
+
+def shard_name(pdf_path: str, start_page: int, end_page: int) -> str:
+    """file name of shard, e.g. paper__p0020-0039.pdf (pages are 0-based and inclusive)"""
+    stem = os.path.basename(pdf_path).rsplit('.', 1)[0]
+    return f"{stem}__p{start_page:04d}-{end_page:04d}.pdf"
+
+
+def shard_pdf(pdf_path: str, shard_dir: str, max_pages: int = 20, min_pages: int = 40) -> List[Dict]:
+    """split pdf into page-range shards
+    Args:
+        pdf_path: path to pdf file
+        shard_dir: folder to save shards
+        max_pages: max number of pages per shard
+        min_pages: pdf with fewer pages is not sharded
+    Returns:
+        list of shards with "shard_path", "start_page" and "end_page" (0-based, inclusive);
+        single shard pointing to pdf_path itself if not sharded
+    """
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+        if page_count < min_pages:
+            return [{"shard_path": pdf_path, "start_page": 0, "end_page": page_count - 1}]
+
+        os.makedirs(shard_dir, exist_ok=True)
+        shards = []
+        for start_page in range(0, page_count, max_pages):
+            end_page = min(start_page + max_pages, page_count) - 1
+            shard_path = os.path.join(shard_dir, shard_name(pdf_path, start_page, end_page))
+            with fitz.open() as shard:
+                shard.insert_pdf(doc, from_page=start_page, to_page=end_page)
+                shard.save(shard_path, garbage=3, deflate=True)
+            shards.append({"shard_path": shard_path, "start_page": start_page, "end_page": end_page})
+    return shards
+
+
+def plan_shards(pdf_files: List[str], shard_dir: str, max_pages: int = 20, min_pages: int = 40) -> Dict[str, List[Dict]]:
+    """shard pdf files and save manifest into shard_dir
+    Returns:
+        manifest as {pdf file: list of shards}, refer to shard_pdf
+    """
+    manifest = {pdf_file: shard_pdf(pdf_file, shard_dir, max_pages, min_pages) for pdf_file in pdf_files}
+    os.makedirs(shard_dir, exist_ok=True)
+    with open(os.path.join(shard_dir, SHARD_MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=4)
+    return manifest
+
+
+def load_manifest(shard_dir: str) -> Dict[str, List[Dict]]:
+    with open(os.path.join(shard_dir, SHARD_MANIFEST_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def result_folder(save_path: str, file_path: str) -> str:
+    """MinerU result folder of a submitted file, named after the file (refer to MinerUKit.monitor_batch_status)"""
+    return os.path.join(save_path, os.path.basename(file_path).rsplit('.', 1)[0])
+
+
+def merge_shards(shards: List[Dict], shard_folders: List[str], dest_folder: str) -> Dict:
+    """merge MinerU outputs of shards into one folder
+    Args:
+        shards: shards of one pdf, refer to shard_pdf
+        shard_folders: MinerU result folder of each shard, same order as shards
+        dest_folder: folder for merged output
+    Returns:
+        dict with number of merged "items", "pages" and "images"
+    Note:
+        image names get the shard's start page as prefix (images/p0020_<name>), so images of different shards never clash.
+    """
+    os.makedirs(os.path.join(dest_folder, "images"), exist_ok=True)
+    content_list, md_parts, layout_pages = [], [], []
+    img_cnt = 0
+    for shard, folder in zip(shards, shard_folders):
+        offset = shard['start_page']
+        prefix = f"p{offset:04d}_"
+
+        img_dir = os.path.join(folder, "images")
+        if os.path.isdir(img_dir):
+            for img_nm in os.listdir(img_dir):
+                shutil.copyfile(os.path.join(img_dir, img_nm), os.path.join(dest_folder, "images", prefix + img_nm))
+                img_cnt += 1
+
+        content_path = os.path.join(folder, "content_list.json")
+        if os.path.exists(content_path):
+            with open(content_path, 'r', encoding='utf-8') as f:
+                for item in json.load(f):
+                    if item.get('page_idx') is not None:
+                        item['page_idx'] += offset
+                    if item.get('img_path'):
+                        item['img_path'] = item['img_path'].replace("images/", "images/" + prefix, 1)
+                    content_list.append(item)
+
+        md_path = os.path.join(folder, "full.md")
+        if os.path.exists(md_path):
+            with open(md_path, 'r', encoding='utf-8') as f:
+                md_parts.append(MD_IMG_PTRN.sub(lambda m: f"](images/{prefix}{m.group(1)})", f.read()))
+
+        layout_path = os.path.join(folder, "layout.json")
+        if os.path.exists(layout_path):
+            with open(layout_path, 'r', encoding='utf-8') as f:
+                for page in json.load(f).get('pdf_info', []):
+                    if page.get('page_idx') is not None:
+                        page['page_idx'] += offset
+                    layout_pages.append(page)
+
+    with open(os.path.join(dest_folder, "content_list.json"), 'w', encoding='utf-8') as f:
+        json.dump(content_list, f, ensure_ascii=False, indent=4)
+    with open(os.path.join(dest_folder, "full.md"), 'w', encoding='utf-8') as f:
+        f.write("\n\n".join(x.strip('\n') for x in md_parts) + "\n")
+    if layout_pages:
+        with open(os.path.join(dest_folder, "layout.json"), 'w', encoding='utf-8') as f:
+            json.dump({"pdf_info": layout_pages}, f, ensure_ascii=False)
+    return {"items": len(content_list), "pages": shards[-1]['end_page'] + 1, "images": img_cnt}
+
+
+def merge_manifest(manifest: Dict[str, List[Dict]], save_path: str, remove_shards: bool = True) -> Dict[str, Optional[str]]:
+    """merge shard outputs of all sharded pdfs in manifest
+    Args:
+        manifest: refer to plan_shards
+        save_path: path where MinerU results were downloaded
+        remove_shards: remove shard result folders after merging
+    Returns:
+        {pdf file: merged folder}, None if some shard result is missing
+    """
+    merged = {}
+    for pdf_file, shards in manifest.items():
+        dest_folder = result_folder(save_path, pdf_file)
+        if len(shards) == 1 and shards[0]['shard_path'] == pdf_file:
+            merged[pdf_file] = dest_folder if os.path.isdir(dest_folder) else None
+            continue
+
+        shard_folders = [result_folder(save_path, x['shard_path']) for x in shards]
+        missing = [x for x in shard_folders if not os.path.isdir(x)]
+        if missing:
+            print(f"Skip merging {pdf_file}: {len(missing)}/{len(shards)} shard results missing.")
+            merged[pdf_file] = None
+            continue
+
+        stats = merge_shards(shards, shard_folders, dest_folder)
+        print(f"Merged {len(shards)} shards of {pdf_file}: {stats}")
+        if remove_shards:
+            for folder in shard_folders:
+                shutil.rmtree(folder)
+        merged[pdf_file] = dest_folder
+    return merged
@@ -0,0 +1,312 @@
+# Local stand-in of MinerU API for throughput and failure testing
+# implements the endpoints used by MinerUKit (TASK_URL, BATCH_URL, BATCH_STATUS_URL) plus presigned uploads
+# and result zips, with configurable processing latency, state transitions and error injection.
+# Usage:
+#     with MinerUStandIn(fixture_dir="path/to/mineru/output") as server:
+#         mineru = server.point(MinerUKit("any-key"))
+#         mineru.process_files(pdf_files, save_path)
+import io
+import os
+import json
+import time
+import uuid
+import random
+import zipfile
+import threading
+from urllib.parse import urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Optional, Tuple
+
+API_PREFIX = "/api/v4"
+DEFAULT_FIXTURE = {
+    "full.md": "# Introduction\n\nThis is a stand-in MinerU result.\n\n![](images/fixture.jpg)\nFigure 1: fixture\n",
+    "content_list.json": json.dumps([
+        {"type": "text", "text": "Introduction", "text_level": 1, "page_idx": 0},
+        {"type": "text", "text": "This is a stand-in MinerU result.", "page_idx": 0},
+        {"type": "image", "img_path": "images/fixture.jpg", "img_caption": ["Figure 1: fixture"],
+         "img_footnote": [], "page_idx": 0}]),
+    "layout.json": json.dumps({"pdf_info": [{"page_idx": 0}]}),
+    "images/fixture.jpg": "not really a jpg",
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "MinerUStandIn/0.1"
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output clean
+
+    def _send_json(self, data: Dict, status: int = 200, headers: Optional[Dict] = None):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def _inject_error(self) -> bool:
+        """reply 429 / 5xx at configured rates, return True if an error was sent"""
+        standin = self.server.standin
+        status = standin.draw_error()
+        if status is None:
+            return False
+        self._read_body()
+        headers = {'Retry-After': str(standin.retry_after)} if status == 429 else None
+        self._send_json({"code": status, "msg": f"injected {status}", "data": None}, status, headers)
+        return True
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        if self._inject_error():
+            return
+        data = json.loads(self._read_body() or b'{}')
+        if path == API_PREFIX + "/extract/task":
+            self._send_json(self.server.standin.create_task(data))
+        elif path == API_PREFIX + "/file-urls/batch":
+            self._send_json(self.server.standin.create_batch(data, self.base_url()))
+        else:
+            self._send_json({"code": 404, "msg": "not found"}, 404)
+
+    def do_PUT(self):
+        parts = urlparse(self.path).path.strip('/').split('/')
+        if self._inject_error():
+            return
+        body = self._read_body()
+        if len(parts) == 3 and parts[0] == 'upload' and self.server.standin.upload(parts[1], int(parts[2]), body):
+            self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        else:
+            self._send_json({"code": 404, "msg": "unknown upload url"}, 404)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if self._inject_error():
+            return
+        standin = self.server.standin
+        if path.startswith(API_PREFIX + "/extract-results/batch/"):
+            result = standin.batch_status(path.rsplit('/', 1)[-1], self.base_url())
+            self._send_json(result, 200 if result['code'] == 0 else 404)
+        elif path.startswith(API_PREFIX + "/extract/task/"):
+            result = standin.task_status(path.rsplit('/', 1)[-1], self.base_url())
+            self._send_json(result, 200 if result['code'] == 0 else 404)
+        elif path.startswith("/results/"):
+            payload = standin.result_zip(path.rsplit('/', 1)[-1].rsplit('.', 1)[0])
+            if payload is None:
+                self._send_json({"code": 404, "msg": "not found"}, 404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/zip')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        else:
+            self._send_json({"code": 404, "msg": "not found"}, 404)
+
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class MinerUStandIn:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 fixture_dir: Optional[str] = None,
+                 queue_latency: Tuple[float, float] = (0.5, 1.0),
+                 run_latency: Tuple[float, float] = (1.0, 3.0),
+                 rate_429: float = 0.0,
+                 rate_5xx: float = 0.0,
+                 fail_rate: float = 0.0,
+                 retry_after: int = 1,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            host: host to bind
+            port: port to bind, 0 for a free port
+            fixture_dir: (optional) MinerU output folder (full.md, content_list.json, layout.json, images/) served
+                as every result zip, a tiny built-in fixture is used if not given
+            queue_latency: (min, max) seconds a file stays "pending" after upload (or submit for urls)
+            run_latency: (min, max) seconds a file stays "running" before it is done
+            rate_429: share of requests answered with 429 (with Retry-After)
+            rate_5xx: share of requests answered with 500 / 502 / 503
+            fail_rate: share of files ending in "failed" state, i.e. partial batches
+            retry_after: Retry-After seconds sent with 429
+            seed: (optional) random seed for reproducible runs
+        """
+        self.queue_latency = queue_latency
+        self.run_latency = run_latency
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.fail_rate = fail_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.fixture = self._load_fixture(fixture_dir)
+
+        self.batches = {}  # batch id -> list of file records
+        self.tasks = {}    # task id -> file record
+        self.files = {}    # result id -> file record
+        self.stats = {"requests": 0, "injected_429": 0, "injected_5xx": 0, "uploads": 0, "upload_bytes": 0,
+                      "downloads": 0}
+        self._lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.standin = self
+        self._thread = None
+
+    @staticmethod
+    def _load_fixture(fixture_dir: Optional[str]) -> Dict[str, bytes]:
+        """fixture files as {relative path: bytes}"""
+        if fixture_dir is None:
+            return {k: v.encode('utf-8') for k, v in DEFAULT_FIXTURE.items()}
+        fixture = {}
+        for root, _, file_nms in os.walk(fixture_dir):
+            for file_nm in file_nms:
+                path = os.path.join(root, file_nm)
+                with open(path, 'rb') as f:
+                    fixture[os.path.relpath(path, fixture_dir).replace(os.sep, '/')] = f.read()
+        return fixture
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def point(self, kit):
+        """point MinerUKit / AsyncMinerUKit to this server"""
+        kit.task_url = self.base_url + API_PREFIX + "/extract/task"
+        kit.batch_url = self.base_url + API_PREFIX + "/file-urls/batch"
+        kit.batch_status_url = self.base_url + API_PREFIX + "/extract-results/batch"
+        return kit
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        print(f"MinerU stand-in listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def draw_error(self) -> Optional[int]:
+        with self._lock:
+            self.stats['requests'] += 1
+            x = self.random.random()
+            if x < self.rate_429:
+                self.stats['injected_429'] += 1
+                return 429
+            if x < self.rate_429 + self.rate_5xx:
+                self.stats['injected_5xx'] += 1
+                return self.random.choice([500, 502, 503])
+        return None
+
+    def _new_file(self, name: str, data_id: Optional[str], url: Optional[str] = None) -> Dict:
+        record = {
+            "result_id": uuid.uuid4().hex,
+            "file_name": name,
+            "data_id": data_id,
+            "url": url,
+            "uploaded_at": None,
+            "queue_time": self.random.uniform(*self.queue_latency),
+            "run_time": self.random.uniform(*self.run_latency),
+            "will_fail": self.random.random() < self.fail_rate,
+        }
+        if url is not None:
+            record['uploaded_at'] = time.monotonic()  # url files are fetched by the server right away
+        self.files[record['result_id']] = record
+        return record
+
+    def _state(self, record: Dict) -> str:
+        """state machine: waiting-file -> pending -> running -> done / failed"""
+        if record['uploaded_at'] is None:
+            return 'waiting-file'
+        elapsed = time.monotonic() - record['uploaded_at']
+        if elapsed < record['queue_time']:
+            return 'pending'
+        if elapsed < record['queue_time'] + record['run_time']:
+            return 'running'
+        return 'failed' if record['will_fail'] else 'done'
+
+    def _file_result(self, record: Dict, base_url: str) -> Dict:
+        state = self._state(record)
+        result = {"file_name": record['file_name'], "data_id": record['data_id'], "state": state,
+                  "full_zip_url": "", "err_msg": ""}
+        if state == 'done':
+            result['full_zip_url'] = f"{base_url}/results/{record['result_id']}.zip"
+        elif state == 'failed':
+            result['err_msg'] = "injected failure"
+        elif state == 'running':
+            elapsed = time.monotonic() - record['uploaded_at'] - record['queue_time']
+            result['extract_progress'] = {"extracted_pages": int(10 * elapsed / record['run_time']), "total_pages": 10}
+        return result
+
+    def create_task(self, data: Dict) -> Dict:
+        with self._lock:
+            record = self._new_file(os.path.basename(data.get('url', 'task.pdf')), data.get('data_id'), data.get('url'))
+            self.tasks[record['result_id']] = record
+        return {"code": 0, "msg": "ok", "data": {"task_id": record['result_id']}}
+
+    def task_status(self, task_id: str, base_url: str) -> Dict:
+        record = self.tasks.get(task_id)
+        if record is None:
+            return {"code": -1, "msg": "task not found", "data": None}
+        result = self._file_result(record, base_url)
+        result['task_id'] = task_id
+        return {"code": 0, "msg": "ok", "data": result}
+
+    def create_batch(self, data: Dict, base_url: str) -> Dict:
+        batch_id = uuid.uuid4().hex
+        with self._lock:
+            records = [self._new_file(x.get('name') or os.path.basename(x.get('url', '')), x.get('data_id'), x.get('url'))
+                       for x in data.get('files', [])]
+            self.batches[batch_id] = records
+        result = {"batch_id": batch_id}
+        if any(x['url'] is None for x in records):
+            result['file_urls'] = [f"{base_url}/upload/{batch_id}/{i}?signature={uuid.uuid4().hex}"
+                                   for i in range(len(records))]
+        return {"code": 0, "msg": "ok", "data": result}
+
+    def upload(self, batch_id: str, idx: int, body: bytes) -> bool:
+        with self._lock:
+            records = self.batches.get(batch_id)
+            if records is None or not 0 <= idx < len(records):
+                return False
+            records[idx]['uploaded_at'] = time.monotonic()
+            self.stats['uploads'] += 1
+            self.stats['upload_bytes'] += len(body)
+        return True
+
+    def batch_status(self, batch_id: str, base_url: str) -> Dict:
+        records = self.batches.get(batch_id)
+        if records is None:
+            return {"code": -1, "msg": "batch not found", "data": None}
+        return {"code": 0, "msg": "ok",
+                "data": {"batch_id": batch_id, "extract_result": [self._file_result(x, base_url) for x in records]}}
+
+    def result_zip(self, result_id: str) -> Optional[bytes]:
+        """zip of fixture files laid out like MinerU results (<name>_content_list.json, <name>_origin.pdf)"""
+        record = self.files.get(result_id)
+        if record is None or self._state(record) != 'done':
+            return None
+        stem = record['file_name'].rsplit('.', 1)[0]
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+            for name, data in self.fixture.items():
+                if name == "content_list.json":
+                    name = f"{stem}_content_list.json"
+                zip_ref.writestr(name, data)
+            zip_ref.writestr(f"{stem}_origin.pdf", b"%PDF-1.4 stand-in")
+        with self._lock:
+            self.stats['downloads'] += 1
+        return buffer.getvalue()
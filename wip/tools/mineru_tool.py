@@ -4,19 +4,29 @@
 # To-do 
 # Note: monitor_batch_status need to be further tested
 import os
-import time
 import uuid
 import copy
+import shutil
+import hashlib
 import zipfile
 import requests
-import threading
-from pathlib import Path  
 from typing import List, Dict, Optional
 
+from tools.mineru_batch_tracker import BatchTracker
+from tools.mineru_result_cache import MinerUResultCache
+from tools.mineru_shard import plan_shards, load_manifest, merge_manifest
+
 TASK_URL = "https://mineru.net/api/v4/extract/task"
 BATCH_URL = "https://mineru.net/api/v4/file-urls/batch"
 BATCH_STATUS_URL = "https://mineru.net/api/v4/extract-results/batch"
 
+CHUNK_SIZE = 1 << 20  # 1MB per read / write when streaming files
+RESULT_FILES = ("full.md", "layout.json")  # members kept from result zip, besides content list and images
+RESULT_IMAGE_DIR = "images/"
+CONTENT_LIST_SUFFIX = "_content_list.json"
+CONTENT_LIST_FILE = "content_list.json"
+PROCESS_MAX_WAIT = 6 * 3600  # overall deadline (in seconds) of process_files
+
 
 def detect_lang(string):
     """
@@ -31,29 +41,94 @@ def detect_lang(string):
     return 'en'
 
 
-def unzip_file(original_zip_file, destination_folder):
-    assert os.path.splitext(original_zip_file)[-1] == '.zip'
-    with zipfile.ZipFile(original_zip_file, 'r') as zip_ref:
-        zip_ref.extractall(destination_folder)
-        print(f"Successfully unzipped: {destination_folder}")
-
-
-def download_file(url, filename):
-    """Downloads a file from the given URL and saves it as filename."""
+def download_file(url, filename, expected_size: Optional[int] = None, expected_sha256: Optional[str] = None):
+    """Downloads a file from the given URL in chunks and saves it as filename.
+    Args:
+        url: file url
+        filename: local path to save file
+        expected_size: (optional) expected size in bytes, Content-Length header is used if not given
+        expected_sha256: (optional) expected sha256 hex digest
+    Returns:
+        sha256 hex digest of downloaded file, None if download or verification failed
+    """
     try:
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an exception for bad status codes
+        with requests.get(url, stream=True) as response:
+            response.raise_for_status()  # Raise an exception for bad status codes
+            if expected_size is None and response.headers.get('Content-Length'):
+                expected_size = int(response.headers['Content-Length'])
 
-        with open(filename, 'wb') as f:
-            f.write(response.content)
+            sha256, size = hashlib.sha256(), 0
+            with open(filename, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    sha256.update(chunk)
+                    size += len(chunk)
 
+        verify_download(filename, size, sha256.hexdigest(), expected_size, expected_sha256)
         print(f"Successfully downloaded: {filename}")
-    except requests.exceptions.RequestException as e:
+        return sha256.hexdigest()
+    except (requests.exceptions.RequestException, ValueError) as e:
         print(f"Error downloading: {e}")
+        if os.path.exists(filename):
+            os.remove(filename)
+    return None
+
+
+def verify_download(filename, size, sha256, expected_size=None, expected_sha256=None):
+    """raise ValueError if size or sha256 of downloaded file is not as expected"""
+    if expected_size is not None and size != expected_size:
+        raise ValueError(f"{filename} incomplete: got {size} bytes, expect {expected_size}")
+    if expected_sha256 is not None and sha256 != expected_sha256.lower():
+        raise ValueError(f"{filename} checksum mismatch: got {sha256}, expect {expected_sha256}")
+
+
+def result_member_name(member_name) -> Optional[str]:
+    """map member of MinerU result zip to its extracted name, None if the member is not needed
+    Note:
+        keeps full.md, layout.json, images/*, and renames *_content_list.json to content_list.json.
+        _origin.pdf and other members are skipped.
+    """
+    name = member_name.replace('\\', '/')
+    if name.startswith('/') or '..' in name.split('/'):
+        return None  # unsafe path
+    if name in RESULT_FILES:
+        return name
+    if name.endswith(CONTENT_LIST_SUFFIX) and '/' not in name:
+        return CONTENT_LIST_FILE
+    if name.startswith(RESULT_IMAGE_DIR) and not name.endswith('/'):
+        return name
+    return None
+
+
+def extract_results(zip_file, destination_folder) -> List[str]:
+    """extract needed members of MinerU result zip, each member is streamed to disk
+    Note:
+        zipfile checks crc of each member once it is fully read, corrupted members raise zipfile.BadZipFile.
+    Returns:
+        list of extracted file names
+    """
+    extracted = []
+    with zipfile.ZipFile(zip_file, 'r') as zip_ref:
+        for info in zip_ref.infolist():
+            name = result_member_name(info.filename)
+            if name is None or info.is_dir():
+                continue
+            target = os.path.join(destination_folder, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with zip_ref.open(info) as src, open(target, 'wb') as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            extracted.append(name)
+    print(f"Successfully extracted {len(extracted)} files: {destination_folder}")
+    return extracted
 
 
 class MinerUKit:
-    def __init__(self, api_key):
+    def __init__(self, api_key, result_cache: Optional[MinerUResultCache] = None):
+        """
+        Args:
+            api_key: MinerU api key
+            result_cache: (optional) MinerU result cache, refer to batch_process_files_cached
+        """
         self.api_key = api_key
         self.task_url = TASK_URL
         self.batch_url = BATCH_URL
@@ -68,6 +143,8 @@ class MinerUKit:
             "layout_model":"doclayout_yolo",
             "enable_table": True
         }
+        self.result_cache = result_cache
+        self.failed_uploads = {}  # batch_id -> names of files whose upload failed
 
     def single_process_url(self, pdf_url, if_ocr, lang):
         """apply MinerU API to process single PDF
@@ -80,13 +157,16 @@ class MinerUKit:
         print(response.status_code)
         return response
     
-    def batch_process_files(self, pdf_files:List[str], if_ocr:Optional[bool]=False, lang:Optional[str]='en'):
+    def batch_process_files(self, pdf_files:List[str], if_ocr:Optional[bool]=False, lang:Optional[str]='en',
+                            data_ids:Optional[List[str]]=None):
         """apply MinerU API to process multiple PDF in local path
+        data_ids (one per file, generated if not given) are echoed back in batch status results
         """
         files = []
-        for file in pdf_files:
+        data_ids = data_ids or [str(uuid.uuid1()) for _ in pdf_files]
+        for file, data_id in zip(pdf_files, data_ids):
             files.append({"name": os.path.basename(file),
-                          "data_id": str(uuid.uuid1())})
+                          "data_id": data_id})
         data = copy.deepcopy(self.config)
         data['is_ocr'] = if_ocr
         data['language'] = lang
@@ -102,6 +182,7 @@ class MinerUKit:
                     urls = result["data"]["file_urls"]
                     print('batch_id:{},urls:{}'.format(batch_id, urls))
 
+                    failed = []
                     for idx, file_path in enumerate(pdf_files):
                         with open(file_path, 'rb') as f:
                             res_upload = requests.put(urls[idx], data=f)
@@ -109,6 +190,8 @@ class MinerUKit:
                             print("upload success")
                         else:
                             print("upload failed")
+                            failed.append(files[idx]['name'])
+                    self.failed_uploads[batch_id] = failed
                 else:
                     print('apply upload url failed,reason:{}'.format(result.msg))
             else:
@@ -119,13 +202,63 @@ class MinerUKit:
         
         return None
 
-    def batch_process_urls(self, pdf_urls:List[str], if_ocr:Optional[bool]=False, lang:Optional[str]='en'):
+    def batch_process_files_cached(self, pdf_files: List[str], save_path: str,
+                                   if_ocr: Optional[bool] = False, lang: Optional[str] = 'en') -> Dict:
+        """same as batch_process_files, but pdf files already in result cache are restored into save_path
+        instead of being submitted; the rest are cached once downloaded by the batch tracker (matched by data_id)
+        Returns:
+            dict with "cached" ({pdf file: restored folder}) and "response" (None if nothing submitted)
+        """
+        if self.result_cache is None:
+            return {"cached": {}, "response": self.batch_process_files(pdf_files, if_ocr, lang)}
+        config = dict(self.config, is_ocr=if_ocr, language=lang)
+        remaining, restored, data_ids = self.result_cache.filter_files(pdf_files, config, save_path)
+        response = self.batch_process_files(remaining, if_ocr, lang, data_ids) if remaining else None
+        if response is None or response.status_code != 200 or response.json().get('code') != 0:
+            for data_id in data_ids:
+                self.result_cache.discard(data_id)
+        else:
+            failed = set(self.failed_uploads.get(response.json()['data']['batch_id'], []))
+            for file, data_id in zip(remaining, data_ids):
+                if os.path.basename(file) in failed:  # never processed, don't keep it pending
+                    self.result_cache.discard(data_id)
+        return {"cached": restored, "response": response}
+
+    def batch_process_files_sharded(self, pdf_files: List[str], shard_dir: str, max_pages: int = 20,
+                                   min_pages: int = 40, if_ocr: Optional[bool] = False,
+                                   lang: Optional[str] = 'en') -> Dict:
+        """split long pdfs into page-range shards and submit all shards in one batch
+        Args:
+            pdf_files: list of local pdf paths
+            shard_dir: folder to save shards and shard manifest
+            max_pages: max number of pages per shard
+            min_pages: pdf with fewer pages is submitted as is
+        Returns:
+            dict with "manifest" ({pdf file: shards}) and "response" of batch_process_files
+        Note:
+            once the batch is downloaded, call merge_sharded_results to get one result folder per pdf.
+        """
+        manifest = plan_shards(pdf_files, shard_dir, max_pages, min_pages)
+        shard_files = [x['shard_path'] for shards in manifest.values() for x in shards]
+        print(f"{len(pdf_files)} pdf files submitted as {len(shard_files)} shards.")
+        return {"manifest": manifest, "response": self.batch_process_files(shard_files, if_ocr, lang)}
+
+    def merge_sharded_results(self, save_path: str, shard_dir: str, remove_shards: bool = True) -> Dict:
+        """merge downloaded shard results back into one folder per pdf, refer to mineru_shard.merge_manifest
+        Returns:
+            {pdf file: merged folder}, None if some shard result is missing
+        """
+        return merge_manifest(load_manifest(shard_dir), save_path, remove_shards)
+
+    def batch_process_urls(self, pdf_urls:List[str], if_ocr:Optional[bool]=False, lang:Optional[str]='en',
+                           data_ids:Optional[List[str]]=None):
         """apply MinerU API to process multiple PDF urls
         """
         files = []
-        for pdf_url in pdf_urls:
+        data_ids = data_ids or [str(uuid.uuid1()) for _ in pdf_urls]
+        for pdf_url, data_id in zip(pdf_urls, data_ids):
             files.append({"url": pdf_url,
-                          "data_id": str(uuid.uuid1())})
+                          "data_id": data_id})
         data = copy.deepcopy(self.config)
         data['is_ocr'] = if_ocr
         data['language'] = lang
@@ -149,6 +282,19 @@ class MinerUKit:
 
         return None
 
+    def batch_process_urls_cached(self, pdf_urls: List[str], save_path: str,
+                                  if_ocr: Optional[bool] = False, lang: Optional[str] = 'en') -> Dict:
+        """same as batch_process_files_cached for pdf urls"""
+        if self.result_cache is None:
+            return {"cached": {}, "response": self.batch_process_urls(pdf_urls, if_ocr, lang)}
+        config = dict(self.config, is_ocr=if_ocr, language=lang)
+        remaining, restored, data_ids = self.result_cache.filter_urls(pdf_urls, config, save_path)
+        response = self.batch_process_urls(remaining, if_ocr, lang, data_ids) if remaining else None
+        if response is None or response.status_code != 200 or response.json().get('code') != 0:
+            for data_id in data_ids:
+                self.result_cache.discard(data_id)
+        return {"cached": restored, "response": response}
+
     def batch_status_check(self, batch_id):
         """check status code of batch task
         """
@@ -158,66 +304,69 @@ class MinerUKit:
         # print(res.json())
         return res
     
-    def download_and_unzip(self, zip_url, download_file_name, unzip_folder_name):
-        """download and unzip MinerU processed files"""
-        download_file(zip_url, download_file_name)
-        unzip_file(download_file_name, unzip_folder_name)
-        os.remove(download_file_name) 
-
-        for file in Path(unzip_folder_name).glob('*'): 
-            file_nm = os.path.basename(file)
-            if "_origin.pdf" in file_nm:
-                os.remove(file) 
-            elif "_content_list.json" in file_nm:
-                os.rename(file, os.path.join(unzip_folder_name, "content_list.json"))
-
-    def monitor_batch_status(self, batch_id, save_path, interval=10, max_retries=10):
+    def download_and_unzip(self, zip_url, download_file_name, unzip_folder_name, expected_sha256=None):
+        """download and unzip MinerU processed files
+        Note:
+            zip is streamed to disk and only full.md, content_list.json, layout.json and images are extracted.
+        Returns:
+            list of extracted file names, None if download or extraction failed
+        """
+        if download_file(zip_url, download_file_name, expected_sha256=expected_sha256) is None:
+            return None
+        try:
+            return extract_results(download_file_name, unzip_folder_name)
+        except zipfile.BadZipFile as e:
+            print(f"Error extracting {download_file_name}: {e}")
+            return None
+        finally:
+            os.remove(download_file_name)
+
+    def monitor_batch_status(self, batch_id, save_path, interval=10, max_retries=10,
+                             callback=None, max_workers=4, state_path=None, max_wait=None):
         """
-        monitor batch run status, try to download with max_retries
+        monitor batch run status, download finished files on a bounded thread pool
 
         Args:
             batch_id: batch id
             save_path: path to save processed files (in folder whose name aligned with orginal pdf)
-            interval: time interval for next check (in seconds)
-            max_retries: max retries
+            interval: min time interval for next check (in seconds), adapted to completion rate
+            max_retries: max number of status checks
+            callback: (optional) function called with event dict once each file is downloaded or failed
+            max_workers: max number of concurrent downloads
+            state_path: (optional) json file to persist tracking state, refer to BatchTracker
+            max_wait: (optional) stop monitoring after max_wait seconds
         Note:
             processed data would saved into folders whose name aligned with orginal pdf.
             files include:
                 - full.md: final markdown file
-                - _content_list.json: paragraph information
+                - content_list.json: paragraph information (renamed from _content_list.json)
                 - layout.json: detailed positions, etc.
+        Returns:
+            summary of the batch
         """
-        downloaded_files = set()  # 记录已下载的文件名，避免重复下载
-
-        for _ in range(max_retries):
-            running_res = self.batch_status_check(batch_id)
-            if running_res.json().get('msg') == 'ok':
-                results = running_res.json().get('data', {}).get('extract_result', [])
-                for item in results:
-                    if item.get('state') == 'done':
-                        file_name = item.get('file_name')
-                        if file_name not in downloaded_files:  # 检查是否已下载
-                            file_name_nosuffix = file_name.rsplit('.', 1)[0]
-                            zip_url = item.get('full_zip_url')
-                            download_file_name = os.path.join(save_path, file_name_nosuffix + ".zip")
-                            unzip_folder_name = os.path.join(save_path, file_name_nosuffix)
-
-                            # 使用线程下载并解压，避免阻塞主线程
-                            thread = threading.Thread(
-                                target=self.download_and_unzip,
-                                args=(zip_url, download_file_name, unzip_folder_name)
-                            )
-                            thread.start()
-
-                            downloaded_files.add(file_name)  # 标记为已下载
-                
-                # 检查是否全部完成
-                all_done = all(item.get('state') == 'done' for item in results)
-                if all_done:
-                    print(f"Batch {batch_id} complte")
-                    return
-
-            print(f"Batch {batch_id} running, recheck in next {interval} seconds...")
-            time.sleep(interval)
-
-        print(f"Exit as batch {batch_id} reached max retries.")
\ No newline at end of file
+        tracker = BatchTracker(self, batch_id, save_path, max_workers=max_workers, state_path=state_path,
+                               min_interval=interval, max_polls=max_retries, max_wait=max_wait,
+                               failed_files=self.failed_uploads.get(batch_id))
+        return tracker.run(callback)
+
+    def process_files(self, pdf_files: List[str], save_path: str, if_ocr: Optional[bool] = False,
+                      lang: Optional[str] = 'en', interval=10, max_polls=None,
+                      max_wait=PROCESS_MAX_WAIT) -> Dict[str, Optional[str]]:
+        """submit pdf files as one batch and wait until results are downloaded into save_path
+        Note:
+            same interface as LocalMinerUKit.process_files, so that either backend can be used.
+            files whose upload failed are not waited for, and the whole wait is bounded by max_wait seconds.
+        Returns:
+            {pdf file: result folder}, None if failed
+        """
+        response = self.batch_process_files(pdf_files, if_ocr, lang)
+        if response is None or response.status_code != 200 or response.json().get('code') != 0:
+            return {pdf_file: None for pdf_file in pdf_files}
+
+        self.monitor_batch_status(response.json()['data']['batch_id'], save_path,
+                                  interval=interval, max_retries=max_polls, max_wait=max_wait)
+        folders = {}
+        for pdf_file in pdf_files:
+            folder = os.path.join(save_path, os.path.basename(pdf_file).rsplit('.', 1)[0])
+            folders[pdf_file] = folder if os.path.exists(os.path.join(folder, CONTENT_LIST_FILE)) else None
+        return folders